@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+"""
+Benchmark a nightly style run over many small projects, scanned once
+with a djangoSCA.py process per project, and once with a single
+'djangoSCA.py --batch' run over a manifest of the same projects.
+Both runs use the same number of worker processes and no result cache.
+
+usage: python bench/batch_scan.py [projects] [jobs]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SCRIPT = os.path.join(ROOT, 'djangoSCA.py')
+RULES = os.path.join(ROOT, 'djangoSCA.rules')
+
+PROJECT = {
+    'mysite/settings.py': 'DEBUG = False\nINSTALLED_APPS = []\n',
+    'app/views.py': 'from django.db import connection\n'
+                    'def index(request):\n    return None\n',
+    'app/forms.py': 'from django import forms\n'
+                    'class F(forms.Form):\n    name = forms.CharField()\n',
+    'app/models.py': 'from django.db import models\n'
+                     'class M(models.Model):\n'
+                     '    name = models.CharField(max_length=10)\n',
+    'templates/index.html': '<p>{{ object.title|safe }}</p>\n',
+}
+
+
+def make_project(projdir):
+    for (name, content) in PROJECT.items():
+        path = os.path.join(projdir, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        f = open(path, 'w')
+        f.write(content)
+        f.close()
+
+
+def main():
+    nprojects = len(sys.argv) > 1 and int(sys.argv[1]) or 50
+    jobs = len(sys.argv) > 2 and sys.argv[2] or '1'
+    base = tempfile.mkdtemp()
+    devnull = open(os.devnull, 'w')
+    try:
+        names = ['service%03d' % (i) for i in range(nprojects)]
+        for name in names:
+            make_project(os.path.join(base, name))
+        manifest = os.path.join(base, 'manifest.json')
+        f = open(manifest, 'w')
+        json.dump(names, f)
+        f.close()
+        common = [sys.executable, SCRIPT, '-r', RULES, '--no-cache',
+                  '-j', jobs]
+
+        start = time.time()
+        for name in names:
+            subprocess.call(common + ['-o', os.path.join(base, name + '.txt'),
+                                      os.path.join(base, name)],
+                            stdout=devnull, stderr=devnull, cwd=ROOT)
+        single = time.time() - start
+
+        start = time.time()
+        subprocess.call(common + ['--batch', manifest, '--report-dir',
+                                  os.path.join(base, 'reports')],
+                        stdout=devnull, stderr=devnull, cwd=ROOT)
+        batch = time.time() - start
+    finally:
+        devnull.close()
+        shutil.rmtree(base)
+
+    sys.stdout.write('[*] %d projects of %d files, %s jobs\n'
+                     % (nprojects, len(PROJECT), jobs))
+    sys.stdout.write('    process per project: %.3fs\n' % (single))
+    sys.stdout.write('    --batch manifest....: %.3fs (%.1fx)\n'
+                     % (batch, single / max(batch, 1e-9)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+
+"""
+Micro-benchmark of the MyParser class body analysis over large generated
+forms/models modules.  The previous implementation, which classified
+nodes by matching their repr() and re-processed the whole class body
+once per function or assignment, is kept below as LegacyParser so both
+can be compared.  Findings of both are checked to be identical first.
+
+usage: python bench/classdef_visitor.py [classes] [fields per class]
+"""
+
+import os
+import re
+import ast
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from djangoSCAclasses.RuleSet import RuleSet
+from djangoSCAclasses.MyParser import MyParser
+
+
+class LegacyParser(MyParser):
+
+    def __init__(self, ruleset, filehandle):
+        MyParser.__init__(self, ruleset, filehandle)
+        self.classes = []
+        self.rxpobj = re.compile(r'<(.+) object at (.+)>')
+
+    def visit_ClassDef(self, node):
+        self.classes.append(node.name)
+        for statement in ast.iter_child_nodes(node):
+            if self.rxpobj.match(str(statement)).group(1) \
+                == '_ast.FunctionDef' \
+                or self.rxpobj.match(str(statement)).group(1) \
+                    == '_ast.ClassDef':
+                myname = node.name + ':' + statement.name
+                if myname not in self.classes:
+                    self.classes.append(node.name + ':' + statement.name)
+            if self.rxpobj.match(str(statement)).group(1) \
+                == '_ast.FunctionDef' \
+                or self.rxpobj.match(str(statement)).group(1) \
+                    == '_ast.Assign':
+                try:
+                    clfunctions = self.__process_func_assign(node.body)
+                except:
+                    clfunctions = []
+                for varassign in clfunctions:
+                    key = node.name + ':' + varassign[0]
+                    self.class_func_assign[key] = varassign[1]
+                    # the enclosing class, which MyParser needs to tell
+                    # the Meta class of a ModelForm
+                    if self.class_stack:
+                        self.class_owner[key] = self.class_stack[-1]
+        self.class_stack.append(node.name)
+        self.generic_visit(node)
+        self.class_stack.pop()
+
+    def __process_func_assign(self, node):
+        retlist = []
+        for statement in node:
+            if not self.rxpobj.match(str(statement)).group(1) == '_ast.Assign':
+                continue
+            for target in statement.targets:
+                targetname = getattr(target, 'id') + ':' + str(target.lineno)
+                kind = self.rxpobj.match(str(statement.value)).group(1)
+                if kind == '_ast.Call':
+                    rhs_func = getattr(getattr(statement.value, 'func'),
+                                       'value')
+                    rhs_funcname = self.__process_id(rhs_func)
+                    attr = self.__process_attr(getattr(statement.value,
+                                                       'func'))
+                    retlist.append([targetname,
+                                    '%s.%s()' % (rhs_funcname, attr)])
+                elif kind == '_ast.Name':
+                    retlist.append([targetname, statement.value.id])
+                elif kind == '_ast.List':
+                    mlist = '['
+                    for cn in ast.iter_child_nodes(statement.value):
+                        if self.rxpobj.match(str(cn)).group(1) == '_ast.Str':
+                            mlist += '\'%s\',' % (cn.s)
+                    mlist = mlist[:-1] + ']'
+                    retlist.append([targetname, mlist])
+                elif kind == '_ast.Str':
+                    retlist.append([targetname, statement.value.s])
+        return retlist
+
+    def __process_id(self, node):
+        m = self.rxpobj.match(str(node))
+        retval = ''
+        if m.group(1) == '_ast.Name':
+            retval = getattr(node, 'id')
+        elif m.group(1) == '_ast.Attribute':
+            retval += self.__process_id(node.value)
+        return retval
+
+    def __process_attr(self, node):
+        m = self.rxpobj.match(str(node.value))
+        retval = ''
+        if m.group(1) == '_ast.Name':
+            retval = getattr(node, 'attr')
+        elif m.group(1) == '_ast.Attribute':
+            retval += self.__process_attr(node.value) + '.' \
+                + getattr(node, 'attr')
+        return retval
+
+
+def generate_module(nclasses, nfields):
+    out = ['from django import forms', 'from django.forms import ModelForm',
+           '']
+    for c in range(nclasses):
+        out.append('class Form%d(ModelForm):' % (c))
+        for f in range(nfields):
+            out.append('    field%d = forms.CharField(max_length=%d)'
+                       % (f, f + 1))
+            out.append('    label%d = "Field %d"' % (f, f))
+        for f in range(0, nfields, 2):
+            out.append('    def clean_field%d(self):' % (f))
+            out.append('        return self.cleaned_data["field%d"]' % (f))
+        out.append('    class Meta:')
+        out.append('        model = Model%d' % (c))
+        if c % 2:
+            out.append('        fields = "__all__"')
+        else:
+            out.append('        exclude = ["field0", "field1"]')
+        out.append('')
+    return '\n'.join(out) + '\n'
+
+
+def run(parser_class, ruleset, code):
+    parser = parser_class(ruleset, None)
+    start = time.time()
+    parser.ast_parse('forms.py', code)
+    return (time.time() - start, parser)
+
+
+def main():
+    nclasses = 200
+    nfields = 30
+    if len(sys.argv) > 1:
+        nclasses = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        nfields = int(sys.argv[2])
+
+    ruleset = RuleSet(os.path.join(os.path.dirname(__file__), '..',
+                                   'djangoSCA.rules'))
+    code = generate_module(nclasses, nfields)
+    (old, legacy) = run(LegacyParser, ruleset, code)
+    (new, parser) = run(MyParser, ruleset, code)
+
+    if sorted(str(w) for w in legacy.warnings) != \
+            sorted(str(w) for w in parser.warnings) or \
+            legacy.class_func_assign != parser.class_func_assign:
+        sys.stderr.write('findings differ between implementations\n')
+        sys.exit(1)
+
+    sys.stdout.write('%d classes x %d fields, %d lines, %d findings\n'
+                     % (nclasses, nfields, code.count('\n'),
+                        len(parser.warnings)))
+    sys.stdout.write('    repr based visitor..: %.3fs\n' % (old))
+    sys.stdout.write('    typed visitor.......: %.3fs (%.1fx)\n'
+                     % (new, old / max(new, 1e-9)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+
+"""
+Generate a synthetic Django project for benchmarking.  The project has a
+settings module, a number of apps each with forms, models and views
+modules and HTML templates, and optionally files with very long lines
+and minified templates.  A share of the generated code matches the
+rules (mark_safe(), raw SQL, '|safe', csrf_exempt, hardcoded passwords
+and addresses, ModelForms without 'fields'), the rest is clean code of
+the same shape.  For a given Python version, the output only depends on
+the arguments and the seed, so that results can be compared across
+commits.
+
+usage: python bench/generate_project.py [options] <destination>
+"""
+
+import os
+import sys
+import random
+import argparse
+
+SETTINGS = """\
+import os
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SECRET_KEY = 'bench-%(seed)d-not-a-secret'
+DEBUG = True
+ALLOWED_HOSTS = ['*']
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+%(apps)s]
+MIDDLEWARE_CLASSES = (
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+)
+SESSION_COOKIE_SECURE = False
+"""
+
+CROSSDOMAIN = """\
+<?xml version="1.0"?>
+<cross-domain-policy>
+  <site-control permitted-cross-domain-policies="master-only"/>
+  <allow-access-from domain="*.example.com" secure="false" />
+</cross-domain-policy>
+"""
+
+FORMS_HEADER = 'from django import forms\nfrom .models import *\n\n'
+MODELS_HEADER = 'from django.db import models\n\n'
+VIEWS_HEADER = ('from django.db import connection\n'
+                'from django.shortcuts import render\n'
+                'from django.utils.safestring import mark_safe\n'
+                'from django.views.decorators.csrf import csrf_exempt\n\n')
+
+CLEAN_FORM = """\
+class %(name)sForm(forms.ModelForm):
+    class Meta:
+        model = %(name)s
+        fields = ['title', 'body']
+
+
+"""
+HIT_FORM = """\
+class %(name)sForm(forms.ModelForm):
+    class Meta:
+        model = %(name)s
+
+
+"""
+
+CLEAN_MODEL = """\
+class %(name)s(models.Model):
+    title = models.CharField(max_length=100)
+    body = models.TextField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __unicode__(self):
+        return self.title
+
+
+"""
+HIT_MODEL = """\
+class %(name)s(models.Model):
+    title = models.CharField(max_length=100)
+    body = models.TextField()
+
+    def search(self, term):
+        return %(name)s.objects.raw('SELECT * FROM t WHERE x = %%s' %% term)
+
+
+"""
+
+CLEAN_VIEW = """\
+def %(lname)s_detail(request, pk):
+    obj = %(name)s.objects.get(pk=pk)
+    return render(request, '%(app)s/%(lname)s.html', {'object': obj})
+
+
+"""
+HIT_VIEW = """\
+@csrf_exempt
+def %(lname)s_detail(request, pk):
+    password = 'hunter2'
+    cursor = connection.cursor()
+    cursor.execute('SELECT * FROM t WHERE id = %%s' %% pk)
+    html = mark_safe(request.GET.get('q'))
+    return render(request, '%(app)s/%(lname)s.html', {'html': html})
+
+
+"""
+
+CLEAN_TEMPLATE = [
+    '<div class="container"><div class="row">',
+    '  <h1>{{ object.title }}</h1>',
+    '  {% for item in items %}<li>{{ item.name|title }}</li>{% endfor %}',
+    '  <a href="{% url "detail" object.pk %}">more</a>',
+    '  <p class="lead">Lorem ipsum dolor sit amet, consectetur.</p>',
+    '</div></div>',
+]
+HIT_TEMPLATE = [
+    '  <p>{{ object.body|safe }}</p>',
+    '  {% autoescape off %}{{ html }}{% endautoescape %}',
+    '  <img src="http://10.0.0.12/logo.png">',
+]
+
+
+def write(path, content):
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    f = open(path, 'w')
+    f.write(content)
+    f.close()
+
+
+def generate(dest, apps=10, per_app=20, templates=20, template_lines=200,
+             long_lines=2, minified=2, hit_ratio=0.2, seed=0):
+    """
+    Write a project to dest, returning the number of files written.
+    """
+    rnd = random.Random(seed)
+    files = 0
+    appnames = ['app%03d' % (i) for i in range(apps)]
+    write(os.path.join(dest, 'mysite', '__init__.py'), '')
+    write(os.path.join(dest, 'mysite', 'settings.py'), SETTINGS % {
+        'seed': seed,
+        'apps': ''.join("    '%s',\n" % (a) for a in appnames)})
+    write(os.path.join(dest, 'static', 'crossdomain.xml'), CROSSDOMAIN)
+    files += 3
+
+    for app in appnames:
+        names = ['%sItem%03d' % (app.capitalize(), i) for i in range(per_app)]
+        parts = {'forms': [FORMS_HEADER], 'models': [MODELS_HEADER],
+                 'views': [VIEWS_HEADER]}
+        for name in names:
+            values = {'name': name, 'lname': name.lower(), 'app': app}
+            for (module, clean, hit) in (('forms', CLEAN_FORM, HIT_FORM),
+                                         ('models', CLEAN_MODEL, HIT_MODEL),
+                                         ('views', CLEAN_VIEW, HIT_VIEW)):
+                template = rnd.random() < hit_ratio and hit or clean
+                parts[module].append(template % values)
+        write(os.path.join(dest, app, '__init__.py'), '')
+        files += 1
+        for (module, chunks) in parts.items():
+            write(os.path.join(dest, app, module + '.py'), ''.join(chunks))
+            files += 1
+        for i in range(templates):
+            lines = []
+            for n in range(template_lines):
+                if rnd.random() < hit_ratio / 10:
+                    lines.append(rnd.choice(HIT_TEMPLATE))
+                else:
+                    lines.append(rnd.choice(CLEAN_TEMPLATE))
+            write(os.path.join(dest, app, 'templates', app,
+                               'page%03d.html' % (i)),
+                  '\n'.join(lines) + '\n')
+            files += 1
+
+    for i in range(long_lines):
+        # one very long line among ordinary ones, such as embedded data
+        data = ', '.join("'%08x'" % (rnd.getrandbits(32))
+                         for n in range(20000))
+        write(os.path.join(dest, 'data', 'fixture%03d.py' % (i)),
+              '# generated\nDATA = [%s]\nVALUE = 1\n' % (data))
+        files += 1
+    for i in range(minified):
+        # a whole template on one line
+        body = ''.join(rnd.choice(CLEAN_TEMPLATE + HIT_TEMPLATE).strip()
+                       for n in range(2000))
+        write(os.path.join(dest, 'static', 'min', 'bundle%03d.html' % (i)),
+              body)
+        files += 1
+    return files
+
+
+def add_arguments(ap):
+    ap.add_argument('--apps', type=int, default=10,
+                    help='number of apps (default 10)')
+    ap.add_argument('--per-app', type=int, default=20,
+                    help='forms, models and views per app (default 20)')
+    ap.add_argument('--templates', type=int, default=20,
+                    help='templates per app (default 20)')
+    ap.add_argument('--template-lines', type=int, default=200,
+                    help='lines per template (default 200)')
+    ap.add_argument('--long-lines', type=int, default=2,
+                    help='python files with a very long line (default 2)')
+    ap.add_argument('--minified', type=int, default=2,
+                    help='minified templates (default 2)')
+    ap.add_argument('--hit-ratio', type=float, default=0.2,
+                    help='share of generated code matching rules '
+                    '(default 0.2)')
+    ap.add_argument('--seed', type=int, default=0,
+                    help='random seed (default 0)')
+
+
+def generate_from_args(dest, args):
+    return generate(dest, args.apps, args.per_app, args.templates,
+                    args.template_lines, args.long_lines, args.minified,
+                    args.hit_ratio, args.seed)
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description='Generate a synthetic Django project for benchmarks')
+    ap.add_argument('destination', help='directory to write the project to')
+    add_arguments(ap)
+    args = ap.parse_args()
+    if os.path.exists(args.destination):
+        sys.stderr.write('destination [%s] already exists\n'
+                         % (args.destination))
+        sys.exit(1)
+    files = generate_from_args(args.destination, args)
+    sys.stdout.write('[*] wrote %d files to [%s]\n'
+                     % (files, args.destination))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+"""
+Benchmark the single pass LineMatcher against the previous per-rule
+grep path, which re-split the file content and re-walked every line
+once per rule.  A synthetic tree of files is generated in memory, and
+the findings of both paths are compared before any timing is shown.
+
+usage: python bench/nonast_engine.py [rules file] [files] [lines per file]
+"""
+
+import os
+import re
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from djangoSCAclasses.RuleSet import RuleSet
+
+SAMPLE_LINES = [
+    'from django.db import models',
+    '    name = models.CharField(max_length=100)',
+    '    def get_absolute_url(self):',
+    '        return reverse("detail", args=[self.pk])',
+    '    password = forms.CharField(widget=forms.PasswordInput)',
+    '    host = "10.0.0.1"',
+    '<p>{{ object.title }}</p>',
+    '<div class="row">{% for item in items %}<span>{{ item }}</span>',
+    '    x = mark_safe(value)',
+    '    # contact admin@EXAMPLE.COM for help',
+    '',
+]
+
+
+def grep_path(rules, content):
+    # the pre-LineMatcher implementation: one split and walk per rule
+    hits = []
+    for (p, rule) in rules:
+        mline = []
+        # numbered from 1, as LineMatcher.scan() does
+        i = 1
+        for line in content.split('\n'):
+            if re.match(p.pattern, line):
+                mline.append(i)
+            i += 1
+        hits.append(mline)
+    return hits
+
+
+def main():
+    rulesfile = 'djangoSCA.rules'
+    nfiles = 200
+    nlines = 500
+    if len(sys.argv) > 1:
+        rulesfile = sys.argv[1]
+    if len(sys.argv) > 2:
+        nfiles = int(sys.argv[2])
+    if len(sys.argv) > 3:
+        nlines = int(sys.argv[3])
+
+    random.seed(0)
+    files = ['\n'.join(random.choice(SAMPLE_LINES) for i in range(nlines))
+             for j in range(nfiles)]
+    ruleset = RuleSet(rulesfile)
+
+    for section in RuleSet.LINE_SECTIONS:
+        matcher = ruleset.matcher(section)
+        for content in files:
+            if grep_path(matcher.rules, content) != \
+                    matcher.scan(content.split('\n')):
+                sys.stderr.write('findings differ for section [%s]\n'
+                                 % (section))
+                sys.exit(1)
+
+        start = time.time()
+        for content in files:
+            grep_path(matcher.rules, content)
+        old = time.time() - start
+
+        start = time.time()
+        for content in files:
+            matcher.scan(content.split('\n'))
+        new = time.time() - start
+
+        sys.stdout.write('[%s] %d rules, %d files x %d lines\n'
+                         % (section, len(matcher.rules), nfiles, nlines))
+        sys.stdout.write('    per-rule grep....: %.3fs\n' % (old))
+        sys.stdout.write('    LineMatcher......: %.3fs (%.1fx)\n'
+                         % (new, old / max(new, 1e-9)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+"""
+Benchmark a serial Stage 2 over a generated project (see
+generate_project.py), with files read as they are analyzed and with
+the read-ahead threads of ScanPool.  Opening a file is made to take
+some milliseconds longer, as it does on network and overlay
+filesystems, by replacing open() in the modules that read files.
+
+usage: python bench/read_ahead.py [latency_ms ...]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from djangoSCAclasses.RuleSet import RuleSet  # noqa: E402
+from djangoSCAclasses.ScanPool import ScanPool  # noqa: E402
+from djangoSCAclasses.Profiler import Profiler  # noqa: E402
+from djangoSCAclasses.ProjectFiles import FILE_RXP  # noqa: E402
+from djangoSCAclasses.FileInventory import FileInventory  # noqa: E402
+import djangoSCAclasses.ContentReader  # noqa: E402
+import djangoSCAclasses.ReadAhead  # noqa: E402
+import generate_project  # noqa: E402
+
+MODULES = (djangoSCAclasses.ContentReader, djangoSCAclasses.ReadAhead)
+
+
+def slow_open(latency):
+    def open_file(*args):
+        time.sleep(latency)
+        return open(*args)
+    return open_file
+
+
+def run(ruleset, projdir, files, threads, latency):
+    for module in MODULES:
+        module.open = slow_open(latency)
+    try:
+        profiler = Profiler()
+        pool = ScanPool(ruleset, profiler=profiler, io_threads=threads)
+        start = time.time()
+        for result in pool.scan(projdir, files):
+            pass
+        seconds = time.time() - start
+        pool.close()
+    finally:
+        for module in MODULES:
+            del module.open
+    waits = profiler.stages.get('prefetch_wait', [0.0, 0])[1]
+    return (seconds, waits)
+
+
+def main():
+    latencies = [float(a) for a in sys.argv[1:]] or [0.0, 1.0, 5.0]
+    base = tempfile.mkdtemp()
+    try:
+        projdir = os.path.join(base, 'project')
+        generate_project.generate(projdir, apps=8, templates=10,
+                                  long_lines=0, minified=0)
+        ruleset = RuleSet(os.path.join(ROOT, 'djangoSCA.rules'))
+        walk = FileInventory(projdir, None, FILE_RXP)
+        files = [(path, ext) for (path, ext, size, mtime) in walk.files]
+        sys.stdout.write('[*] serial scan of %d files\n' % (len(files)))
+        for latency in latencies:
+            plain = run(ruleset, projdir, files, 0, latency / 1000.0)[0]
+            sys.stdout.write('    open latency %5.1fms: read when analyzed '
+                             '%7.3fs\n' % (latency, plain))
+            for threads in (1, 2, 4, 8):
+                (seconds, waits) = run(ruleset, projdir, files, threads,
+                                       latency / 1000.0)
+                sys.stdout.write('        %d read-ahead threads: %7.3fs '
+                                 '(%.2fx), waited on %d files\n'
+                                 % (threads, seconds,
+                                    plain / max(seconds, 1e-9), waits))
+    finally:
+        shutil.rmtree(base)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+"""
+Benchmark the line based rules against adversarial input: long single
+line content of the kind found in minified templates, built to make the
+backtracking patterns of the rules file work hard.  Each line is run
+through the rules exactly as written with re.match(), and through the
+LineMatcher with its rewritten patterns, long line windows and rule
+time budget.  The LineMatcher time should stay bounded as lines grow.
+
+usage: python bench/redos_budget.py [rules file] [line length]
+"""
+
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from djangoSCAclasses.RuleSet import RuleSet
+
+ADVERSARIAL = [
+    # raw( ... WHERE ... without the closing parenthesis
+    lambda n: "raw('SELECT" + ' where' * (n // 6),
+    # many candidate e-mail addresses without a valid domain
+    lambda n: 'A@' * (n // 2),
+    # long runs of digits for the SSN, IP and card number patterns
+    lambda n: '1.' * (n // 2),
+    lambda n: '{{ x|safe }}' + ' ' * n,
+]
+
+
+def main():
+    rulesfile = len(sys.argv) > 1 and sys.argv[1] or \
+        os.path.join(os.path.dirname(__file__), '..', 'djangoSCA.rules')
+    length = len(sys.argv) > 2 and int(sys.argv[2]) or 20000
+    ruleset = RuleSet(rulesfile)
+    lines = [make(length) for make in ADVERSARIAL]
+
+    for section in RuleSet.LINE_SECTIONS:
+        matcher = ruleset.matcher(section)
+
+        start = time.time()
+        for line in lines:
+            for (p, rule) in matcher.rules:
+                re.match(p.pattern, line)
+        old = time.time() - start
+
+        start = time.time()
+        hits = matcher.hits()
+        budget = matcher.budget(1.0)
+        for (lineno, line) in enumerate(lines):
+            matcher.match(lineno, line, hits, budget)
+        new = time.time() - start
+
+        sys.stdout.write('[%s] %d rules, %d lines of %d characters\n'
+                         % (section, len(matcher.rules), len(lines), length))
+        sys.stdout.write('    re.match as written: %.3fs\n' % (old))
+        sys.stdout.write('    LineMatcher........: %.3fs (%.1fx)\n'
+                         % (new, old / max(new, 1e-9)))
+
+
+if __name__ == '__main__':
+    main()
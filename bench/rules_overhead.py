@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+
+"""
+Benchmark the per-file cost of rule handling.
+
+Before the RuleSet class was introduced, every scanned file created a
+MyParser which re-opened, re-parsed and re-compiled the rules file.
+This script compares that cost (simulated by loading a RuleSet per
+file) against the shared RuleSet path where every MyParser just
+references the already compiled rules.
+
+usage: python bench/rules_overhead.py [rules file] [number of files]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from djangoSCAclasses.RuleSet import RuleSet
+from djangoSCAclasses.MyParser import MyParser
+
+
+def main():
+    rulesfile = 'djangoSCA.rules'
+    nfiles = 10000
+    if len(sys.argv) > 1:
+        rulesfile = sys.argv[1]
+    if len(sys.argv) > 2:
+        nfiles = int(sys.argv[2])
+
+    ruleset = RuleSet(rulesfile)
+    devnull = open(os.devnull, 'w')
+
+    per_file_load = timeit.timeit(
+        lambda: MyParser(RuleSet(rulesfile), devnull), number=nfiles)
+    shared = timeit.timeit(
+        lambda: MyParser(ruleset, devnull), number=nfiles)
+
+    sys.stdout.write('files simulated.........: %d\n' % (nfiles))
+    sys.stdout.write('rules loaded per file...: %.3fs (%.1fus/file)\n'
+                     % (per_file_load, per_file_load / nfiles * 1e6))
+    sys.stdout.write('shared RuleSet..........: %.3fs (%.1fus/file)\n'
+                     % (shared, shared / nfiles * 1e6))
+    devnull.close()
+
+
+if __name__ == '__main__':
+    main()
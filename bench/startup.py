@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+"""
+Benchmark the cold start of djangoSCA.py, which hooks run thousands of
+times a day.  Every measurement runs in a fresh interpreter:
+
+ - the cumulative import time of each module djangoSCA.py loads, in the
+   manner of 'python -X importtime', which older Pythons do not have
+ - the wall time of 'djangoSCA.py --help'
+ - the wall time of a small scan (a generated project of a few files,
+   without the result cache)
+
+The median of several runs is compared against the targets below, and
+the exit status is 1 if a target is missed, so this can run in CI.
+
+usage: python bench/startup.py [runs]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+
+# cold start targets, in milliseconds
+TARGET_HELP_MS = 60
+TARGET_SMALL_SCAN_MS = 150
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SCRIPT = os.path.join(ROOT, 'djangoSCA.py')
+RULES = os.path.join(ROOT, 'djangoSCA.rules')
+
+MODULES = [
+    'argparse',
+    'djangoSCAclasses.RuleSet',
+    'djangoSCAclasses.SettingsCheck',
+    'djangoSCAclasses.ScanPool',
+    'djangoSCAclasses.Reporter',
+    'djangoSCAclasses.Profiler',
+    'djangoSCAclasses.ProjectFiles',
+    'djangoSCAclasses.FileInventory',
+    'djangoSCAclasses.SymbolIndex',
+    'djangoSCAclasses.ReadAhead',
+    'djangoSCAclasses.XmlCheck',
+    'djangoSCAclasses.ArchiveTree',
+    # only loaded by the runs that need them
+    'djangoSCAclasses.ResultCache',
+    'djangoSCAclasses.ScanDaemon',
+    'djangoSCAclasses.ScanClient',
+    'multiprocessing',
+    'subprocess',
+]
+
+SMALL_PROJECT = {
+    'settings.py': 'DEBUG = False\nINSTALLED_APPS = []\n',
+    'views.py': 'from django.db import connection\n'
+                'def index(request):\n    return None\n',
+    'forms.py': 'from django import forms\n'
+                'class F(forms.Form):\n    name = forms.CharField()\n',
+    'templates/index.html': '<p>{{ object.title|safe }}</p>\n',
+}
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def wall_ms(cmd, runs):
+    times = []
+    devnull = open(os.devnull, 'w')
+    for i in range(runs):
+        start = time.time()
+        subprocess.call(cmd, stdout=devnull, stderr=devnull, cwd=ROOT)
+        times.append((time.time() - start) * 1000.0)
+    devnull.close()
+    return median(times)
+
+
+def import_ms(module, runs):
+    code = ('import time; t = time.time(); import %s; '
+            'print((time.time() - t) * 1000.0)' % (module))
+    times = []
+    for i in range(runs):
+        out = subprocess.check_output([sys.executable, '-c', code], cwd=ROOT)
+        times.append(float(out.decode().strip()))
+    return median(times)
+
+
+def main():
+    runs = len(sys.argv) > 1 and int(sys.argv[1]) or 9
+    projdir = tempfile.mkdtemp()
+    try:
+        for (name, content) in SMALL_PROJECT.items():
+            path = os.path.join(projdir, name)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            f = open(path, 'w')
+            f.write(content)
+            f.close()
+
+        sys.stdout.write('[*] cumulative import time (median of %d)\n'
+                         % (runs))
+        for module in MODULES:
+            sys.stdout.write('    %-36s %7.1fms\n'
+                             % (module, import_ms(module, runs)))
+
+        interpreter = wall_ms([sys.executable, '-c', 'pass'], runs)
+        helptime = wall_ms([sys.executable, SCRIPT, '--help'], runs)
+        scantime = wall_ms([sys.executable, SCRIPT, '-r', RULES,
+                            '--no-cache', projdir], runs)
+    finally:
+        shutil.rmtree(projdir)
+
+    sys.stdout.write('[*] cold start wall time (median of %d)\n' % (runs))
+    sys.stdout.write('    interpreter only.....: %7.1fms\n' % (interpreter))
+    failed = False
+    for (label, ms, target) in (('--help', helptime, TARGET_HELP_MS),
+                                ('small scan', scantime,
+                                 TARGET_SMALL_SCAN_MS)):
+        ok = ms <= target
+        failed = failed or not ok
+        sys.stdout.write('    %-21s: %7.1fms (target %dms) %s\n'
+                         % (label, ms, target, ok and 'ok' or 'MISSED'))
+    sys.exit(failed and 1 or 0)
+
+
+if __name__ == '__main__':
+    main()
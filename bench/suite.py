@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+
+"""
+Benchmark a scan of a synthetic Django project (see generate_project.py)
+and record the results to a JSON file (bench/benchmark.json by default,
+which is not tracked), so that they can be compared across commits.  The
+project is generated from the options and seed given, then scanned
+several times with 'djangoSCA.py --profile=json' in a fresh interpreter,
+without the result cache.  Of the run with the
+median wall time, the following are recorded:
+
+ - the wall time of the whole run, and of each profiled stage: the
+   settings checks (Stage 1), the walk, the reading of files by
+   ContentReader, ast_parse and its visitor, and nonast_parse
+ - the files and bytes analyzed, as files/sec and MB/sec of wall time
+ - the peak resident set size of the scanning processes
+
+usage: python bench/suite.py [options]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+try:
+    import resource
+except ImportError:
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from generate_project import add_arguments, generate_from_args
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SCRIPT = os.path.join(ROOT, 'djangoSCA.py')
+RULES = os.path.join(ROOT, 'djangoSCA.rules')
+
+# profiled stages recorded, and their names in the results
+STAGES = [
+    ('settings', 'stage1'),
+    ('walk', 'walk'),
+    ('read', 'content_reader'),
+    ('ast_parse', 'ast_parse'),
+    ('visitor', 'ast_visitor'),
+    ('nonast', 'nonast_parse'),
+    ('stage2', 'stage2'),
+    ('total', 'total'),
+]
+
+
+def git_commit():
+    try:
+        out = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT,
+                                      stderr=open(os.devnull, 'w'))
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.decode().strip()
+
+
+def peak_rss_kb():
+    # the largest resident set of any child process waited for so far
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    if sys.platform == 'darwin':
+        rss //= 1024
+    return rss
+
+
+def scan(projdir, jobs, extra):
+    cmd = [sys.executable, SCRIPT, '-r', RULES, '--no-cache', '-j',
+           str(jobs), '--profile=json'] + extra + [projdir]
+    start = time.time()
+    p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                         cwd=ROOT)
+    (out, err) = p.communicate()
+    wall = time.time() - start
+    err = err.decode('utf-8', 'replace')
+    # the profile is the last thing written to stderr
+    begin = err.find('\n{')
+    if begin < 0:
+        raise RuntimeError('no profile in the output of %s:\n%s'
+                           % (' '.join(cmd), err))
+    return (wall, json.loads(err[begin + 1:]))
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description='Benchmark a scan of a synthetic Django project')
+    add_arguments(ap)
+    ap.add_argument('--runs', type=int, default=3,
+                    help='scans to run, the median is recorded (default 3)')
+    ap.add_argument('-j', '--jobs', type=int, default=1,
+                    help='worker processes of the scan (default 1)')
+    ap.add_argument('--scan-arg', action='append', default=[],
+                    help='extra argument for djangoSCA.py, such as '
+                    '--scan-arg=--no-sniff')
+    ap.add_argument('--keep', metavar='DIR',
+                    help='generate the project into DIR and keep it')
+    ap.add_argument('-o', '--output',
+                    default=os.path.join(ROOT, 'bench', 'benchmark.json'),
+                    help='JSON results file (default bench/benchmark.json)')
+    args = ap.parse_args()
+
+    if args.keep:
+        projdir = args.keep
+        if not os.path.isdir(projdir):
+            generate_from_args(projdir, args)
+    else:
+        projdir = os.path.join(tempfile.mkdtemp(), 'project')
+        generate_from_args(projdir, args)
+    try:
+        runs = [scan(projdir, args.jobs, args.scan_arg)
+                for i in range(args.runs)]
+    finally:
+        if not args.keep:
+            shutil.rmtree(os.path.dirname(projdir))
+    runs.sort(key=lambda r: r[0])
+    (wall, profile) = runs[len(runs) // 2]
+
+    files = sum(e['files'] for e in profile['extensions'].values())
+    size = sum(e['bytes'] for e in profile['extensions'].values())
+    stages = profile['stages']
+    results = {
+        'commit': git_commit(),
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'project': dict((k, getattr(args, k)) for k in (
+            'apps', 'per_app', 'templates', 'template_lines', 'long_lines',
+            'minified', 'hit_ratio', 'seed')),
+        'jobs': args.jobs,
+        'scan_args': args.scan_arg,
+        'runs': args.runs,
+        'wall_seconds': wall,
+        'stages': dict((name, stages.get(stage, {}).get('seconds', 0.0))
+                       for (stage, name) in STAGES),
+        'files': files,
+        'bytes': size,
+        'files_per_second': files / max(wall, 1e-9),
+        'mb_per_second': size / 1048576.0 / max(wall, 1e-9),
+        'peak_rss_kb': peak_rss_kb(),
+        'extensions': profile['extensions'],
+    }
+    f = open(args.output, 'w')
+    json.dump(results, f, sort_keys=True, indent=1)
+    f.write('\n')
+    f.close()
+
+    sys.stdout.write('[*] %d files, %.2f MB, median of %d runs\n'
+                     % (files, size / 1048576.0, args.runs))
+    sys.stdout.write('    wall time........: %8.3fs\n' % (wall))
+    for (stage, name) in STAGES:
+        sys.stdout.write('    %-17s: %8.3fs\n'
+                         % (name, results['stages'][name]))
+    sys.stdout.write('    files/sec........: %8.1f\n'
+                     % (results['files_per_second']))
+    sys.stdout.write('    MB/sec...........: %8.2f\n'
+                     % (results['mb_per_second']))
+    if results['peak_rss_kb'] is not None:
+        sys.stdout.write('    peak RSS.........: %8d kB\n'
+                         % (results['peak_rss_kb']))
+    sys.stdout.write('[*] results written to [%s]\n' % (args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+"""
+Benchmark the template rules run against the tags found by the
+TemplateLexer, against the previous path which classified a file with
+one regular expression per line and ran every template rule over every
+line.  Synthetic HTML templates and Python sources are generated in
+memory, as every file of a project goes through template detection.
+
+usage: python bench/template_lexer.py [rules file] [files] [lines per file]
+"""
+
+import os
+import re
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from djangoSCAclasses.RuleSet import RuleSet
+from djangoSCAclasses.TemplateLexer import TemplateLexer
+
+SAMPLE_LINES = [
+    '<div class="container"><div class="row"><div class="col-md-12">',
+    '  <p class="lead">Lorem ipsum dolor sit amet, consectetur adipiscing '
+    'elit, sed do eiusmod tempor incididunt ut labore et dolore.</p>',
+    '  <a href="{% url "detail" object.pk %}">{{ object.title }}</a>',
+    '  {% for item in items %}<span>{{ item.name|title }}</span>{% endfor %}',
+    '  <p>{{ object.body|safe }}</p>',
+    '  {# a comment #}',
+    '</div></div></div>',
+    '',
+]
+
+PYTHON_LINES = [
+    'from django.db import models',
+    '    name = models.CharField(max_length=100)',
+    '    def get_absolute_url(self):',
+    '        return reverse("detail", args=[self.pk])',
+    '        context = {"items": items, "page": page}',
+    '',
+]
+
+
+def line_path(rules, lines):
+    # the pre-lexer implementation: classify, then grep per rule
+    template_rxp = re.compile(r'{%|%}|{{|}}')
+    istemplate = False
+    for line in lines:
+        if template_rxp.match(line):
+            istemplate = True
+            break
+    hits = []
+    for (p, rule) in rules:
+        hits.append([i for (i, line) in enumerate(lines, 1)
+                     if re.match(p.pattern, line)])
+    return (istemplate, hits)
+
+
+def token_path(matcher, lexer, lines):
+    hits = matcher.hits()
+    istemplate = False
+    for (lineno, line) in enumerate(lines, 1):
+        for (kind, text, tagline) in lexer.tags(line, lineno):
+            istemplate = True
+            matcher.match(lineno, text, hits)
+    return (istemplate, hits)
+
+
+def main():
+    rulesfile = 'djangoSCA.rules'
+    nfiles = 500
+    nlines = 400
+    if len(sys.argv) > 1:
+        rulesfile = sys.argv[1]
+    if len(sys.argv) > 2:
+        nfiles = int(sys.argv[2])
+    if len(sys.argv) > 3:
+        nlines = int(sys.argv[3])
+
+    matcher = RuleSet(rulesfile).matcher('template')
+    lexer = TemplateLexer()
+    random.seed(0)
+    for (kind, sample) in (('html', SAMPLE_LINES), ('python', PYTHON_LINES)):
+        files = [[random.choice(sample) for i in range(nlines)]
+                 for n in range(nfiles)]
+
+        start = time.time()
+        for lines in files:
+            line_path(matcher.rules, lines)
+        old = time.time() - start
+
+        start = time.time()
+        for lines in files:
+            token_path(matcher, lexer, lines)
+        new = time.time() - start
+
+        sys.stdout.write('[%s] %d template rules, %d files x %d lines\n'
+                         % (kind, len(matcher.rules), nfiles, nlines))
+        sys.stdout.write('    per-line grep....: %.3fs\n' % (old))
+        sys.stdout.write('    lexer tokens.....: %.3fs (%.1fx)\n'
+                         % (new, old / max(new, 1e-9)))
+
+
+if __name__ == '__main__':
+    main()
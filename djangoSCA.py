@@ -2,42 +2,17 @@
 
 import sys
 import os
-import re
 import datetime
 import argparse
-from djangoSCAclasses.ContentReader import ContentReader
-from djangoSCAclasses.SettingsCheck import SettingsCheck
-from djangoSCAclasses.MyParser import MyParser
 
+# the analysis modules are only imported once the arguments are parsed,
+# and those that only some runs need (git, the daemon and its client,
+# the result cache, multiprocessing) where they are used, so that
+# startup stays fast for the many short runs made from hooks, and for
+# --help and --connect
 
-class DjangoFileCheck(ContentReader):
-
-    """
-    This class extends the base ContentReader class to
-    include the core 'parseme()' method.  In turn, this will
-    parse a Python source file with .py extension using the
-    abstract syntax tree (AST).  It will then sequentially
-    parse files ending with .py, .html, and .txt with a regular
-    expression parser as well as performing a crossdomain.xml
-    file check.
-    """
-    def __init__(self, projdir, fullpath, rulesfile, filehandle):
-        try:
-            ContentReader.__init__(self, projdir, fullpath)
-        except:
-            raise
-        self.rulesfile = rulesfile
-        self.filehandle = filehandle
-
-    def parseme(self):
-        try:
-            parser = MyParser(self.rulesfile, self.filehandle)
-        except:
-            raise
-        if re.match(r'.+\.py$', self.shortname):
-            parser.ast_parse(self.shortname, self.content)
-        parser.nonast_parse(self.projdir, self.shortname, self.content)
-        return parser.print_warnings()
+# the report formats, the names of Reporter.REPORTERS
+FORMATS = ('jsonl', 'sarif', 'text')
 
 
 def spin_thing(outFH, i):
@@ -51,25 +26,126 @@ def spin_thing(outFH, i):
     return i + 1
 
 
-def show_summary(outFH, fext, fwarn):
-    out = '\n[*] Stage 2: File Analysis Summary\n'
-    for k in sorted(fext.iterkeys()):
-        out += '    [-] Extension [.%-4s]: %6d files, %4d warnings\n' % \
-            (k, fext[k], fwarn[k])
-    out += """\
-    [+] template files are identified by regular expression match.
-    [+] many xml files may exist, but only crossdomain.xml is analyzed.
-    [+] all python scripts will be analyzed."""
-    if outFH != sys.stdout:
+def show_summary(outFH, fext, fwarn, console=sys.stdout):
+    from djangoSCAclasses.Reporter import summary_text
+    out = summary_text(fext, fwarn)
+    if outFH != console and outFH != sys.stdout:
         outFH.write(out)
-    sys.stdout.write(out)
+    console.write(out)
+
+
+def finish(outFH, console, fmt, fext, fwarn):
+    if fmt == 'text':
+        show_summary(outFH, fext, fwarn)
+    else:
+        show_summary(console, fext, fwarn, console)
+    console.write('\n[*] Test Complete\n')
+    if all(v == 0 for v in fwarn.values()):
+        sys.exit(0)
+    else:
+        sys.exit(1)
+
+
+def git_changed_files(base_dir, ref):
+    """
+    Return paths relative to base_dir that were added, copied, modified or
+    renamed since ref, including uncommitted and untracked files.
+    """
+    commands = [
+        ['git', 'diff', '--name-only', '--relative', '--diff-filter=ACMR',
+         ref, '--'],
+        ['git', 'ls-files', '--others', '--exclude-standard'],
+    ]
+    import subprocess
+    paths = []
+    for cmd in commands:
+        try:
+            p = subprocess.Popen(cmd, cwd=base_dir, stdout=subprocess.PIPE,
+                                 stderr=subprocess.PIPE)
+        except OSError as e:
+            sys.stderr.write('failed to run git: %s\n' % (e))
+            sys.exit(1)
+        (out, err) = p.communicate()
+        if p.returncode != 0:
+            sys.stderr.write('git failed: %s' % (err))
+            sys.exit(1)
+        paths.extend(sorted(line for line in out.splitlines() if line))
+    return paths
+
+
+def read_file_list(listfile):
+    if listfile == '-':
+        fh = sys.stdin
+    else:
+        try:
+            fh = open(listfile, 'r')
+        except:
+            sys.stderr.write('failed to open file list')
+            sys.exit(1)
+    paths = [line.strip() for line in fh if line.strip()]
+    if fh != sys.stdin:
+        fh.close()
+    return paths
+
+
+def split_patterns(values):
+    # --select and --exclude may be repeated, and take comma separated lists
+    return [p.strip() for v in values or [] for p in v.split(',')
+            if p.strip()]
+
+
+def load_rules(args):
+    # the rules file is parsed and compiled exactly once per scan
+    from djangoSCAclasses.RuleSet import RuleSet
+    try:
+        ruleset = RuleSet(args.rules, split_patterns(args.select),
+                          split_patterns(args.exclude))
+    except:
+        raise
+    for (id, pattern, risk) in ruleset.risky:
+        sys.stderr.write('[!] rule [%s] pattern [%s] risks slow matching: %s\n'
+                         % (id, pattern, risk))
+    return ruleset
+
+
+def load_baseline(filename):
+    if not filename:
+        return None
+    from djangoSCAclasses.Baseline import Baseline
+    try:
+        return Baseline.load(filename)
+    except IOError as e:
+        sys.stderr.write('failed to read baseline: %s\n' % (e))
+        sys.exit(1)
+
 
+def open_cache(args, ruleset):
+    if args.no_cache:
+        return None
+    from djangoSCAclasses.ResultCache import ResultCache
+    try:
+        return ResultCache(args.cache_dir, ruleset, args.cache_size)
+    except:
+        raise
+
+
+def open_pool(args, ruleset, profiler, cache):
+    from djangoSCAclasses.ScanPool import ScanPool
+    try:
+        pool = ScanPool(ruleset, args.jobs, cache=cache,
+                        max_size=args.max_file_size, profiler=profiler,
+                        timeouts=(args.file_timeout, args.rule_timeout),
+                        io_threads=args.io_threads, io_depth=args.io_depth)
+    except:
+        raise
+    return pool
+
+
+def default_cache_dir():
+    base = os.environ.get('XDG_CACHE_HOME',
+                          os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'djangoSCA')
 
-def get_settings_path(base_dir):
-    for root, dirs, files in os.walk(base_dir):
-        for f in files:
-            if f.endswith("settings.py"):
-                return os.path.dirname(os.path.join(root, f))
 
 # start of main code
 if __name__ == "__main__":
@@ -95,21 +171,170 @@ djangoSCA.py -r <rules file> -o <output file> <Django Project Dir>
 Version %s, Author: Joff Thyer, (c) 2013"""
         % (VERSION), description=desc)
 
-    ap.add_argument('DjangoProjectDir', help='Django Project Directory')
+    ap.add_argument('DjangoProjectDir', nargs='?',
+                    help='Django Project Directory')
     ap.add_argument('-s', '--settings', default='settings.py',
                     help='Django settings.py ("settings.py" is the default)')
     ap.add_argument('-i', '--ignore', action='append',
-                    help='Ignore directories. eg, --ignore foo --ignore bar')
+                    help='Ignore directories and files matching a glob or '
+                    + '.gitignore style pattern. eg, --ignore foo '
+                    + '--ignore "static/vendor" --ignore "*.min.html"')
+    ap.add_argument('--gitignore', action='store_true',
+                    help='Also ignore the files excluded by the .gitignore '
+                    'files of the project')
+    ap.add_argument('--no-sniff', action='store_true',
+                    help='Analyze files which look binary or minified')
+    ap.add_argument('--archives', action='store_true',
+                    help='Also scan the files inside .whl, .egg, .zip and '
+                    '.tar(.gz) archives, without extracting them, reported '
+                    'as archive!member')
     ap.add_argument('-r', '--rules', default='/usr/local/etc/djangoSCA.rules',
                     help='DjangoSCA Rules File (default is "djangoSCA.rules")')
     ap.add_argument('-o', '--output',
                     help='Output Text File (default output to screen)')
+    ap.add_argument('-f', '--format', default='text',
+                    choices=FORMATS,
+                    help='Report format (default is "text")')
+    ap.add_argument('-j', '--jobs', type=int, default=1,
+                    help='Stage 2 worker processes (0 uses all CPUs)')
+    ap.add_argument('--io-threads', type=int, default=2, metavar='N',
+                    help='Threads reading files ahead of a serial Stage 2 '
+                    '(default 2, 0 reads each file when analyzed)')
+    ap.add_argument('--io-depth', type=int, default=32, metavar='N',
+                    help='Read at most N files ahead (default 32)')
+    ap.add_argument('--cache-dir', default=default_cache_dir(),
+                    help='Result cache directory (default ~/.cache/djangoSCA)')
+    ap.add_argument('--cache-size', type=int, default=200000,
+                    help='Maximum number of cached file results')
+    ap.add_argument('--no-cache', action='store_true',
+                    help='Do not read or write the result cache')
+    ap.add_argument('--max-file-size', type=int, default=0, metavar='BYTES',
+                    help='Skip files larger than BYTES (default no limit)')
+    ap.add_argument('--file-timeout', type=float, default=30.0,
+                    metavar='SECONDS',
+                    help='Stop analyzing a file after SECONDS (0 for no limit)')
+    ap.add_argument('--rule-timeout', type=float, default=5.0,
+                    metavar='SECONDS',
+                    help='Stop running a rule on the long lines of a file '
+                    'after SECONDS (0 for no limit)')
+    ap.add_argument('--select', action='append', metavar='RULES',
+                    help='Only run the rules whose id, section or category '
+                    'matches one of the comma separated RULES, such as '
+                    '"general-003", "template", "settings_*" or '
+                    '"OWASP-CR-InputValidation"')
+    ap.add_argument('--exclude', action='append', metavar='RULES',
+                    help='Do not run the rules matching RULES, as for '
+                    '--select')
+    ap.add_argument('--profile', nargs='?', const='text',
+                    choices=['text', 'json'],
+                    help='Write stage and rule timings to stderr')
+    ap.add_argument('--poll', type=float, default=2.0, metavar='SECONDS',
+                    help='With --daemon, walk the project for changes '
+                    'every SECONDS')
+    mode = ap.add_mutually_exclusive_group()
+    mode.add_argument('--daemon', metavar='SOCKET',
+                      help='Keep rules and results in memory, and serve '
+                      'scan requests on the Unix socket SOCKET')
+    mode.add_argument('--connect', metavar='SOCKET',
+                      help='Ask the daemon listening on SOCKET for the report')
+    mode.add_argument('--batch', metavar='MANIFEST',
+                      help='Scan every project listed in the JSON file '
+                      'MANIFEST, writing a report for each to --report-dir')
+    ap.add_argument('--baseline', metavar='FILE',
+                    help='Do not report the Stage 2 findings whose '
+                    'fingerprints are listed in FILE')
+    ap.add_argument('--write-baseline', metavar='FILE',
+                    help='Write the fingerprints of all the Stage 2 '
+                    'findings of a full scan to FILE')
+    ap.add_argument('--report-dir', default='.',
+                    help='With --batch, the directory of the project '
+                    'reports and summary.txt (default is ".")')
+    diff = ap.add_mutually_exclusive_group()
+    diff.add_argument('--since', metavar='REF',
+                      help='Only scan files changed since a git ref')
+    diff.add_argument('--files-from', metavar='LIST',
+                      help='Only scan files named in LIST ("-" for stdin)')
     args = ap.parse_args()
 
+    if args.write_baseline and (args.batch or args.daemon or args.connect or
+                                args.since or args.files_from):
+        ap.error('--write-baseline needs a full scan of a single project')
+    if args.baseline and args.connect:
+        ap.error('--baseline is given to the --daemon')
+    if args.archives and (args.daemon or args.connect):
+        ap.error('--archives is not supported by the --daemon')
+
+    if args.batch:
+        if args.DjangoProjectDir or args.since or args.files_from or \
+                args.output:
+            ap.error('--batch reads the projects from its manifest, and '
+                     'writes their reports to --report-dir')
+        from djangoSCAclasses.BatchScan import BatchScan, load_manifest
+        from djangoSCAclasses.Profiler import Profiler, timer
+        try:
+            projects = load_manifest(args.batch)
+        except (IOError, ValueError) as e:
+            sys.stderr.write('failed to read manifest: %s\n' % (e))
+            sys.exit(1)
+        if not os.path.isdir(args.report_dir):
+            os.makedirs(args.report_dir)
+        sys.stdout.write('[*] %s Version %s\n[*] Author: Joff Thyer, (c) 2013\n'
+                         '[*] Batch scan of %d projects\n'
+                         % (TITLE, VERSION, len(projects)))
+        profiler = None
+        if args.profile:
+            profiler = Profiler()
+            scan_start = timer()
+        ruleset = load_rules(args)
+        if profiler is not None:
+            profiler.stage('rules', timer() - scan_start)
+        baseline = load_baseline(args.baseline)
+        pool = open_pool(args, ruleset, profiler, open_cache(args, ruleset))
+        batch = BatchScan(projects, ruleset, pool, TITLE, VERSION,
+                          args.format, args.report_dir, args.settings,
+                          args.ignore, args.gitignore,
+                          not args.no_sniff, profiler,
+                          datetime.datetime.now().strftime(
+                              '%Y-%m-%d %H:%M:%S'), sys.stdout, baseline,
+                          args.archives)
+        try:
+            (file_ext, file_ext_warnings) = batch.run()
+        finally:
+            pool.close()
+        if profiler is not None:
+            profiler.stage('total', timer() - scan_start)
+            profiler.report(sys.stderr, args.profile)
+        finish(sys.stdout, sys.stdout, 'text', file_ext, file_ext_warnings)
+
+    if not args.DjangoProjectDir:
+        ap.error('a Django Project Directory is required')
     if not os.path.isdir(args.DjangoProjectDir):
         sys.stderr.write('project directory does not exist')
         sys.exit(1)
 
+    if args.daemon:
+        from djangoSCAclasses.ScanDaemon import ScanDaemon
+        ruleset = load_rules(args)
+        daemon = ScanDaemon(args.DjangoProjectDir, ruleset, TITLE, VERSION,
+                            args.settings, args.ignore, args.max_file_size,
+                            (args.file_timeout, args.rule_timeout), args.poll,
+                            args.gitignore, not args.no_sniff,
+                            load_baseline(args.baseline))
+        sys.stderr.write('[*] %s serving [%s] on [%s]\n'
+                         % (TITLE, args.DjangoProjectDir, args.daemon))
+        try:
+            daemon.serve(args.daemon)
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
+    # in diff mode, only the named or changed files are analyzed
+    changed = None
+    if args.since:
+        changed = git_changed_files(args.DjangoProjectDir, args.since)
+    elif args.files_from:
+        changed = read_file_list(args.files_from)
+
     if args.output:
         try:
             outFH = open(args.output, 'w')
@@ -119,77 +344,169 @@ Version %s, Author: Joff Thyer, (c) 2013"""
     else:
         outFH = sys.stdout
 
-    outFH.write("""
-[*]___________________________________________________________
-[*]
-[*] %s Version %s
-[*] Author: Joff Thyer (c) 2013
-[*] Project Dir/Name..: %s
-[*] Date of Test......: %s
-[*]___________________________________________________________
-
-[*]---------------------------------
-[*] STAGE 1: Project Settings Tests
-[*]---------------------------------
-
-""" % (TITLE, VERSION, args.DjangoProjectDir,
-        datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+    # progress messages must not mix with a machine readable report
+    console = sys.stdout
+    if args.format != 'text' and outFH == sys.stdout:
+        console = sys.stderr
 
     if outFH != sys.stdout:
-        print """[*] %s Version %s
+        console.write("""[*] %s Version %s
 [*] Author: Joff Thyer, (c) 2013
-[*] Processing Stage 1: [settings.py]""" % (TITLE, VERSION)
+[*] Processing Stage 1: [settings.py]
+""" % (TITLE, VERSION))
 
-    try:
-        SettingsCheck(get_settings_path(args.DjangoProjectDir) + "/"
-                      + args.settings, args.rules, outFH)
-    except:
-        raise
+    if args.connect:
+        from djangoSCAclasses.ScanClient import ScanClient
+        try:
+            (report, file_ext, file_ext_warnings) = \
+                ScanClient(args.connect).scan(
+                    args.DjangoProjectDir, changed, args.format,
+                    datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        except IOError as e:
+            sys.stderr.write('%s\n' % (e))
+            sys.exit(2)
+        outFH.write(report)
+        finish(outFH, console, args.format, file_ext, file_ext_warnings)
+
+    from djangoSCAclasses.SettingsCheck import SettingsCheck
+    from djangoSCAclasses.Reporter import REPORTERS
+    from djangoSCAclasses.Profiler import Profiler, timer
+    from djangoSCAclasses.ProjectFiles import FILE_RXP, select_files, \
+        changed_settings_path
+    from djangoSCAclasses.FileInventory import FileInventory
+    from djangoSCAclasses.SymbolIndex import build_index
+    from djangoSCAclasses.Baseline import write_baseline
+    from djangoSCAclasses.MyParser import stage_selected
 
-    outFH.write("""
+    profiler = None
+    if args.profile:
+        profiler = Profiler()
+        scan_start = timer()
 
-[*]---------------------------------------------
-[*] STAGE 2: Testing ALL directories and files
-[*] .... Warning - This may take some time ....
-[*]---------------------------------------------
+    ruleset = load_rules(args)
+    if profiler is not None:
+        profiler.stage('rules', timer() - scan_start)
+    baseline = load_baseline(args.baseline)
+    written = None
+    if args.write_baseline:
+        written = []
 
-""")
+    reporter = REPORTERS[args.format](outFH, ruleset, TITLE, VERSION)
+    reporter.start(args.DjangoProjectDir,
+                   datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+
+    cache = open_cache(args, ruleset)
+    inventory = None
+    if changed is None:
+        if profiler is not None:
+            start = timer()
+        inventory = FileInventory(args.DjangoProjectDir, args.ignore,
+                                  FILE_RXP, args.gitignore,
+                                  not args.no_sniff, args.archives)
+        if profiler is not None:
+            profiler.stage('walk', timer() - start)
+        settings_path = inventory.settings_path
+    else:
+        read = None
+        if cache is not None:
+            read = cache.settings_files(args.DjangoProjectDir, args.settings)
+        settings_path = changed_settings_path(args.DjangoProjectDir, changed,
+                                              args.settings, read)
+
+    if profiler is not None:
+        start = timer()
+
+    if changed is not None and settings_path is None:
+        reporter.note('Settings file unchanged, Stage 1 skipped.')
+    elif settings_path is None:
+        reporter.note('No settings module found, Stage 1 skipped.')
+    else:
+        try:
+            sc = SettingsCheck(os.path.join(settings_path, args.settings),
+                               ruleset, reporter.settings_handle(),
+                               args.DjangoProjectDir)
+        except:
+            raise
+        reporter.settings(sc.findings)
+        if cache is not None:
+            cache.put_settings_files(args.DjangoProjectDir, args.settings,
+                                     settings_path, sc.files)
+    if profiler is not None:
+        profiler.stage('settings', timer() - start)
+
+    reporter.stage2()
+    files_selected = stage_selected(ruleset)
+    if not files_selected:
+        reporter.note('No file rules selected, Stage 2 skipped.')
 
     if outFH != sys.stdout:
-        sys.stdout.write('[*] Processing Stage 2: '
-                         + 'Full project directory recursion: [ ]\x08\x08')
-        sys.stdout.flush()
+        console.write('[*] Processing Stage 2: '
+                      'Full project directory recursion: [ ]\x08\x08')
+        console.flush()
 
     spincount = 0
-    rxp = re.compile(r'^[a-zA-Z0-9]+.+\.(py|html|txt|xml)$')
+    rxp = FILE_RXP
     file_ext = {}
     file_ext_warnings = {}
 
-    for root, dirs, files in os.walk(args.DjangoProjectDir, topdown=True):
-        if args.ignore:
-            exclude = set(args.ignore)
-            dirs[:] = [d for d in dirs if d not in exclude]
-        for f in files:
-            fullpath = root + '/' + f
-            m = rxp.match(f)
-            if not m:
-                continue
+    pool = open_pool(args, ruleset, profiler, cache)
 
-            spincount = spin_thing(outFH, spincount)
-            if m.group(1) not in file_ext:
-                file_ext[m.group(1)] = 0
-                file_ext_warnings[m.group(1)] = 0
-            file_ext[m.group(1)] += 1
-            try:
-                dfc = DjangoFileCheck(args.DjangoProjectDir,
-                                      fullpath, args.rules, outFH)
-                file_ext_warnings[m.group(1)] += dfc.parseme()
-            except:
-                raise
-
-    show_summary(outFH, file_ext, file_ext_warnings)
-    print '\n[*] Test Complete'
-    if all(v == 0 for v in file_ext_warnings.values()):
-        sys.exit(0)
+    index = None
+    if not files_selected:
+        files = []
+    elif inventory is not None:
+        files = [(path, ext) for (path, ext, size, mtime) in inventory.files]
+        if profiler is not None:
+            start = timer()
+        index = build_index(args.DjangoProjectDir, inventory.python,
+                            args.max_file_size)
+        if profiler is not None:
+            profiler.stage('index', timer() - start)
     else:
-        sys.exit(1)
+        files = select_files(args.DjangoProjectDir, changed, args.ignore, rxp,
+                             args.archives)
+        if profiler is not None:
+            files = profiler.timed('walk', files)
+    if profiler is not None:
+        start = timer()
+    try:
+        for (fullpath, ext, warnings) in \
+                pool.scan(args.DjangoProjectDir, files, index):
+            spincount = spin_thing(outFH, spincount)
+            if ext not in file_ext:
+                file_ext[ext] = 0
+                file_ext_warnings[ext] = 0
+            file_ext[ext] += 1
+            if written is not None:
+                written.extend(warnings)
+            if baseline is not None:
+                warnings = baseline.filter(warnings)
+            reporter.findings(warnings)
+            file_ext_warnings[ext] += len(warnings)
+    finally:
+        pool.close()
+    if profiler is not None:
+        profiler.stage('stage2', timer() - start)
+        profiler.stage('total', timer() - scan_start)
+        profiler.report(sys.stderr, args.profile)
+
+    if inventory is not None and (inventory.skipped['binary'] or
+                                  inventory.skipped['minified']):
+        reporter.note('Skipped %d binary and %d minified files.'
+                      % (inventory.skipped['binary'],
+                         inventory.skipped['minified']))
+    if inventory is not None and inventory.skipped['gitignore']:
+        reporter.note('Skipped %d files and directories excluded by '
+                      '.gitignore.' % (inventory.skipped['gitignore']))
+    if inventory is not None and inventory.skipped['archive']:
+        reporter.note('Skipped %d archives which could not be read.'
+                      % (inventory.skipped['archive']))
+    if baseline is not None and baseline.suppressed:
+        reporter.note('Suppressed %d findings of the baseline [%s].'
+                      % (baseline.suppressed, args.baseline))
+    if written is not None:
+        write_baseline(args.write_baseline, written, TITLE)
+        reporter.note('Wrote the fingerprints of %d findings to [%s].'
+                      % (len(written), args.write_baseline))
+    reporter.finish(file_ext, file_ext_warnings)
+    finish(outFH, console, args.format, file_ext, file_ext_warnings)
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+
+import os
+import re
+import time
+
+# the archive file names whose members are scanned, and those of them
+# which are tar archives rather than zip archives (wheels, eggs)
+ARCHIVE_RXP = re.compile(
+    r'^[a-zA-Z0-9].*\.(whl|egg|zip|tar|tgz|tar\.gz|tar\.bz2)$')
+TAR_RXP = re.compile(r'.*\.(tar|tgz|tar\.gz|tar\.bz2)$')
+
+# separates the path of an archive and the path of one of its members
+SEPARATOR = '!'
+
+# zipfile and tarfile are only imported once an archive is opened, as
+# most runs have none, and they add to the startup time of every run
+
+
+def archive_errors():
+    """
+    return the exceptions raised by a damaged or unsupported archive
+    """
+    import zlib
+    import tarfile
+    import zipfile
+    return (IOError, zipfile.BadZipfile, tarfile.TarError, EOFError,
+            zlib.error, RuntimeError, NotImplementedError, KeyError)
+
+
+def member_path(archive, member):
+    return archive + SEPARATOR + member
+
+
+def split_member(path):
+    """
+    return (archive, member) for the path of an archive member, as
+    made by member_path(), or None for the path of a plain file.
+    """
+    if SEPARATOR not in path:
+        return None
+    i = path.find(SEPARATOR)
+    while i != -1:
+        archive = path[:i]
+        if ARCHIVE_RXP.match(os.path.basename(archive)) and \
+                os.path.isfile(archive):
+            return (archive, path[i + 1:])
+        i = path.find(SEPARATOR, i + 1)
+    return None
+
+
+def member_name(name):
+    # member names as reported: utf-8 text, without a leading './'
+    if not isinstance(name, str):
+        name = name.encode('utf-8')
+    while name.startswith('./'):
+        name = name[2:]
+    return name
+
+
+class ArchiveTree(object):
+
+    """
+    This class lists the regular files of a zip archive (including
+    wheels and eggs) or a tar archive (compressed or not, such as an
+    sdist), so that their members can be scanned as a tree of virtual
+    files named archive!member, without extracting them.  self.members
+    holds (name, size, mtime) for each member in archive order.
+    read() returns the content of one member, which for a compressed
+    tar archive means decompressing it up to that member, while
+    stream() reads every member once in archive order, which is how
+    read_members() serves a scan.  get() keeps the listing of each
+    archive for the life of the process, until the archive changes.
+    Damaged archives raise IOError.
+    """
+
+    listed = {}
+
+    def __init__(self, path):
+        self.path = path
+        self.istar = TAR_RXP.match(path) is not None
+        self.members = []
+        self.sizes = {}
+        self.entries = {}
+        try:
+            if self.istar:
+                self.__list_tar()
+            else:
+                self.__list_zip()
+        except archive_errors() as e:
+            raise IOError('archive [%s] could not be read: %s' % (path, e))
+
+    @staticmethod
+    def get(path):
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            raise IOError(str(e))
+        stamp = (st.st_mtime, st.st_size)
+        tree = ArchiveTree.listed.get(path)
+        if tree is None or tree.stamp != stamp:
+            tree = ArchiveTree(path)
+            tree.stamp = stamp
+            ArchiveTree.listed[path] = tree
+        return tree
+
+    def __add(self, name, size, mtime, entry):
+        name = member_name(name)
+        if name in self.sizes:
+            return
+        self.members.append((name, size, mtime))
+        self.sizes[name] = size
+        self.entries[name] = entry
+
+    def __list_zip(self):
+        import zipfile
+        zf = zipfile.ZipFile(self.path)
+        try:
+            for info in zf.infolist():
+                if info.filename.endswith('/'):
+                    continue
+                try:
+                    mtime = time.mktime(info.date_time + (0, 0, -1))
+                except (ValueError, OverflowError):
+                    mtime = 0
+                self.__add(info.filename, info.file_size, mtime, info)
+        finally:
+            zf.close()
+
+    def __list_tar(self):
+        import tarfile
+        tf = tarfile.open(self.path, 'r|*')
+        try:
+            for info in tf:
+                if info.isfile():
+                    self.__add(info.name, info.size, info.mtime, info.name)
+                # a streamed archive would otherwise keep every entry
+                tf.members = []
+        finally:
+            tf.close()
+
+    def size(self, name):
+        if name not in self.sizes:
+            raise IOError('[%s] is not a member of archive [%s]'
+                          % (name, self.path))
+        return self.sizes[name]
+
+    def read(self, name):
+        """
+        return the content of the member name.
+        """
+        self.size(name)
+        import tarfile
+        import zipfile
+        try:
+            if not self.istar:
+                zf = zipfile.ZipFile(self.path)
+                try:
+                    return zf.read(self.entries[name])
+                finally:
+                    zf.close()
+            tf = tarfile.open(self.path, 'r:*')
+            try:
+                return tf.extractfile(self.entries[name]).read()
+            finally:
+                tf.close()
+        except archive_errors() as e:
+            raise IOError('archive [%s] member [%s] could not be read: %s'
+                          % (self.path, name, e))
+
+    def stream(self):
+        """
+        yield (name, size, read) for each member in archive order, read
+        being a function returning the content of the member, which
+        must be called before the next member is asked for.
+        """
+        import tarfile
+        import zipfile
+        if not self.istar:
+            zf = zipfile.ZipFile(self.path)
+            try:
+                for (name, size, mtime) in self.members:
+                    info = self.entries[name]
+                    yield (name, size, lambda: zf.read(info))
+            finally:
+                zf.close()
+            return
+        tf = tarfile.open(self.path, 'r|*')
+        try:
+            for info in tf:
+                tf.members = []
+                if not info.isfile():
+                    continue
+                yield (member_name(info.name), info.size,
+                       lambda: tf.extractfile(info).read())
+        finally:
+            tf.close()
+
+
+def read_members(items, path, max_size=0):
+    """
+    yield (item, content) for each item, path(item) being the name of
+    its file, where content is that of the archive members, read here
+    in order with a single pass over each archive, and None for plain
+    files.  Items are expected in the order of ArchiveTree.members, as
+    FileInventory lists them; members found out of order, or larger
+    than max_size, are yielded with a content of None and left to be
+    read on their own (see ContentReader).
+    """
+    archive = None
+    stream = None
+    try:
+        for item in items:
+            member = split_member(path(item))
+            if member is None:
+                yield (item, None)
+                continue
+            if member[0] != archive:
+                if stream is not None:
+                    stream.close()
+                archive = member[0]
+                try:
+                    stream = ArchiveTree.get(archive).stream()
+                except archive_errors():
+                    stream = None
+            content = None
+            if stream is not None:
+                try:
+                    for (name, size, read) in stream:
+                        if name == member[1]:
+                            if not (max_size and size > max_size):
+                                content = read()
+                            break
+                    else:
+                        stream = None
+                except archive_errors():
+                    stream = None
+            yield (item, content)
+    finally:
+        if stream is not None:
+            stream.close()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+
+import re
+import hashlib
+
+# an inline suppression, as in '# djangosca: ignore[general-003]', or
+# '# djangosca: ignore' for every rule; '{# ... #}' works in templates
+IGNORE_RXP = re.compile(r'#\s*djangosca:\s*ignore(?:\[([^\]]*)\])?', re.I)
+
+# runs of white space, collapsed by normalize()
+SPACE_RXP = re.compile(r'\s+')
+
+
+def normalize(text):
+    return SPACE_RXP.sub(' ', text).strip()
+
+
+def inline_ignored(text, rule_id):
+    """
+    return whether a line suppresses findings of rule_id on itself.
+    """
+    if 'djangosca' not in text.lower():
+        return False
+    for m in IGNORE_RXP.finditer(text):
+        if m.group(1) is None:
+            return True
+        if rule_id in [r.strip() for r in m.group(1).split(',')]:
+            return True
+    return False
+
+
+def mark_findings(findings, lines):
+    """
+    drop the findings suppressed by an inline comment, and set the
+    fingerprint of the others.  lines maps the line numbers of the
+    findings to their text.  A fingerprint is a hash of the rule (its
+    section and pattern for a rule of the rules file, whose id changes
+    when a rule before it is added or removed, or the id of a built in
+    rule), the file short name, the line text with white space
+    normalized (or the message for findings without a line), and the
+    number of identical findings before it in the file, so it survives
+    lines moving up or down the file, and re-indentation.
+    """
+    marked = []
+    seen = {}
+    for f in findings:
+        text = lines.get(f.line) if f.line is not None else None
+        if text is not None and inline_ignored(text, f.rule.id):
+            continue
+        if text is None:
+            text = f.message()
+        rule = f.rule.id
+        if f.rule.pattern is not None:
+            rule = '%s\0%s' % (f.rule.section, f.rule.pattern)
+        key = (rule, normalize(text))
+        n = seen.get(key, 0)
+        seen[key] = n + 1
+        f.fingerprint = hashlib.sha1('%s\0%s\0%s\0%d' % (
+            rule, f.filename, key[1], n)).hexdigest()[:20]
+        marked.append(f)
+    return marked
+
+
+class Baseline(object):
+
+    """
+    This class holds a set of accepted findings by their fingerprints
+    (see mark_findings()), so that findings already triaged are dropped
+    before they are reported, whatever lines they have moved to.  The
+    baseline file has a fingerprint per line, followed by the rule id,
+    file and message of the finding it was written for, as a reminder;
+    only the fingerprint is read back, into a set, so that the check of
+    each finding is a constant time lookup however large the baseline.
+    Lines starting with '#' are comments.
+    """
+
+    def __init__(self, fingerprints=()):
+        self.fingerprints = set(fingerprints)
+        self.suppressed = 0
+
+    @staticmethod
+    def load(filename):
+        f = open(filename, 'r')
+        try:
+            return Baseline(line.split(None, 1)[0] for line in f
+                            if line.strip() and not line.startswith('#'))
+        finally:
+            f.close()
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def __contains__(self, finding):
+        return finding.fingerprint in self.fingerprints
+
+    def filter(self, findings):
+        """
+        return the findings which are not in the baseline, counting the
+        others in self.suppressed.
+        """
+        if not self.fingerprints:
+            return findings
+        kept = [f for f in findings if f.fingerprint not in self.fingerprints]
+        self.suppressed += len(findings) - len(kept)
+        return kept
+
+
+def write_baseline(filename, findings, title=''):
+    """
+    write the fingerprints of findings to a baseline file.
+    """
+    f = open(filename, 'w')
+    try:
+        f.write('# %s baseline: fingerprint rule file:line message\n'
+                % (title))
+        for w in findings:
+            if w.fingerprint is None:
+                continue
+            f.write('%s %s %s:%s %s\n'
+                    % (w.fingerprint, w.rule.id, w.filename,
+                       w.line if w.line is not None else '-',
+                       w.message().replace('\n', ' ')))
+    finally:
+        f.close()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+
+import os
+import json
+from djangoSCAclasses.SettingsCheck import SettingsCheck
+from djangoSCAclasses.Reporter import REPORTERS, summary_text
+from djangoSCAclasses.Profiler import timer
+from djangoSCAclasses.ProjectFiles import FILE_RXP
+from djangoSCAclasses.FileInventory import FileInventory
+from djangoSCAclasses.SymbolIndex import build_index
+from djangoSCAclasses.Baseline import Baseline
+from djangoSCAclasses.MyParser import stage_selected
+
+# report file extension of each format
+REPORT_EXT = {'text': '.txt', 'jsonl': '.jsonl', 'sarif': '.sarif'}
+
+
+def load_manifest(filename):
+    """
+    Read a batch manifest, a JSON list with an entry for each project,
+    either the project directory alone or an object such as:
+
+        {"project": "services/billing", "settings": "production.py",
+         "ignore": ["vendor", "*.min.html"], "output": "billing.txt",
+         "baseline": "services/billing/.djangosca-baseline"}
+
+    Relative paths are relative to the manifest.  Return a list of
+    dictionaries with all the keys set, None where not given.
+    """
+    f = open(filename, 'r')
+    try:
+        entries = json.load(f)
+    finally:
+        f.close()
+    if not isinstance(entries, list):
+        raise ValueError('manifest [%s] is not a list of projects'
+                         % (filename))
+    base = os.path.dirname(os.path.abspath(filename))
+    projects = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            entry = {'project': entry}
+        if not entry.get('project'):
+            raise ValueError('manifest [%s] entry without a project: %r'
+                             % (filename, entry))
+        ignore = entry.get('ignore')
+        if ignore is not None and not isinstance(ignore, list):
+            ignore = [ignore]
+        baseline = entry.get('baseline')
+        if baseline:
+            baseline = os.path.join(base, baseline)
+        projects.append({
+            'project': os.path.join(base, entry['project']),
+            'settings': entry.get('settings'),
+            'ignore': ignore,
+            'output': entry.get('output'),
+            'baseline': baseline,
+        })
+    return projects
+
+
+class BatchScan(object):
+
+    """
+    This class scans many projects in one run, sharing the compiled
+    RuleSet, and the worker processes and result cache of one ScanPool.
+    Each project of the manifest (see load_manifest()) has its own
+    settings module name and ignore patterns, which add to the default
+    ignore patterns, and gets its own report, written to report_dir and
+    named after the project directory unless the manifest names it.
+    Every project is first inventoried (see FileInventory) and indexed
+    (see SymbolIndex), then the files of all the projects are scanned
+    as one sequence by the pool, so that workers are never idle between
+    projects.  The settings checks of each project run in this process
+    with their own SettingsCheck, when the project's turn comes in the
+    report order.
+    With archives set, the members of the archives of every project
+    are scanned as well (see FileInventory).
+    Stage 2 findings are filtered by the project's own baseline when
+    the manifest names one, and by the baseline given otherwise.
+    A project whose directory is missing, or whose settings module
+    or baseline cannot be found or read, gets a report saying so rather
+    than ending the batch.  run() returns the per extension file and
+    warning counts over all the projects, and writes the list of
+    projects with their counts and an aggregate summary to
+    report_dir/summary.txt.
+    """
+
+    def __init__(self, projects, ruleset, pool, title, version,
+                 fmt='text', report_dir='.', settings='settings.py',
+                 ignore=None, gitignore=False, sniff=True, profiler=None,
+                 date='', console=None, baseline=None, archives=False):
+        self.projects = projects
+        self.ruleset = ruleset
+        self.pool = pool
+        self.title = title
+        self.version = version
+        self.format = fmt
+        self.report_dir = report_dir
+        self.settings = settings
+        self.ignore = ignore or []
+        self.gitignore = gitignore
+        self.sniff = sniff
+        self.profiler = profiler
+        self.date = date
+        self.console = console
+        self.baseline = baseline
+        self.archives = archives
+        self.results = []
+
+    def report_path(self, project, used):
+        name = project['output']
+        if not name:
+            base = os.path.basename(os.path.normpath(project['project']))
+            name = base + REPORT_EXT[self.format]
+            i = 2
+            while name in used:
+                name = '%s-%d%s' % (base, i, REPORT_EXT[self.format])
+                i += 1
+        used.add(name)
+        return os.path.join(self.report_dir, name)
+
+    def inventory(self, project):
+        if self.profiler is not None:
+            start = timer()
+        walk = FileInventory(project['project'],
+                             self.ignore + (project['ignore'] or []),
+                             FILE_RXP, self.gitignore, self.sniff,
+                             self.archives)
+        if self.profiler is not None:
+            self.profiler.stage('walk', timer() - start)
+        return walk
+
+    def load_baseline(self, project, reporter):
+        if not project['baseline']:
+            if self.baseline is not None:
+                self.baseline.suppressed = 0
+            return self.baseline
+        try:
+            return Baseline.load(project['baseline'])
+        except IOError as e:
+            reporter.note('Baseline could not be read: %s' % (e))
+            return None
+
+    def check_settings(self, project, walk, reporter):
+        if not os.path.isdir(project['project']):
+            reporter.note('Project directory does not exist, '
+                          'Stage 1 skipped.')
+            return
+        if walk.settings_path is None:
+            reporter.note('No settings module found, Stage 1 skipped.')
+            return
+        if self.profiler is not None:
+            start = timer()
+        try:
+            sc = SettingsCheck(os.path.join(walk.settings_path,
+                                            project['settings'] or
+                                            self.settings),
+                               self.ruleset, reporter.settings_handle(),
+                               project['project'])
+        except EnvironmentError as e:
+            reporter.note('Settings module could not be read, '
+                          'Stage 1 skipped: %s' % (e))
+            return
+        finally:
+            if self.profiler is not None:
+                self.profiler.stage('settings', timer() - start)
+        reporter.settings(sc.findings)
+
+    def run(self):
+        used = set()
+        walks = []
+        files_selected = stage_selected(self.ruleset)
+        for project in self.projects:
+            walk = self.inventory(project)
+            files = []
+            index = None
+            if files_selected:
+                files = [(path, ext)
+                         for (path, ext, size, mtime) in walk.files]
+                if self.profiler is not None:
+                    start = timer()
+                index = build_index(project['project'], walk.python,
+                                    self.pool.max_size)
+                if self.profiler is not None:
+                    self.profiler.stage('index', timer() - start)
+            walks.append((project, walk, files, index))
+
+        total_ext = {}
+        total_warnings = {}
+        results = self.pool.scan_projects(
+            [(p['project'], f, i) for (p, w, f, i) in walks])
+        for (project, walk, files, index) in walks:
+            path = self.report_path(project, used)
+            outFH = open(path, 'w')
+            try:
+                reporter = REPORTERS[self.format](outFH, self.ruleset,
+                                                  self.title, self.version)
+                reporter.start(project['project'], self.date)
+                self.check_settings(project, walk, reporter)
+                baseline = self.load_baseline(project, reporter)
+                reporter.stage2()
+                if not files_selected:
+                    reporter.note('No file rules selected, Stage 2 skipped.')
+                file_ext = {}
+                file_ext_warnings = {}
+                for i in range(len(files)):
+                    (fullpath, ext, warnings) = next(results)
+                    if ext not in file_ext:
+                        file_ext[ext] = 0
+                        file_ext_warnings[ext] = 0
+                    file_ext[ext] += 1
+                    if baseline is not None:
+                        warnings = baseline.filter(warnings)
+                    reporter.findings(warnings)
+                    file_ext_warnings[ext] += len(warnings)
+                if walk.skipped['binary'] or walk.skipped['minified']:
+                    reporter.note('Skipped %d binary and %d minified files.'
+                                  % (walk.skipped['binary'],
+                                     walk.skipped['minified']))
+                if walk.skipped['gitignore']:
+                    reporter.note('Skipped %d files and directories '
+                                  'excluded by .gitignore.'
+                                  % (walk.skipped['gitignore']))
+                if walk.skipped['archive']:
+                    reporter.note('Skipped %d archives which could not be '
+                                  'read.' % (walk.skipped['archive']))
+                if baseline is not None and baseline.suppressed:
+                    reporter.note('Suppressed %d findings of the baseline.'
+                                  % (baseline.suppressed))
+                reporter.finish(file_ext, file_ext_warnings)
+                if self.format == 'text':
+                    outFH.write(summary_text(file_ext, file_ext_warnings))
+            finally:
+                outFH.close()
+            for ext in file_ext:
+                total_ext[ext] = total_ext.get(ext, 0) + file_ext[ext]
+                total_warnings[ext] = total_warnings.get(ext, 0) + \
+                    file_ext_warnings[ext]
+            nfiles = sum(file_ext.values())
+            nwarnings = sum(file_ext_warnings.values())
+            self.results.append((project['project'], path, nfiles,
+                                 nwarnings))
+            if self.console is not None:
+                self.console.write('[*] %s: %d files, %d warnings [%s]\n'
+                                   % (project['project'], nfiles, nwarnings,
+                                      path))
+                self.console.flush()
+        self.write_summary(total_ext, total_warnings)
+        return (total_ext, total_warnings)
+
+    def write_summary(self, fext, fwarn):
+        f = open(os.path.join(self.report_dir, 'summary.txt'), 'w')
+        try:
+            f.write('[*] %s Version %s batch scan of %d projects\n'
+                    % (self.title, self.version, len(self.results)))
+            f.write('[*] Date of Test......: %s\n\n' % (self.date))
+            for (projdir, path, files, warnings) in self.results:
+                f.write('    [-] %6d files, %5d warnings: %s [%s]\n'
+                        % (files, warnings, projdir, path))
+            f.write(summary_text(fext, fwarn))
+            f.write('\n')
+        finally:
+            f.close()
@@ -2,6 +2,9 @@
 
 import re
 import os
+import mmap
+from djangoSCAclasses.ArchiveTree import ArchiveTree, SEPARATOR, \
+    split_member
 
 
 class ContentReader(object):
@@ -11,26 +14,131 @@ class ContentReader(object):
     a variable named "self.content".  The original project name file
     path will be kept as well as a derived relative shortname path.
     Other classes needing file content will use this as a base class.
+    File content is only read when first needed, and with a single
+    bulk read.  Consumers that only need lines can use iterlines(),
+    which streams large files through mmap without ever holding the
+    whole file as a string, and those needing the raw content can use
+    iterblocks(), which reads large files block by block.  Files larger
+    than max_size bytes (when non-zero) are not read at all, and are
+    flagged as skipped.
+    content may be given when the file has already been read, such as
+    by ReadAhead, in which case the file is not opened again.
+    name may also be the path of an archive member, as archive!member
+    (see ArchiveTree), whose content is then read from the archive,
+    and always held in memory.
     """
 
-    def __init__(self, projdir, name):
+    # files at least this large are streamed through mmap by iterlines()
+    mmap_threshold = 1024 * 1024
+
+    # block size used when hashing large files
+    block_size = 1024 * 1024
+
+    def __init__(self, projdir, name, max_size=0, content=None):
         self.name = name
         self.projdir = projdir
         self.shortname = self.name[len(self.projdir):]
         if re.match(r'^/.+', self.shortname):
             self.shortname = self.shortname[1:]
-        try:
-            self.content = self.getfile()
-        except:
-            raise
+        self.member = None
+        if SEPARATOR in self.name and not os.path.isfile(self.name):
+            self.member = split_member(self.name)
+        if content is not None:
+            self.size = len(content)
+        elif self.member is not None:
+            (archive, member) = self.member
+            self.size = ArchiveTree.get(archive).size(member)
+        else:
+            try:
+                self.size = os.path.getsize(self.name)
+            except:
+                raise IOError
+        self.max_size = max_size
+        self.skipped = bool(max_size) and self.size > max_size
+        self.__content = content
+
+    @property
+    def content(self):
+        if self.__content is None:
+            if self.skipped:
+                self.__content = ''
+            else:
+                try:
+                    self.__content = self.getfile()
+                except:
+                    raise
+        return self.__content
 
     def getfile(self):
+        if self.member is not None:
+            (archive, member) = self.member
+            return ArchiveTree.get(archive).read(member)
         try:
             f = open(self.name, 'r')
         except:
             raise IOError
-        content = ''
-        for line in f.readlines():
-            content += line
+        content = f.read()
         f.close()
         return content
+
+    def iterlines(self):
+        """
+        return an iterator over the lines of the file, without line
+        endings, in the same way as content.split('\\n') would.
+        """
+        if self.__content is not None or self.member is not None or \
+                self.size < self.mmap_threshold:
+            if not self.content:
+                return iter([])
+            return iter(self.content.split('\n'))
+        return self.__maplines()
+
+    def __maplines(self):
+        try:
+            f = open(self.name, 'r')
+        except:
+            raise IOError
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            newline = False
+            line = mm.readline()
+            while line:
+                newline = line.endswith('\n')
+                if newline:
+                    line = line[:-1]
+                yield line
+                line = mm.readline()
+            if newline:
+                yield ''
+        finally:
+            mm.close()
+            f.close()
+
+    def iterblocks(self):
+        """
+        yield the file content, whole when it is in memory or small, or
+        block by block for large files, which are then never held whole.
+        """
+        if self.__content is not None or self.member is not None or \
+                self.size < self.mmap_threshold:
+            yield self.content
+            return
+        try:
+            f = open(self.name, 'r')
+        except:
+            raise IOError
+        try:
+            block = f.read(self.block_size)
+            while block:
+                yield block
+                block = f.read(self.block_size)
+        finally:
+            f.close()
+
+    def update_hash(self, h):
+        """
+        feed the file content to the hash object h, block by block for
+        large files that have not been read into memory.
+        """
+        for block in self.iterblocks():
+            h.update(block)
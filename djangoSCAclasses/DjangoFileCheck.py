@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+import re
+from djangoSCAclasses.ContentReader import ContentReader
+from djangoSCAclasses.MyParser import MyParser
+from djangoSCAclasses.Finding import Finding, builtin_rule
+from djangoSCAclasses.Profiler import timer
+from djangoSCAclasses.Baseline import mark_findings
+
+RULE_FILE_SKIPPED = builtin_rule(
+    'file-skipped', 'builtin',
+    'file skipped, size [%d] exceeds maximum file size [%d]', 'skipped')
+
+
+class DjangoFileCheck(ContentReader):
+
+    """
+    This class extends the base ContentReader class to
+    include the core 'parseme()' method.  In turn, this will
+    parse a Python source file with .py extension using the
+    abstract syntax tree (AST).  It will then sequentially
+    parse files ending with .py, .html, .txt and .xml with a regular
+    expression parser, as well as checking .xml files with the
+    'xml' rules and crossdomain policy checks in a streaming pass.
+    The 'check()' method performs the same analysis but returns the
+    warnings instead of writing them, which is what worker processes
+    use.  Files larger than max_size bytes are
+    not analyzed, and a single warning is returned for them instead.
+    timeouts is the (file_timeout, rule_timeout) budget, and modelforms
+    the ModelForm classes of the file from a SymbolIndex, handed to
+    MyParser.  content is the file content when it was read ahead.
+    The warnings returned are fingerprinted, and those suppressed by an
+    inline '# djangosca: ignore[rule]' comment are dropped (see
+    Baseline).
+    """
+    def __init__(self, projdir, fullpath, ruleset, filehandle, max_size=0,
+                 profiler=None, timeouts=(0, 0), modelforms=None,
+                 content=None):
+        try:
+            ContentReader.__init__(self, projdir, fullpath, max_size,
+                                   content)
+        except:
+            raise
+        self.ruleset = ruleset
+        self.filehandle = filehandle
+        self.profiler = profiler
+        self.timeouts = timeouts
+        self.modelforms = modelforms
+
+    def check(self):
+        if self.skipped:
+            return self.mark([Finding(self.shortname, None,
+                                      RULE_FILE_SKIPPED,
+                                      (self.size, self.max_size))])
+        ispython = re.match(r'.+\.py$', self.shortname)
+        if self.profiler is not None:
+            # time the read on its own, unless it is streamed from mmap
+            start = timer()
+            if ispython or self.size < self.mmap_threshold:
+                self.content
+            self.profiler.stage('read', timer() - start)
+        try:
+            parser = MyParser(self.ruleset, self.filehandle, self.profiler,
+                              self.timeouts, self.modelforms)
+        except:
+            raise
+        if ispython and parser.ast_wanted:
+            parser.ast_parse(self.shortname, self.content)
+        lines = None
+        if parser.lines_wanted:
+            lines = self.iterlines()
+        parser.nonast_parse(self.projdir, self.shortname, None, lines=lines,
+                            blocks=self.iterblocks())
+        return self.mark(parser.warnings)
+
+    def mark(self, warnings):
+        wanted = set(w.line for w in warnings if w.line is not None)
+        lines = {}
+        if wanted and not self.skipped:
+            last = max(wanted)
+            for (n, text) in enumerate(self.iterlines(), 1):
+                if n in wanted:
+                    lines[n] = text
+                if n >= last:
+                    break
+        return mark_findings(warnings, lines)
+
+    def parseme(self):
+        warnings = self.check()
+        for w in warnings:
+            self.filehandle.write('%s\n' % (w))
+        return len(warnings)
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+
+import os
+import stat
+from djangoSCAclasses.IgnoreRules import IgnoreRules
+from djangoSCAclasses.ArchiveTree import ArchiveTree, ARCHIVE_RXP, \
+    member_path
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+
+class FileInventory(object):
+
+    """
+    This class takes the inventory of a project directory in a single
+    traversal, which serves both stages of a scan.  Each file analyzed
+    is recorded in self.files as a tuple of (path, extension, size,
+    mtime), in the same order as os.walk() would find them, and the
+    directory of the settings module, the first directory holding a
+    settings.py module or a settings package, is recorded in
+    self.settings_path on the way.  The paths of all the python files,
+    including those such as __init__.py which are not analyzed, are
+    listed in self.python for a SymbolIndex.
+    Directories are read with scandir where available (os.scandir, or
+    the scandir backport), and with listdir otherwise.
+    Directories and files excluded by the ignore patterns (see
+    IgnoreRules) are never descended or recorded, nor is the .git
+    directory.  The .gitignore files of the project only exclude files
+    when gitignore is set, as they commonly list files worth auditing,
+    such as local_settings.py; the files and directories they exclude
+    are then counted in self.skipped['gitignore'].
+    When sniff is set, the first block of each file is read, and files
+    that look binary (holding a NUL byte) or minified (no line break
+    in a first block of a larger file) are skipped, and counted in
+    self.skipped.  Python modules and templates are never taken as
+    minified, as they are written by hand, however long their lines.
+    When archives is set, wheels, eggs, zip and tar archives (see
+    ArchiveTree) are listed as directories of virtual files, each
+    member being recorded under the path archive!member, in archive
+    order.  Ignore patterns apply to members as if the archive were a
+    directory.  Members are neither sniffed nor listed in self.python,
+    and archives which cannot be read are counted in
+    self.skipped['archive'].
+    """
+
+    # number of bytes read to recognize binary and minified files
+    sniff_size = 4096
+
+    # extensions of the files which are never taken as minified
+    unminified = frozenset(['py', 'html'])
+
+    def __init__(self, base_dir, ignore=None, rxp=None, gitignore=False,
+                 sniff=True, archives=False):
+        self.base_dir = base_dir
+        self.rxp = rxp
+        self.gitignore = gitignore
+        self.sniff = sniff
+        self.archives = archives
+        self.files = []
+        self.python = []
+        self.settings_path = None
+        self.skipped = {'binary': 0, 'minified': 0, 'archive': 0,
+                        'gitignore': 0}
+        scopes = []
+        if ignore:
+            scopes.append(('', IgnoreRules(ignore), False))
+        self.__walk(base_dir, '', scopes)
+
+    def __entries(self, dirpath):
+        """
+        return (name, isdir, islink, size, mtime) for the entries of a
+        directory, in directory order.
+        """
+        entries = []
+        if scandir is not None:
+            try:
+                it = scandir(dirpath)
+            except OSError:
+                return entries
+            for entry in it:
+                try:
+                    if entry.is_dir():
+                        entries.append((entry.name, True, entry.is_symlink(),
+                                        0, 0))
+                    elif entry.is_file():
+                        st = entry.stat()
+                        entries.append((entry.name, False, False,
+                                        st.st_size, st.st_mtime))
+                except OSError:
+                    continue
+            return entries
+        try:
+            names = os.listdir(dirpath)
+        except OSError:
+            return entries
+        for name in names:
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if stat.S_ISDIR(st.st_mode):
+                entries.append((name, True, os.path.islink(path), 0, 0))
+            elif stat.S_ISREG(st.st_mode):
+                entries.append((name, False, False, st.st_size, st.st_mtime))
+        return entries
+
+    def __ignored(self, relpath, isdir, scopes):
+        result = None
+        for (prefix, rules, fromgit) in scopes:
+            match = rules.match(relpath[len(prefix):], isdir)
+            if match is not None:
+                result = (match, fromgit)
+        if result is None or not result[0]:
+            return False
+        if result[1]:
+            self.skipped['gitignore'] += 1
+        return True
+
+    def __sniff(self, path, ext, size):
+        try:
+            f = open(path, 'rb')
+            block = f.read(self.sniff_size)
+            f.close()
+        except IOError:
+            return None
+        if b'\0' in block:
+            return 'binary'
+        if size > self.sniff_size and ext not in self.unminified and \
+                b'\n' not in block:
+            return 'minified'
+        return None
+
+    def __archive(self, path, relpath, scopes):
+        try:
+            tree = ArchiveTree.get(path)
+        except IOError:
+            self.skipped['archive'] += 1
+            return
+        dirs = {}
+        for (member, size, mtime) in tree.members:
+            (dirname, sep, name) = member.rpartition('/')
+            m = self.rxp.match(name)
+            if not m:
+                continue
+            ignored = dirs.get(dirname)
+            if ignored is None:
+                ignored = False
+                parts = dirname.split('/') if dirname else []
+                for i in range(len(parts)):
+                    if self.__ignored(relpath + '/' + '/'.join(parts[:i + 1]),
+                                      True, scopes):
+                        ignored = True
+                        break
+                dirs[dirname] = ignored
+            if ignored or self.__ignored(relpath + '/' + member, False,
+                                         scopes):
+                continue
+            self.files.append((member_path(path, member), m.group(1), size,
+                               mtime))
+
+    def __walk(self, dirpath, reldir, scopes):
+        entries = self.__entries(dirpath)
+        if self.gitignore:
+            for (name, isdir, islink, size, mtime) in entries:
+                if name == '.gitignore' and not isdir:
+                    scopes = scopes + [(reldir, IgnoreRules.load(
+                        os.path.join(dirpath, name)), True)]
+                    break
+        subdirs = []
+        for (name, isdir, islink, size, mtime) in entries:
+            relpath = reldir + name
+            if isdir:
+                if islink or name == '.git' or \
+                        self.__ignored(relpath, True, scopes):
+                    continue
+                subdirs.append(name)
+                continue
+            path = os.path.join(dirpath, name)
+            if self.settings_path is None and name.endswith('settings.py'):
+                self.settings_path = dirpath
+            m = self.rxp.match(name)
+            if not m and self.archives and ARCHIVE_RXP.match(name):
+                if not self.__ignored(relpath, False, scopes):
+                    self.__archive(path, relpath, scopes)
+                continue
+            ispython = name.endswith('.py')
+            if not (m or ispython) or \
+                    self.__ignored(relpath, False, scopes):
+                continue
+            if ispython:
+                self.python.append(path)
+            if not m:
+                continue
+            if self.sniff:
+                kind = self.__sniff(path, m.group(1), size)
+                if kind is not None:
+                    self.skipped[kind] += 1
+                    continue
+            self.files.append((path, m.group(1), size, mtime))
+        if self.settings_path is None and 'settings' in subdirs and \
+                os.path.isfile(os.path.join(dirpath, 'settings',
+                                            '__init__.py')):
+            self.settings_path = dirpath
+        for name in subdirs:
+            self.__walk(os.path.join(dirpath, name), reldir + name + '/',
+                        scopes)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+import re
+
+
+def intern_rule(id, section, message, category=None, pattern=None):
+    """
+    return the one shared Rule object for a rule definition, creating
+    (and registering) it when it does not exist yet in this process.
+    Rules of one id with different definitions, such as those of two
+    rules files loaded by the same process, are different objects.
+    """
+    key = (id, section, message, Rule.category_of(message, category),
+           pattern)
+    rule = Rule.registry.get(key)
+    if rule is None:
+        rule = Rule(id, section, message, category, pattern)
+        Rule.registry[key] = rule
+    return rule
+
+
+def builtin_rule(id, section, message, category=None):
+    """
+    return the shared Rule object of a rule built into the parser,
+    which is also found by its id alone (see RuleSet.rule()).
+    """
+    rule = intern_rule(id, section, message, category)
+    Rule.builtins[id] = rule
+    return rule
+
+
+class Rule(object):
+
+    """
+    This class holds the metadata of a single rule, either loaded from
+    the rules file or built into the parser.  Rule objects are interned
+    per definition with intern_rule(), so every Finding of the same rule
+    references one shared object.  The message of a built in rule may be
+    a format string, which is completed by the arguments of a Finding.
+    The category is taken from a leading '%OWASP-...:' style tag of the
+    message unless it is given explicitly.  A rule of the rules file
+    also keeps its pattern, which with its section identifies it in
+    fingerprints (see Baseline), as its id is only its position.
+    """
+
+    __slots__ = ('id', 'section', 'message', 'category', 'pattern')
+
+    registry = {}
+    builtins = {}
+    category_rxp = re.compile(r'^%{1,2}([^:]+):')
+
+    def __init__(self, id, section, message, category=None, pattern=None):
+        self.id = id
+        self.section = section
+        self.message = message
+        self.category = self.category_of(message, category)
+        self.pattern = pattern
+
+    @classmethod
+    def category_of(cls, message, category=None):
+        if category is None:
+            m = cls.category_rxp.match(message)
+            if m:
+                category = m.group(1)
+        return category
+
+    def __reduce__(self):
+        return (intern_rule,
+                (self.id, self.section, self.message, self.category,
+                 self.pattern))
+
+    def __repr__(self):
+        return '<Rule %s>' % (self.id)
+
+
+class Finding(object):
+
+    """
+    This class is a compact record of a single finding.  It stores the
+    file short name, line and column (None where unknown), a reference
+    to the shared Rule, and the arguments of the rule message.  Text is
+    only produced when the finding is formatted for a report, with
+    str() giving the traditional 'L0001: file: message' form.
+    Findings of Stage 2 also get the fingerprint which identifies them
+    in a Baseline.
+    """
+
+    __slots__ = ('filename', 'line', 'column', 'rule', 'args', 'fingerprint')
+
+    def __init__(self, filename, line, rule, args=(), column=None,
+                 fingerprint=None):
+        self.filename = filename
+        self.line = line
+        self.column = column
+        self.rule = rule
+        self.args = args
+        self.fingerprint = fingerprint
+
+    def __reduce__(self):
+        return (Finding, (self.filename, self.line, self.rule, self.args,
+                          self.column, self.fingerprint))
+
+    def message(self):
+        if self.args:
+            return self.rule.message % self.args
+        return self.rule.message
+
+    def __str__(self):
+        if self.line is None:
+            return 'L____: %s: %s' % (self.filename, self.message())
+        return 'L%04d: %s: %s' % (self.line, self.filename, self.message())
+
+    def astuple(self):
+        """
+        return a plain tuple form of the finding, suitable for marshal
+        """
+        return (self.rule.id, self.filename, self.line, self.args,
+                self.column, self.fingerprint)
+
+    @staticmethod
+    def fromtuple(t, ruleset):
+        """
+        return the finding of a tuple made by astuple(), its rule id
+        resolved against the RuleSet which produced it
+        """
+        (id, filename, line, args, column, fingerprint) = t
+        return Finding(filename, line, ruleset.rule(id), tuple(args), column,
+                       fingerprint)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+
+import re
+
+
+def translate(pattern):
+    """
+    return the regular expression source for a gitignore style glob,
+    where '*' and '?' do not match '/', and '**' matches across
+    directories.
+    """
+    i = 0
+    n = len(pattern)
+    res = ''
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith('**/', i):
+            res += '(?:.*/)?'
+            i += 3
+            continue
+        if pattern.startswith('/**', i) and i + 3 == n:
+            res += '/.*'
+            i += 3
+            continue
+        if pattern.startswith('**', i):
+            res += '.*'
+            i += 2
+            continue
+        if c == '*':
+            res += '[^/]*'
+        elif c == '?':
+            res += '[^/]'
+        elif c == '[':
+            j = pattern.find(']', i + 2)
+            if j < 0:
+                res += re.escape(c)
+            else:
+                body = pattern[i + 1:j]
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                res += '[%s]' % (body.replace('\\', '\\\\'))
+                i = j
+        elif c == '\\' and i + 1 < n:
+            i += 1
+            res += re.escape(pattern[i])
+        else:
+            res += re.escape(c)
+        i += 1
+    return res
+
+
+class IgnoreRules(object):
+
+    """
+    This class holds a list of exclusion patterns with the semantics of
+    a .gitignore file, used both for .gitignore files themselves and for
+    the --ignore options.  A pattern without a '/' matches a file or
+    directory name at any depth, while one containing a '/' is matched
+    against the whole path relative to the directory the rules belong
+    to.  A trailing '/' only matches directories, a leading '!' includes
+    again what an earlier pattern excluded, and the last matching
+    pattern wins.  A plain directory name, as --ignore has always
+    accepted, keeps its meaning.
+    """
+
+    def __init__(self, patterns=()):
+        self.rules = []
+        for pattern in patterns:
+            self.add(pattern)
+
+    @staticmethod
+    def load(filename):
+        rules = IgnoreRules()
+        try:
+            f = open(filename, 'r')
+        except IOError:
+            return rules
+        for line in f:
+            rules.add(line)
+        f.close()
+        return rules
+
+    def add(self, pattern):
+        pattern = pattern.rstrip('\r\n')
+        if not pattern.endswith('\\ '):
+            pattern = pattern.rstrip(' ')
+        if not pattern or pattern.startswith('#'):
+            return
+        negate = pattern.startswith('!')
+        if negate:
+            pattern = pattern[1:]
+        dironly = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        if not pattern:
+            return
+        anchored = '/' in pattern
+        pattern = pattern.lstrip('/')
+        if anchored:
+            rx = '^%s$' % (translate(pattern))
+        else:
+            rx = '^(?:.*/)?%s$' % (translate(pattern))
+        self.rules.append((re.compile(rx), negate, dironly))
+
+    def match(self, relpath, isdir):
+        """
+        return True if relpath is excluded, False if it is included again
+        by a negated pattern, or None if no pattern matches it.
+        """
+        result = None
+        for (rx, negate, dironly) in self.rules:
+            if dironly and not isdir:
+                continue
+            if rx.match(relpath):
+                result = not negate
+        return result
+
+    def ignored_path(self, relpath):
+        """
+        return whether a relative file path, or any directory above it,
+        is excluded.
+        """
+        parts = relpath.split('/')
+        for i in range(1, len(parts)):
+            if self.match('/'.join(parts[:i]), True):
+                return True
+        return bool(self.match(relpath, False))
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+
+import re
+from djangoSCAclasses.Profiler import timer
+
+
+class LineMatcher(object):
+
+    """
+    This class evaluates a list of line based regular expression rules
+    against all lines of a file in a single pass.  All of the rule
+    patterns are combined into one alternation which is used as a gate
+    for each line, so a line that matches no rule costs a single
+    regular expression call.
+    When every rule is applied with re.match(), the alternation is of
+    named groups.  Because an alternation is tried from left to right,
+    the name of the group that matched tells us the first rule that
+    matches the line, and that every rule before it does not.  Only the
+    rules after that one are then run individually.  When some rules
+    are applied with re.search() (see RulePattern), the gate only tells
+    whether any rule matches, and all rules are then run on that line.
+    If the patterns cannot be combined (for example they use back
+    references or their own named groups), every rule is simply run
+    against every line.
+    Lines longer than long_line characters are not given to the regular
+    expression engine whole.  Rules applied with re.search() are
+    evaluated in windows of long_line characters instead, neighbouring
+    windows sharing overlap characters, so a match longer than overlap
+    may be missed when it crosses from one window into the next.  Each
+    window is searched in place, so '^', '\b' and look-behinds see the
+    line before it, and a match ending exactly where a window is cut
+    (which '$' or '\b' may owe to the cut) only counts in the last
+    window, being left to the next one otherwise.  Rules applied with
+    re.match() are anchored at the start of the line, and are given
+    the whole line in one call.  The time spent by each rule on long
+    lines is accounted against the rule_timeout budget (in seconds, 0
+    for none).  A rule which exceeds its budget is not run on any
+    further long line of the file, and is reported by match() so that
+    the caller can record it.
+    """
+
+    backref_rxp = re.compile(r'\\[1-9]|\(\?P=')
+
+    # lines longer than this are matched in windows of this size
+    long_line = 4096
+    # characters shared by neighbouring windows
+    overlap = 1024
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.gate = None
+        self.ordered = not [p for (p, rule) in rules if p.search]
+        # remaining[n] holds (index, match) for the rules from n onward
+        self.remaining = [[(i, rules[i][0].match)
+                           for i in range(n, len(rules))]
+                          for n in range(len(rules) + 1)]
+        if not rules:
+            return
+        for (p, rule) in rules:
+            if self.backref_rxp.search(p.regex.pattern) \
+                    or p.regex.flags & ~re.UNICODE:
+                return
+        try:
+            if self.ordered:
+                gate = re.compile('|'.join(
+                    '(?P<r%d>%s)' % (i, p.regex.pattern)
+                    for (i, (p, rule)) in enumerate(self.rules)))
+                self.group_rule = dict((gate.groupindex['r%d' % (i)], i)
+                                       for i in range(len(self.rules)))
+                self.gate = gate.match
+            else:
+                self.gate = re.compile('|'.join(
+                    p.search and '(?:%s)' % (p.regex.pattern)
+                    or r'\A(?:%s)' % (p.regex.pattern)
+                    for (p, rule) in self.rules)).search
+        except re.error:
+            self.gate = None
+
+    def scan(self, lines):
+        """
+        return a list with one list of matching line numbers per rule,
+        numbering lines from 1
+        """
+        hits = self.hits()
+        for (lineno, line) in enumerate(lines, 1):
+            self.match(lineno, line, hits)
+        return hits
+
+    def hits(self):
+        """
+        return an empty list of per rule hits for use with match()
+        """
+        return [[] for r in self.rules]
+
+    def budget(self, rule_timeout=0):
+        """
+        return a fresh per file state for match(), holding the time
+        spent on long lines by each rule, and the rule_timeout budget.
+        """
+        return ([0.0] * len(self.rules), rule_timeout)
+
+    def match(self, lineno, line, hits, budget=None):
+        """
+        evaluate every rule against a single line, and append lineno to
+        the hits of each rule that matches.  Returns a list of the
+        indexes of rules which exceeded their budget on this line.
+        """
+        if len(line) > self.long_line:
+            if budget is None:
+                budget = self.budget()
+            return self.__match_long(lineno, line, hits, budget)
+        if self.gate is None:
+            remaining = self.remaining[0]
+        else:
+            m = self.gate(line)
+            if m is None:
+                return ()
+            if self.ordered:
+                first = self.group_rule[m.lastindex]
+                hits[first].append(lineno)
+                remaining = self.remaining[first + 1]
+            else:
+                remaining = self.remaining[0]
+        for (i, match) in remaining:
+            if match(line):
+                hits[i].append(lineno)
+        return ()
+
+    def windows(self, length):
+        """
+        return the (start, end) offsets of the windows of a long line
+        """
+        step = self.long_line - self.overlap
+        return [(start, min(start + self.long_line, length))
+                for start in range(0, length - self.overlap, step)]
+
+    def __match_long(self, lineno, line, hits, budget):
+        exceeded = []
+        for i in range(len(self.rules)):
+            (matched, over) = self.match_long(i, line, budget)
+            if matched:
+                hits[i].append(lineno)
+            if over:
+                exceeded.append(i)
+        return exceeded
+
+    def match_long(self, i, line, budget):
+        """
+        evaluate rule i against a long line window by window, and return
+        a tuple of whether it matched, and whether the rule has just
+        exceeded its budget.  A rule already over budget is not run.
+        """
+        (spent, rule_timeout) = budget
+        if rule_timeout and spent[i] > rule_timeout:
+            return (False, False)
+        p = self.rules[i][0]
+        matched = False
+        start = timer()
+        if not p.search:
+            # a rule applied with re.match() is anchored at the start
+            matched = p.match(line) is not None
+        else:
+            length = len(line)
+            for (begin, end) in self.windows(length):
+                m = p.regex.search(line, begin, end)
+                if m is not None and (m.end() < end or end == length):
+                    matched = True
+                    break
+                if rule_timeout and \
+                        timer() - start + spent[i] > rule_timeout:
+                    break
+        spent[i] += timer() - start
+        return (matched, bool(rule_timeout) and spent[i] > rule_timeout)
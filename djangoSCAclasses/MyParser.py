@@ -3,8 +3,110 @@
 import re
 import sys
 import ast
-import csv
-import xml.etree.ElementTree as ET
+from xml.parsers import expat
+from djangoSCAclasses.Finding import Finding, builtin_rule
+from djangoSCAclasses.Profiler import timer
+from djangoSCAclasses.LineMatcher import LineMatcher
+from djangoSCAclasses.TemplateLexer import TemplateLexer
+from djangoSCAclasses.SymbolIndex import SymbolIndex
+from djangoSCAclasses.XmlCheck import XmlPath, XmlCheck
+
+# class body statements recorded as Classdef:Name
+DEF_TYPES = (ast.FunctionDef, ast.ClassDef) + \
+    tuple(getattr(ast, n) for n in ('AsyncFunctionDef',) if hasattr(ast, n))
+
+
+def string_value(node):
+    """
+    return the value of a string literal node, or None for any other node.
+    Newer Pythons represent string literals as ast.Constant.
+    """
+    if hasattr(ast, 'Constant') and isinstance(node, ast.Constant):
+        if isinstance(node.value, type('')):
+            return node.value
+        return None
+    if isinstance(node, ast.Str):
+        return node.s
+    return None
+
+# rules built into the parser rather than loaded from the rules file
+RULE_AST_PARSE = builtin_rule(
+    'ast-parse', 'builtin',
+    '%%OWASP-CR-SourceCodeDesign: AST parsing: %s')
+RULE_XML_PARSE = builtin_rule(
+    'xml-parse', 'builtin',
+    '%%OWASP-CR-SourceCodeDesign: XML parsing: %s')
+RULE_FORM_CLEAN = builtin_rule(
+    'django-form-clean', 'builtin',
+    '%%OWASP-CR-SourceCodeDesign: Django forms validation function [%s] does not exist for Class [%s] assignment [%s = %s]')
+RULE_MODELFORM_ALL = builtin_rule(
+    'django-modelform-all', 'builtin',
+    '%%OWASP-CR-SourceCodeDesign: Django ModelForm; unsafe Meta class setting with assignment [%s = %s]')
+RULE_MODELFORM_EXCLUDE = builtin_rule(
+    'django-modelform-exclude', 'builtin',
+    '%%OWASP-CR-SourceCodeDesign: Django ModelForm; selective Meta class field exclusion is not recommended [%s = %s]')
+RULE_XD_MASTER_ONLY = builtin_rule(
+    'crossdomain-master-only', 'builtin',
+    'crossdomain "master-only" site control enabled', 'crossdomain')
+RULE_XD_BY_FTP_FILENAME = builtin_rule(
+    'crossdomain-by-ftp-filename', 'builtin',
+    'URLS ending in crossdomain.xml can serve up cross domain policy',
+    'crossdomain')
+RULE_XD_BY_CONTENT_TYPE = builtin_rule(
+    'crossdomain-by-content-type', 'builtin',
+    'Files with text/x-cross-domain-policy header can serve up cross domain policy', 'crossdomain')
+RULE_XD_WILDCARD = builtin_rule(
+    'crossdomain-wildcard', 'builtin',
+    'Wildcard character in domain attrib [%s]', 'crossdomain')
+RULE_XD_INSECURE = builtin_rule(
+    'crossdomain-insecure', 'builtin',
+    'Non-secure protocol access for domain [%s]', 'crossdomain')
+RULE_RULE_TIMEOUT = builtin_rule(
+    'rule-timeout', 'builtin',
+    'rule [%s] exceeded its time budget of %gs on long lines, and was not run on further long lines', 'timeout')
+RULE_FILE_TIMEOUT = builtin_rule(
+    'file-timeout', 'builtin',
+    'file exceeded its time budget of %gs, analysis stopped at this line',
+    'timeout')
+
+# the built in checks which may be selected, the timeouts always apply
+LOGIC_RULES = (RULE_FORM_CLEAN, RULE_MODELFORM_ALL, RULE_MODELFORM_EXCLUDE)
+CROSSDOMAIN_RULES = (RULE_XD_MASTER_ONLY, RULE_XD_BY_FTP_FILENAME,
+                     RULE_XD_BY_CONTENT_TYPE, RULE_XD_WILDCARD,
+                     RULE_XD_INSECURE)
+
+# the crossdomain policy checks, as (XmlPath, Rule, attribute), where the
+# value of attribute, if any, is the argument of the rule message
+CROSSDOMAIN_CHECKS = (
+    (XmlPath('/cross-domain-policy/site-control'
+             '@permitted-cross-domain-policies=master-only$'),
+     RULE_XD_MASTER_ONLY, None),
+    (XmlPath('/cross-domain-policy/site-control'
+             '@permitted-cross-domain-policies=by-ftp-filename$'),
+     RULE_XD_BY_FTP_FILENAME, None),
+    (XmlPath('/cross-domain-policy/site-control'
+             '@permitted-cross-domain-policies=by-content-type$'),
+     RULE_XD_BY_CONTENT_TYPE, None),
+    (XmlPath(r'/cross-domain-policy/allow-access-from@domain=\*'),
+     RULE_XD_WILDCARD, 'domain'),
+    (XmlPath('/cross-domain-policy/allow-access-from@secure=(?i)false'),
+     RULE_XD_INSECURE, 'domain'))
+
+
+def stage_selected(ruleset):
+    """
+    return whether any rule of the file analysis (Stage 2) is selected
+    """
+    for section in ruleset.REGEX_SECTIONS + ruleset.PATH_SECTIONS:
+        if ruleset.compiled(section):
+            return True
+    for rule in LOGIC_RULES:
+        if ruleset.selects(rule):
+            return True
+    for rule in CROSSDOMAIN_RULES:
+        if ruleset.selects(rule, 'xml'):
+            return True
+    return False
 
 
 class MyParser(ast.NodeVisitor):
@@ -14,66 +116,135 @@ class MyParser(ast.NodeVisitor):
     in order to parse through the content of any loaded file.  If the file that
     is in need of parsing is not a python script, then this class also
     implements a basic regular expression parser to accomodate.
+    Template rules are run against the variable and block tags found by
+    a TemplateLexer, rather than against whole lines.
     All of the DjangoSCA based warnings will be appended to a list named
-    self.warnings[], and can be printed with the print_warnings() method.
+    self.warnings[] as Finding objects, and can be printed with the
+    print_warnings() method.
     All of the methods that begin with the prefix "visit_" are callback
     methods extending from AST.  As syntax is parsed, these methods will
     be called depending on what part of the grammar is being parsed.
     Methods prefixed with 'django_' are by convention intended to be
     django logic checks.
+    When a Profiler is given, stage and per-rule timings are recorded.
+    The line based rules are then run one rule at a time instead of in
+    a single pass, so that each rule can be timed on its own.
+    timeouts is a tuple of (file_timeout, rule_timeout) in seconds, with
+    0 meaning no limit.  A running regular expression cannot be
+    interrupted, so the file budget is checked between lines, and long
+    lines are matched in windows with a per rule budget (see
+    LineMatcher).  Exceeding either budget is reported as a finding.
+    modelforms is the set of the names of the ModelForm classes of the
+    file, as found by a project wide SymbolIndex, so that Meta checks
+    apply to forms deriving from ModelForm through other modules.
+    Without it, the file is indexed on its own.
+    Only the rules selected in the RuleSet run: a python file needs no
+    AST when no 'import' or 'string' rule and no Django logic check is
+    selected (see ast_wanted), the line pass is skipped when there are
+    no 'general' and 'template' rules (see lines_wanted), and templates
+    are not lexed when there are no 'template' rules.
+    XML files which are not templates are checked in one streaming pass
+    (see XmlCheck) with the 'xml' rules and the crossdomain policy
+    checks, the latter applying to any document whose root element is
+    <cross-domain-policy>.  Selecting the 'xml' section selects both.
     """
 
-    def __init__(self, rulesfile, filehandle):
+    lexer = TemplateLexer()
+
+    def __init__(self, ruleset, filehandle, profiler=None, timeouts=(0, 0),
+                 modelforms=None):
         self.debug = False
         self.filehandle = filehandle
-        self.imports = []
-        self.classes = []
+        self.profiler = profiler
+        self.modelforms = modelforms
+        self.code = None
+        self.classes = set()
+        self.class_stack = []
         self.func_assign = []
         self.class_func_assign = {}
+        self.class_owner = {}
         self.warnings = []
-        self.rxpobj = re.compile(r'<(.+) object at (.+)>')
-
-        # dictionaries for rules checking
-        self.b_imports = {}
-        self.b_strings = {}
-        self.b_general = {}
-        self.b_template = {}
-
-        try:
-            self.__load_rules(rulesfile)
-        except:
-            raise
+        (self.file_timeout, self.rule_timeout) = timeouts
+        self.deadline = None
+        if self.file_timeout:
+            self.deadline = timer() + self.file_timeout
+
+        # compiled (regex, message) rules shared from the RuleSet
+        self.b_imports = ruleset.compiled('import')
+        self.b_strings = ruleset.compiled('string')
+        self.b_general = ruleset.matcher('general')
+        self.b_template = ruleset.matcher('template')
+        self.b_xml = ruleset.compiled('xml')
+
+        # the built in checks selected
+        self.form_clean = ruleset.selects(RULE_FORM_CLEAN)
+        self.modelform_all = ruleset.selects(RULE_MODELFORM_ALL)
+        self.modelform_exclude = ruleset.selects(RULE_MODELFORM_EXCLUDE)
+        self.crossdomain = frozenset(rule for rule in CROSSDOMAIN_RULES
+                                     if ruleset.selects(rule, 'xml'))
+        self.parse_errors = ruleset.selects(RULE_AST_PARSE)
+        self.xml_errors = ruleset.selects(RULE_XML_PARSE, 'xml')
+        self.ast_wanted = bool(self.b_imports or self.b_strings or
+                               self.form_clean or self.modelform_all or
+                               self.modelform_exclude)
+        self.lines_wanted = bool(self.b_general.rules or
+                                 self.b_template.rules)
+        self.xml_wanted = bool(self.b_xml or self.crossdomain)
 
     def ast_parse(self, shortname, code):
+        if self.profiler is not None:
+            start = timer()
         try:
             node = ast.parse(code)
         except (SyntaxError, NameError, ValueError, TypeError) as err:
-            warning = \
-                'L____: %s: %%OWASP-CR-SourceCodeDesign: AST parsing: %s' \
-                % (shortname, err)
-            self.warnings.append(warning)
+            if self.parse_errors:
+                self.warnings.append(
+                    Finding(shortname, None, RULE_AST_PARSE, (str(err),)))
             return
+        if self.profiler is not None:
+            self.profiler.stage('ast_parse', timer() - start)
+            start = timer()
         self.shortname = shortname
+        self.code = code
         self.visit(node)
         self.__django_logic_checks()
+        if self.profiler is not None:
+            self.profiler.stage('visitor', timer() - start)
 
-    def nonast_parse(self, projdir, shortname, code):
+    def nonast_parse(self, projdir, shortname, code, lines=None,
+                     blocks=None):
+        """
+        Run the line based rules over either code, or an iterator of
+        lines (as produced by ContentReader.iterlines()) which is then
+        consumed lazily in a single pass.  An XML file is then checked
+        over blocks, as produced by ContentReader.iterblocks(), or code.
+        """
         self.shortname = shortname
-        self.content = code
-        try:
-            self.__rxp_nonast_check(self.b_general, self.b_general_re)
-        except:
-            raise
-        if self.__istemplate():
-            try:
-                self.__rxp_nonast_check(self.b_template, self.b_template_re)
-            except:
-                raise
-        elif re.match(r'.*crossdomain\.xml', shortname):
+        if lines is None:
+            if code:
+                lines = code.split('\n')
+            else:
+                lines = []
+        if self.profiler is not None:
+            start = timer()
+            scan = self.__rxp_nonast_scan_profiled
+        else:
+            scan = self.__rxp_nonast_scan
+        istemplate = False
+        if self.lines_wanted:
             try:
-                self.__crossdomain_xml(projdir + '/' + shortname)
+                (general, template, istemplate) = scan(lines)
             except:
                 raise
+            self.__rxp_nonast_check(self.b_general, general)
+        if istemplate:
+            self.__rxp_nonast_check(self.b_template, template)
+        elif self.xml_wanted and shortname.endswith('.xml'):
+            if blocks is None:
+                blocks = (code or '',)
+            self.xml_parse(blocks)
+        if self.profiler is not None:
+            self.profiler.stage('nonast', timer() - start)
 
     def print_warnings(self):
         for w in self.warnings:
@@ -88,259 +259,285 @@ class MyParser(ast.NodeVisitor):
             forms.Charfield(), then we might have input validation
             issues.
             """
-            if re.match(r'^forms\.CharField', self.class_func_assign[l]):
+            if self.form_clean and \
+                    re.match(r'^forms\.CharField', self.class_func_assign[l]):
                 classname = l.split(':')[0]
                 function_name = l.split(':')[1]
                 lineno = int(l.split(':')[2])
                 clean_function_name = 'clean_' + function_name
                 search_name = classname + ':' + clean_function_name
                 if not search_name in self.classes:
-                    warning = """\
-L%04d: %s: %%OWASP-CR-SourceCodeDesign: Django forms validation function [%s] does not exist for Class [%s] assignment [%s = %s]""" % (
-                        lineno,
-                        self.shortname,
-                        clean_function_name,
-                        classname,
-                        function_name,
-                        self.class_func_assign[l])
-                    self.warnings.append(warning)
-
-            elif re.match(r'^Meta:fields', l) \
+                    self.warnings.append(Finding(
+                        self.shortname, lineno, RULE_FORM_CLEAN,
+                        (clean_function_name,
+                         classname,
+                         function_name,
+                         self.class_func_assign[l])))
+
+            elif self.modelform_all and re.match(r'^Meta:fields', l) \
                     and self.class_func_assign[l] == '__all__' \
-                    and self.__search_imports('ModelForm'):
+                    and self.__modelform_meta(l):
                 name = l.split(':')[1]
                 lineno = int(l.split(':')[2])
-                warning = 'L%04d: %s: %%OWASP-CR-SourceCodeDesign: Django ModelForm; unsafe Meta class setting with assignment [%s = %s]' % (lineno, self.shortname, name, self.class_func_assign[l])
-                self.warnings.append(warning)
+                self.warnings.append(Finding(
+                    self.shortname, lineno, RULE_MODELFORM_ALL,
+                    (name, self.class_func_assign[l])))
 
-            elif re.match(r'^Meta:exclude', l) \
-                    and self.__search_imports('ModelForm'):
+            elif self.modelform_exclude and re.match(r'^Meta:exclude', l) \
+                    and self.__modelform_meta(l):
                 name = l.split(':')[1]
                 lineno = int(l.split(':')[2])
-                warning = 'L%04d: %s: %%OWASP-CR-SourceCodeDesign: Django ModelForm; selective Meta class field exclusion is not recommended [%s = %s]' % (lineno, self.shortname, name, self.class_func_assign[l])
-                self.warnings.append(warning)
+                self.warnings.append(Finding(
+                    self.shortname, lineno, RULE_MODELFORM_EXCLUDE,
+                    (name, self.class_func_assign[l])))
 
-    def __search_imports(self, name):
-        rxp = re.compile('^(import|from).+%s' % name)
-        for line in self.imports:
-            if rxp.match(line):
-                return True
-        return False
-
-    def __load_rules(self, rulesfile):
+    def __modelform_meta(self, key):
+        """
+        return whether the class owning a Meta class assignment is a
+        ModelForm.
+        """
+        if self.modelforms is None:
+            index = SymbolIndex()
+            index.add_file(self.shortname, self.code)
+            index.finish()
+            self.modelforms = index.modelforms(self.shortname)
+        return self.class_owner.get(key) in self.modelforms
+
+    def xml_parse(self, blocks):
+        checks = [check for check in CROSSDOMAIN_CHECKS
+                  if check[1] in self.crossdomain]
+        checks.extend((path, rule, None) for (path, rule) in self.b_xml)
         try:
-            f = open(rulesfile, 'r')
-        except:
-            sys.stderr.write('__load_rules(): failed to open rules file')
-            raise
-
-        for row in csv.reader(f, delimiter=',', quotechar='"'):
-            if len(row) == 0 or re.match(r'^#.+', row[0]):
-                continue
-            if row[0] == 'import':
-                self.b_imports[row[1]] = row[2]
-            elif row[0] == 'string':
-                self.b_strings[row[1]] = row[2]
-            elif row[0] == 'general':
-                self.b_general[row[1]] = row[2]
-            elif row[0] == 'template':
-                self.b_template[row[1]] = row[2]
-
-            try:
-                self.b_imports_re = self.__regex_compile(self.b_imports)
-            except:
-                raise
-            try:
-                self.b_strings_re = self.__regex_compile(self.b_strings)
-            except:
-                raise
-            try:
-                self.b_general_re = self.__regex_compile(self.b_general)
-            except:
-                raise
-            try:
-                self.b_template_re = self.__regex_compile(self.b_template)
-            except:
-                raise
+            found = XmlCheck(checks).check(blocks)
+        except expat.ExpatError as err:
+            if self.xml_errors:
+                self.warnings.append(Finding(
+                    self.shortname, getattr(err, 'lineno', None),
+                    RULE_XML_PARSE, (str(err),)))
+            return
+        for (lineno, rule, args) in found:
+            self.warnings.append(Finding(self.shortname, lineno, rule, args))
 
-    def __regex_compile(self, rule_dict):
-        try:
-            re_dict = [re.compile(r) for r in rule_dict]
-        except re.error as e:
-            sys.stderr.write('__load_rules(): regex compiled failed for [%s] [%s]' % (r, e))
-            raise
-        return re_dict
-
-    def __crossdomain_xml(self, filename):
-        tree = ET.parse(filename)
-        troot = tree.getroot()
-        site_control = troot.find('site-control')\
-            .attrib['permitted-cross-domain-policies']
-        if site_control == 'master-only':
-            self.warnings.append('L____: %s: crossdomain "master-only" site control enabled' % (self.shortname))
-        elif site_control == 'by-ftp-filename':
-            self.warnings.append('L____: %s: URLS ending in crossdomain.xml can serve up cross domain policy' % (self.shortname))
-        elif site_control == 'by-content-type':
-            self.warnings.append('L____: %s: Files with text/x-cross-domain-policy header can serve up cross domain policy' % (self.shortname))
-
-        for access in troot.findall('allow-access-from'):
-            if re.match(r'^\*', access.attrib['domain']):
-                self.warnings.append('L____: %s: Wildcard character in domain attrib [%s]' % (self.shortname, access.attrib['domain']))
-            if re.match(r'false', access.attrib['secure'], re.IGNORECASE):
-                self.warnings.append('L____: %s: Non-secure protocol access for domain [%s]' % (self.shortname, access.attrib['domain']))
-
-    def __rxp_ast_check(self, mstr, node, sset, rset):
-        for (p, v) in zip(rset, sset):
+    def __rxp_ast_check(self, mstr, node, rules):
+        for (p, rule) in rules:
             try:
-                if p.match(mstr):
-                    try:
-                        self.warnings.append('L%04d: %s: %s'
-                                             % (node.lineno, self.shortname,
-                                                sset[v]))
-                    except:
-                        self.warnings.append('L%04d: %s: %s'
-                                             % (-99, self.shortname, sset[v]))
+                if self.profiler is not None:
+                    start = timer()
+                    m = p.match_text(mstr)
+                    self.profiler.rule(rule.id, timer() - start, m and 1 or 0)
+                else:
+                    m = p.match_text(mstr)
+                if m:
+                    lineno = getattr(node, 'lineno', -99)
+                    self.warnings.append(Finding(
+                        self.shortname, lineno, rule,
+                        column=getattr(node, 'col_offset', None)))
             except:
                 sys.stderr.write('rxp_ast_check(): %s' % (re.error))
                 raise
 
-    def __istemplate(self):
-        if len(self.__grep('{%|%}|{{|}}')) > 0:
-            return True
-        return False
-
-    def __grep(self, exp):
-        if not self.content:
-            return []
-        i = 0
-        mline = []
-        rxp = re.compile(exp)
-        for line in self.content.split('\n'):
-            if rxp.match(line):
-                mline.append(i)
-            i += 1
-        return mline
-
-    def __rxp_nonast_check(self, sset, rset):
-        for (p, v) in zip(rset, sset):
-            for lineno in self.__grep(v):
-                try:
-                    self.warnings.append('L%04d: %s: %s' %
-                                         (lineno, self.shortname, sset[v]))
-                except:
-                    pass
+    def __rxp_nonast_scan(self, lines):
+        """
+        A single pass over lines evaluating the general rules against each
+        line, and lexing each line for template tags.  The template rules
+        are evaluated against the source of each variable and block tag,
+        and a file with any such tag is a template.  Lines are numbered
+        from 1.
+        """
+        general = self.b_general.hits()
+        template = self.b_template.hits()
+        gbudget = self.b_general.budget(self.rule_timeout)
+        tbudget = self.b_template.budget(self.rule_timeout)
+        tags = self.lexer.tags
+        if not self.b_template.rules:
+            tags = self.__no_tags
+        istemplate = False
+        deadline = self.deadline
+        check = False
+        for (lineno, line) in enumerate(lines, 1):
+            # check the file budget every 32 lines, and after long lines
+            if deadline is not None and (check or not lineno & 31) \
+                    and timer() > deadline:
+                self.__file_timeout(lineno)
+                break
+            exceeded = self.b_general.match(lineno, line, general, gbudget)
+            if exceeded:
+                self.__rule_timeout(self.b_general, exceeded, lineno)
+            for (kind, text, tagline) in tags(line, lineno):
+                istemplate = True
+                exceeded = self.b_template.match(lineno, text, template,
+                                                 tbudget)
+                if exceeded:
+                    self.__rule_timeout(self.b_template, exceeded, lineno)
+            check = len(line) > LineMatcher.long_line
+        return (general, template, istemplate)
+
+    @staticmethod
+    def __no_tags(line, lineno):
+        return ()
+
+    def __rxp_nonast_scan_profiled(self, lines):
+        """
+        The same as __rxp_nonast_scan(), but timing each rule separately
+        """
+        lines = list(lines)
+        profiler = self.profiler
+        deadline = self.deadline
+        stopped = None
+
+        start = timer()
+        tokens = []
+        if self.b_template.rules:
+            for (lineno, line) in enumerate(lines, 1):
+                if deadline is not None and not lineno & 31 \
+                        and timer() > deadline:
+                    stopped = lineno
+                    break
+                tokens.extend(self.lexer.tags(line, lineno))
+        profiler.rule('template-lex', timer() - start, len(tokens),
+                      len(lines))
+        istemplate = bool(tokens)
+
+        results = []
+        for (matcher, subjects) in (
+                (self.b_general, enumerate(lines, 1)),
+                (self.b_template, [(lineno, text)
+                                   for (kind, text, lineno) in tokens])):
+            subjects = list(subjects)
+            budget = matcher.budget(self.rule_timeout)
+            hits = []
+            for (i, (p, rule)) in enumerate(matcher.rules):
+                start = timer()
+                linenos = []
+                for (n, (lineno, line)) in enumerate(subjects):
+                    if deadline is not None and not n & 31 \
+                            and timer() > deadline:
+                        if stopped is None:
+                            stopped = lineno
+                        break
+                    if len(line) > matcher.long_line:
+                        (matched, over) = matcher.match_long(i, line, budget)
+                        if over:
+                            self.__rule_timeout(matcher, (i,), lineno)
+                    else:
+                        matched = p.match(line)
+                    if matched:
+                        linenos.append(lineno)
+                profiler.rule(rule.id, timer() - start, len(linenos),
+                              len(subjects))
+                hits.append(linenos)
+            results.append(hits)
+        if stopped is not None:
+            self.__file_timeout(stopped)
+        return (results[0], results[1], istemplate)
+
+    def __rule_timeout(self, matcher, exceeded, lineno):
+        for i in exceeded:
+            self.warnings.append(Finding(
+                self.shortname, lineno, RULE_RULE_TIMEOUT,
+                (matcher.rules[i][1].id, self.rule_timeout)))
+
+    def __file_timeout(self, lineno):
+        self.warnings.append(Finding(
+            self.shortname, lineno, RULE_FILE_TIMEOUT, (self.file_timeout,)))
+
+    def __rxp_nonast_check(self, matcher, hits):
+        for ((p, rule), linenos) in zip(matcher.rules, hits):
+            last = None
+            for lineno in linenos:
+                # several tags of one line may match the same rule
+                if lineno != last:
+                    self.warnings.append(Finding(self.shortname, lineno, rule))
+                last = lineno
 
     def visit_Import(self, node):
+        if not self.b_imports:
+            return
         if self.debug:
             print 'visit_Import(): %s (%d)' % (node.names[0].name, node.lineno)
         for alias in node.names:
             codeline = 'import ' + getattr(alias, 'name')
-            self.imports.append(codeline)
             try:
                 self.__rxp_ast_check(codeline, node,
-                                     self.b_imports, self.b_imports_re)
+                                     self.b_imports)
             except:
                 pass
         self.generic_visit(node)
 
     def visit_ImportFrom(self, node):
+        if not self.b_imports:
+            return
         if self.debug:
             print 'visit_ImportFrom(): %s' % (node.names[0])
         modulename = str(node.module)
         codeline = 'import ' + modulename
-        self.imports.append(codeline)
         try:
             self.__rxp_ast_check(codeline, node,
-                                 self.b_imports, self.b_imports_re)
+                                 self.b_imports)
         except:
             pass
         for alias in node.names:
             codeline = 'from %s import %s' \
                 % (modulename, getattr(alias, 'name'))
-            self.imports.append(codeline)
             try:
                 self.__rxp_ast_check(codeline, node,
-                                     self.b_imports, self.b_imports_re)
+                                     self.b_imports)
             except:
                 pass
         self.generic_visit(node)
 
     def visit_ClassDef(self, node):
-        self.classes.append(node.name)
-        for statement in ast.iter_child_nodes(node):
-
-            """
-            Lets store either Classdef:FuncName() or Classdef:Classdef
-            for later reference if we need it.
-            """
-            if self.rxpobj.match(str(statement)).group(1) \
-                == '_ast.FunctionDef' \
-                or self.rxpobj.match(str(statement)).group(1) \
-                    == '_ast.ClassDef':
-                myname = node.name + ':' + statement.name
-                if myname not in self.classes:
-                    self.classes.append(node.name + ':' + statement.name)
-
-            """
-            if we are doing a function definition or a variable
-            assignment, we are interested in the LHS, and RHS
-            of the code statement
-            """
-            if self.rxpobj.match(str(statement)).group(1) \
-                == '_ast.FunctionDef' \
-                or self.rxpobj.match(str(statement)).group(1) \
-                    == '_ast.Assign':
-                try:
-                    clfunctions = self.__process_func_assign(node.body)
-                except:
-                    clfunctions = []
-                for varassign in clfunctions:
-                    key = node.name + ':' + varassign[0]
-                    self.class_func_assign[key] = varassign[1]
-
+        self.classes.add(node.name)
+        for statement in node.body:
+            # Lets store either Classdef:FuncName() or Classdef:Classdef
+            # for later reference if we need it.
+            if isinstance(statement, DEF_TYPES):
+                self.classes.add(node.name + ':' + statement.name)
+
+            # if we are doing a variable assignment, we are interested in
+            # the LHS, and RHS of the code statement
+            elif isinstance(statement, ast.Assign):
+                for (target, rhs) in self.__process_assign(statement):
+                    self.class_func_assign[node.name + ':' + target] = rhs
+                    # the enclosing class, which a Meta class configures
+                    if self.class_stack:
+                        self.class_owner[node.name + ':' + target] = \
+                            self.class_stack[-1]
+
+        self.class_stack.append(node.name)
         self.generic_visit(node)
+        self.class_stack.pop()
 
-    def __process_func_assign(self, node):
+    def __process_assign(self, statement):
         """
-        This method will parse a func/method assignment within
-        a class or method within a class.  It will return a list
-        of assignments in the form:  target = func.SubMethod.SubSubMethod
+        This method will parse a variable assignment within a class.
+        It will return a list of assignments in the form:
+        [target:lineno, func.SubMethod.SubSubMethod()] for calls, or the
+        name, list of strings, or string being assigned.  Targets other
+        than plain names, and values of any other type, are ignored.
         """
+        value = statement.value
+        if isinstance(value, ast.Call):
+            if not isinstance(value.func, ast.Attribute):
+                return []
+            rhs = '%s.%s()' % (self.__process_id(value.func.value),
+                               self.__process_attr(value.func))
+        elif isinstance(value, ast.Name):
+            rhs = value.id
+        elif isinstance(value, ast.List):
+            rhs = '[%s]' % (','.join(
+                '\'%s\'' % (s) for s in
+                [string_value(cn) for cn in value.elts]
+                if s is not None))
+        else:
+            rhs = string_value(value)
+            if rhs is None:
+                return []
+
         retlist = []
-        for statement in node:
-            if not self.rxpobj.match(str(statement)).group(1) == '_ast.Assign':
-                continue
-            for target in statement.targets:
-                targetname = getattr(target, 'id') + ':' + str(target.lineno)
-
-                if self.rxpobj.match(str(statement.value)).group(1) \
-                        == '_ast.Call':
-                    try:
-                        rhs_func = getattr(getattr(statement.value, 'func'),
-                                           'value')
-                    except:
-                        raise
-                    rhs_funcname = self.__process_id(rhs_func)
-                    attr = self.__process_attr(getattr(statement.value, 'func'))
-                    rhs = '%s.%s()' % (rhs_funcname, attr)
-                    retlist.append([targetname, rhs])
-
-                elif self.rxpobj.match(str(statement.value)).group(1) \
-                        == '_ast.Name':
-                    retlist.append([targetname, statement.value.id])
-
-                elif self.rxpobj.match(str(statement.value)).group(1) \
-                        == '_ast.List':
-                    mlist = '['
-                    for cn in ast.iter_child_nodes(statement.value):
-                        if self.rxpobj.match(str(cn)).group(1) == '_ast.Str':
-                            mlist += '\'%s\',' % (cn.s)
-                    mlist = mlist[:-1] + ']'
-                    retlist.append([targetname, mlist])
-
-                elif self.rxpobj.match(str(statement.value)).group(1) \
-                        == '_ast.Str':
-                    retlist.append([targetname, statement.value.s])
+        for target in statement.targets:
+            if isinstance(target, ast.Name):
+                retlist.append((target.id + ':' + str(target.lineno), rhs))
         return retlist
 
     def __process_id(self, node):
@@ -350,13 +547,11 @@ L%04d: %s: %%OWASP-CR-SourceCodeDesign: Django forms validation function [%s] do
         and returns related string attributes in any AST node of
         type 'Name'.
         """
-        m = self.rxpobj.match(str(node))
-        retval = ''
-        if m.group(1) == '_ast.Name':
-            retval = getattr(node, 'id')
-        elif m.group(1) == '_ast.Attribute':
-            retval += self.__process_id(node.value)
-        return retval
+        if isinstance(node, ast.Name):
+            return node.id
+        elif isinstance(node, ast.Attribute):
+            return self.__process_id(node.value)
+        return ''
 
     def __process_attr(self, node):
         """
@@ -365,21 +560,20 @@ L%04d: %s: %%OWASP-CR-SourceCodeDesign: Django forms validation function [%s] do
         and returns related string attributes in any
         AST node of type 'Name'.
         """
-        m = self.rxpobj.match(str(node.value))
-        retval = ''
-        if m.group(1) == '_ast.Name':
-            retval = getattr(node, 'attr')
-        elif m.group(1) == '_ast.Attribute':
-            retval += self.__process_attr(node.value) + '.' \
-                + getattr(node, 'attr')
-        return retval
+        if isinstance(node.value, ast.Name):
+            return node.attr
+        elif isinstance(node.value, ast.Attribute):
+            return self.__process_attr(node.value) + '.' + node.attr
+        return ''
 
     def visit_Str(self, node):
+        if not self.b_strings:
+            return
         if self.debug:
             print 'visit_Str(): %s' % (str(node.s))
         try:
             self.__rxp_ast_check(str(getattr(node, 's')), node,
-                                 self.b_strings, self.b_strings_re)
+                                 self.b_strings)
         except:
             pass
         self.generic_visit(node)
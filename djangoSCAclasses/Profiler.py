@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+import time
+import heapq
+
+# the best available wall clock timer
+timer = getattr(time, 'perf_counter', time.time)
+
+
+class Profiler(object):
+
+    """
+    This class collects timing and counters for a scan.  It records the
+    wall time per stage, files, bytes and time per file extension, the
+    slowest files, and for every rule the cumulative time, number of
+    calls and number of matches.  Profilers are only created when the
+    --profile option is used.  Everywhere else a profiler of None is
+    passed, so collection costs nothing when profiling is off.
+    Worker processes profile each file separately, and the results
+    are combined into the main profiler with merge().
+    """
+
+    def __init__(self, top=10):
+        self.top = top
+        self.stages = {}
+        self.rules = {}
+        self.exts = {}
+        self.slowest = []
+
+    def stage(self, name, seconds, count=1):
+        s = self.stages.setdefault(name, [0.0, 0])
+        s[0] += seconds
+        s[1] += count
+
+    def rule(self, id, seconds, matches, calls=1):
+        r = self.rules.setdefault(id, [0.0, 0, 0])
+        r[0] += seconds
+        r[1] += matches
+        r[2] += calls
+
+    def file(self, path, ext, size, seconds):
+        e = self.exts.setdefault(ext, [0, 0, 0.0])
+        e[0] += 1
+        e[1] += size
+        e[2] += seconds
+        if len(self.slowest) < self.top:
+            heapq.heappush(self.slowest, (seconds, path))
+        else:
+            heapq.heappushpop(self.slowest, (seconds, path))
+
+    def timed(self, name, iterable):
+        """
+        yield the items of iterable, timing how long each takes to produce
+        """
+        it = iter(iterable)
+        while True:
+            start = timer()
+            try:
+                item = next(it)
+            except StopIteration:
+                self.stage(name, timer() - start, 0)
+                return
+            self.stage(name, timer() - start)
+            yield item
+
+    def merge(self, other):
+        for (name, (seconds, count)) in other.stages.items():
+            self.stage(name, seconds, count)
+        for (id, (seconds, matches, calls)) in other.rules.items():
+            self.rule(id, seconds, matches, calls)
+        for (ext, (files, size, seconds)) in other.exts.items():
+            e = self.exts.setdefault(ext, [0, 0, 0.0])
+            e[0] += files
+            e[1] += size
+            e[2] += seconds
+        for (seconds, path) in other.slowest:
+            if len(self.slowest) < self.top:
+                heapq.heappush(self.slowest, (seconds, path))
+            else:
+                heapq.heappushpop(self.slowest, (seconds, path))
+
+    def asdict(self):
+        return {
+            'stages': dict((k, {'seconds': v[0], 'count': v[1]})
+                           for (k, v) in self.stages.items()),
+            'extensions': dict((k, {'files': v[0], 'bytes': v[1],
+                                    'seconds': v[2]})
+                               for (k, v) in self.exts.items()),
+            'rules': dict((k, {'seconds': v[0], 'matches': v[1],
+                               'calls': v[2]})
+                          for (k, v) in self.rules.items()),
+            'slowest': [{'file': path, 'seconds': seconds}
+                        for (seconds, path) in sorted(self.slowest,
+                                                      reverse=True)],
+        }
+
+    def report(self, fh, format='text'):
+        if format == 'json':
+            import json
+            fh.write(json.dumps(self.asdict(), sort_keys=True, indent=1)
+                     + '\n')
+            return
+
+        fh.write('\n[*] Profile: Stages\n')
+        for (name, (seconds, count)) in sorted(
+                self.stages.items(), key=lambda i: -i[1][0]):
+            fh.write('    [-] %-12s %10.3fs %8d calls\n'
+                     % (name, seconds, count))
+
+        if 'prefetch' in self.stages:
+            (read_seconds, read) = self.stages['prefetch']
+            (wait_seconds, waits) = self.stages['prefetch_wait']
+            files = sum(e[0] for e in self.exts.values())
+            fh.write('[*] Profile: Read-ahead\n')
+            fh.write('    [-] %d of %d files read ahead in %.3fs, analysis '
+                     'waited %.3fs for %d of them: %s bound\n'
+                     % (read, files, read_seconds, wait_seconds, waits,
+                        waits * 2 > files and 'I/O' or 'CPU'))
+
+        fh.write('[*] Profile: Extensions\n')
+        for (ext, (files, size, seconds)) in sorted(self.exts.items()):
+            fh.write('    [-] Extension [.%-4s]: %6d files, %8.2f files/s, '
+                     '%8.2f MB/s\n'
+                     % (ext, files, files / max(seconds, 1e-9),
+                        size / 1048576.0 / max(seconds, 1e-9)))
+
+        fh.write('[*] Profile: Slowest files\n')
+        for (seconds, path) in sorted(self.slowest, reverse=True):
+            fh.write('    [-] %10.3fs %s\n' % (seconds, path))
+
+        fh.write('[*] Profile: Rules\n')
+        for (id, (seconds, matches, calls)) in sorted(
+                self.rules.items(), key=lambda i: -i[1][0]):
+            fh.write('    [-] %-32s %10.3fs %8d matches %10d calls\n'
+                     % (id, seconds, matches, calls))
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+"""
+Functions locating the files of a Django project which are analyzed,
+shared by the command line scan and the scan daemon.
+"""
+
+import os
+import re
+from djangoSCAclasses.IgnoreRules import IgnoreRules
+from djangoSCAclasses.ArchiveTree import ArchiveTree, ARCHIVE_RXP, \
+    member_path
+
+# the file names analyzed, with the extension as group 1
+FILE_RXP = re.compile(r'^[a-zA-Z0-9]+.+\.(py|html|txt|xml)$')
+
+
+def select_files(base_dir, paths, ignore, rxp, archives=False):
+    """
+    Apply the same --ignore and file name filtering as FileInventory to
+    an explicit list of paths, which may be relative to base_dir or
+    absolute.  .gitignore files are not read, as these paths are usually
+    named by git itself.  When archives is set, an archive stands for
+    all of its members.
+    """
+    exclude = IgnoreRules(ignore or [])
+    seen = set()
+    for path in paths:
+        if os.path.isabs(path):
+            path = os.path.relpath(path, base_dir)
+        path = os.path.normpath(path)
+        if path in seen or path.startswith('..'):
+            continue
+        seen.add(path)
+        if exclude.ignored_path(path.replace(os.sep, '/')):
+            continue
+        m = rxp.match(os.path.basename(path))
+        if not m and archives and ARCHIVE_RXP.match(os.path.basename(path)):
+            for entry in archive_files(base_dir, path, exclude, rxp):
+                yield entry
+            continue
+        if not m or not os.path.isfile(os.path.join(base_dir, path)):
+            continue
+        yield (os.path.join(base_dir, path), m.group(1))
+
+
+def archive_files(base_dir, path, exclude, rxp):
+    try:
+        tree = ArchiveTree.get(os.path.join(base_dir, path))
+    except IOError:
+        return
+    for (member, size, mtime) in tree.members:
+        m = rxp.match(os.path.basename(member))
+        if not m or exclude.ignored_path(
+                path.replace(os.sep, '/') + '/' + member):
+            continue
+        yield (member_path(os.path.join(base_dir, path), member), m.group(1))
+
+
+def changed_settings_path(base_dir, paths, settings='settings.py',
+                          read=None):
+    """
+    Return the settings directory, as FileInventory would find it, when
+    one of paths is the settings module (named settings) or a module of
+    a split settings package, and None otherwise.  read may be a tuple
+    of the settings directory and the files the settings checks last
+    read, such as a module the settings import, in which case that
+    directory is returned when one of those files is in paths.
+    """
+    package = os.path.splitext(settings)[0]
+    files = set()
+    if read is not None:
+        files = set(os.path.realpath(f) for f in read[1])
+    for path in paths:
+        if not os.path.isabs(path):
+            path = os.path.join(base_dir, path)
+        if os.path.basename(path) == settings:
+            return os.path.dirname(path)
+        if path.endswith('.py') and \
+                os.path.basename(os.path.dirname(path)) == package:
+            return os.path.dirname(os.path.dirname(path))
+        if os.path.realpath(path) in files:
+            return read[0]
+    return None
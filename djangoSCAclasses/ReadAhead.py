@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+
+import os
+import threading
+import collections
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+from djangoSCAclasses.ContentReader import ContentReader
+from djangoSCAclasses.Profiler import timer
+
+
+class Slot(object):
+
+    """
+    A file being read ahead: done is set once content holds the file
+    content, or None when the file is left for the analysis to read.
+    """
+
+    __slots__ = ('path', 'done', 'content', 'seconds', 'cancelled')
+
+    def __init__(self, path):
+        self.path = path
+        self.done = threading.Event()
+        self.content = None
+        self.seconds = 0.0
+        self.cancelled = False
+
+
+class ReadAhead(object):
+
+    """
+    This class reads the content of files ahead of their analysis with
+    a small pool of I/O threads, so that the time spent waiting on
+    open() and read(), which is long on network and overlay filesystems,
+    overlaps with the time spent analyzing the previous files.
+    iterate() yields each item of a sequence with the content of its
+    file, in the same order, keeping at most depth files read or being
+    read ahead of the one yielded, so that memory stays bounded however
+    slow the analysis is.  Files of mmap_threshold bytes or more (see
+    ContentReader), larger than max_size, or which cannot be read are
+    yielded with a content of None, and left for the analysis to read,
+    as are the items whose path is None, which are not read at all.
+    The time the I/O threads spent reading, and the time iterate() spent
+    waiting for a file not yet read, are counted in self.read_seconds
+    and self.wait_seconds, and added to the profiler as the 'prefetch'
+    and 'prefetch_wait' stages when one is given: waiting on most files
+    means the scan is bound by I/O, waiting on few that it is bound by
+    the analysis.
+    """
+
+    def __init__(self, threads=2, depth=32, max_size=0, profiler=None):
+        self.threads = max(threads, 1)
+        self.depth = max(depth, 1)
+        self.max_size = max_size
+        self.profiler = profiler
+        self.files = 0
+        self.read = 0
+        self.read_seconds = 0.0
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    def __readfile(self, path):
+        try:
+            size = os.path.getsize(path)
+            if size >= ContentReader.mmap_threshold or \
+                    (self.max_size and size > self.max_size):
+                return None
+            f = open(path, 'r')
+            try:
+                return f.read()
+            finally:
+                f.close()
+        except (IOError, OSError):
+            return None
+
+    def __work(self, tasks):
+        while True:
+            slot = tasks.get()
+            if slot is None:
+                return
+            if not slot.cancelled:
+                start = timer()
+                slot.content = self.__readfile(slot.path)
+                slot.seconds = timer() - start
+            slot.done.set()
+
+    def iterate(self, items, path=lambda item: item[0]):
+        """
+        yield (item, content) for each item, path(item) being the name
+        of its file, or None when there is nothing to read.
+        """
+        tasks = queue.Queue()
+        workers = []
+        for i in range(self.threads):
+            worker = threading.Thread(target=self.__work, args=(tasks,))
+            worker.daemon = True
+            worker.start()
+            workers.append(worker)
+        items = iter(items)
+        pending = collections.deque()
+        (files, read, read_seconds, waits, wait_seconds) = (0, 0, 0.0, 0, 0.0)
+        try:
+            while True:
+                while len(pending) < self.depth:
+                    item = next(items, None)
+                    if item is None:
+                        break
+                    slot = Slot(path(item))
+                    pending.append((item, slot))
+                    if slot.path is None:
+                        slot.done.set()
+                    else:
+                        tasks.put(slot)
+                if not pending:
+                    return
+                (item, slot) = pending.popleft()
+                if not slot.done.is_set():
+                    start = timer()
+                    # wait with a timeout, which lets python 2 see ^C
+                    while not slot.done.wait(0.5):
+                        pass
+                    waits += 1
+                    wait_seconds += timer() - start
+                files += 1
+                if slot.content is not None:
+                    read += 1
+                    read_seconds += slot.seconds
+                yield (item, slot.content)
+        finally:
+            for (item, slot) in pending:
+                slot.cancelled = True
+            for worker in workers:
+                tasks.put(None)
+            # at most one read each is left, as the others are cancelled
+            for worker in workers:
+                worker.join()
+            self.files += files
+            self.read += read
+            self.read_seconds += read_seconds
+            self.waits += waits
+            self.wait_seconds += wait_seconds
+            if self.profiler is not None:
+                self.profiler.stage('prefetch', read_seconds, read)
+                self.profiler.stage('prefetch_wait', wait_seconds, waits)
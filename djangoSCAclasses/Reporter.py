@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+
+import os
+import json
+
+
+def summary_text(fext, fwarn):
+    out = '\n[*] Stage 2: File Analysis Summary\n'
+    for k in sorted(fext.keys()):
+        out += '    [-] Extension [.%-4s]: %6d files, %4d warnings\n' % \
+            (k, fext[k], fwarn[k])
+    out += """\
+    [+] template files are identified by regular expression match.
+    [+] xml files are analyzed with the xml rules and crossdomain checks.
+    [+] all python scripts will be analyzed."""
+    return out
+
+
+def to_text(value):
+    # json needs unicode text, but file content may not be valid utf-8
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    return value
+
+
+class Reporter(object):
+
+    """
+    This class is the base of the report writers, and itself writes the
+    traditional text report.  A reporter is driven by djangoSCA.py as the
+    scan progresses: start() once, settings() with the Stage 1 findings,
+    stage2() before the first file, findings() as each file completes,
+    and finish() with the per-extension file and warning counts.
+    Findings are written as soon as they are handed over, so the report
+    is streamed rather than buffered.
+    SettingsCheck writes its own text report to settings_handle(), which
+    for the machine readable formats is a sink that discards it.
+    """
+
+    format = 'text'
+
+    def __init__(self, filehandle, ruleset, title, version):
+        self.filehandle = filehandle
+        self.ruleset = ruleset
+        self.title = title
+        self.version = version
+
+    def settings_handle(self):
+        return self.filehandle
+
+    def start(self, projdir, date):
+        self.filehandle.write("""
+[*]___________________________________________________________
+[*]
+[*] %s Version %s
+[*] Author: Joff Thyer (c) 2013
+[*] Project Dir/Name..: %s
+[*] Date of Test......: %s
+[*]___________________________________________________________
+
+[*]---------------------------------
+[*] STAGE 1: Project Settings Tests
+[*]---------------------------------
+
+""" % (self.title, self.version, projdir, date))
+
+    def note(self, text):
+        self.filehandle.write('[*] %s\n' % (text))
+
+    def settings(self, findings):
+        pass
+
+    def stage2(self):
+        self.filehandle.write("""
+
+[*]---------------------------------------------
+[*] STAGE 2: Testing ALL directories and files
+[*] .... Warning - This may take some time ....
+[*]---------------------------------------------
+
+""")
+
+    def findings(self, findings):
+        for f in findings:
+            self.filehandle.write('%s\n' % (f))
+
+    def finish(self, fext, fwarn):
+        pass
+
+
+class NullHandle(object):
+
+    """
+    A write-only file handle which discards everything written to it.
+    """
+
+    def write(self, data):
+        pass
+
+    def flush(self):
+        pass
+
+
+class JsonLinesReporter(Reporter):
+
+    """
+    This class writes one JSON object per line.  Every finding of both
+    stages is a record of type "finding", with the fingerprint of the
+    finding when it has one, and the scan ends with a record of type
+    "summary" holding the per-extension counts.
+    """
+
+    format = 'jsonl'
+
+    def settings_handle(self):
+        return NullHandle()
+
+    def __write(self, record):
+        self.filehandle.write(json.dumps(record, sort_keys=True) + '\n')
+
+    def start(self, projdir, date):
+        self.__write({'type': 'start', 'tool': self.title,
+                      'version': self.version, 'project': to_text(projdir),
+                      'date': date})
+
+    def note(self, text):
+        self.__write({'type': 'note', 'message': to_text(text)})
+
+    def __finding(self, f, stage):
+        record = {'type': 'finding', 'stage': stage,
+                  'file': to_text(f.filename), 'line': f.line,
+                  'column': f.column, 'rule': f.rule.id,
+                  'category': f.rule.category,
+                  'message': to_text(f.message())}
+        if f.fingerprint is not None:
+            record['fingerprint'] = f.fingerprint
+        self.__write(record)
+
+    def settings(self, findings):
+        for f in findings:
+            self.__finding(f, 1)
+
+    def stage2(self):
+        pass
+
+    def findings(self, findings):
+        for f in findings:
+            self.__finding(f, 2)
+
+    def finish(self, fext, fwarn):
+        self.__write({'type': 'summary',
+                      'files': fext, 'warnings': fwarn,
+                      'total_files': sum(fext.values()),
+                      'total_warnings': sum(fwarn.values())})
+
+
+class SarifReporter(Reporter):
+
+    """
+    This class writes a SARIF 2.1.0 log with a single run.  The results
+    array is streamed as findings arrive.  The tool section, with one
+    rule descriptor per rules file entry and per built in rule that
+    produced a result, is written after the results, which JSON object
+    member ordering allows.
+    """
+
+    format = 'sarif'
+    schema = 'https://json.schemastore.org/sarif-2.1.0.json'
+
+    def settings_handle(self):
+        return NullHandle()
+
+    def start(self, projdir, date):
+        self.projdir = projdir
+        self.count = 0
+        self.rules = {}
+        self.rule_order = []
+        for section in self.ruleset.REGEX_SECTIONS + \
+                self.ruleset.PATH_SECTIONS:
+            for (p, rule) in self.ruleset.compiled(section):
+                self.__add_rule(rule, p.pattern)
+        self.filehandle.write('{"$schema": %s, "version": "2.1.0", "runs": '
+                              '[{"results": [' % (json.dumps(self.schema)))
+
+    def __add_rule(self, rule, pattern=None):
+        if rule.id in self.rules:
+            return
+        descriptor = {'id': rule.id,
+                      'shortDescription': {'text': to_text(
+                          rule.message.replace('%%', '%'))},
+                      'properties': {'section': rule.section,
+                                     'category': rule.category}}
+        if pattern is not None:
+            descriptor['properties']['pattern'] = to_text(pattern)
+        self.rules[rule.id] = descriptor
+        self.rule_order.append(rule.id)
+
+    def __result(self, f):
+        self.__add_rule(f.rule)
+        location = {'artifactLocation': {'uri': to_text(f.filename),
+                                         'uriBaseId': 'SRCROOT'}}
+        if f.line is not None and f.line > 0:
+            location['region'] = {'startLine': f.line}
+            if f.column is not None:
+                location['region']['startColumn'] = f.column + 1
+        result = {'ruleId': f.rule.id, 'level': 'warning',
+                  'message': {'text': to_text(f.message())},
+                  'locations': [{'physicalLocation': location}]}
+        if f.fingerprint is not None:
+            result['partialFingerprints'] = {'djangosca/v1': f.fingerprint}
+        if self.count:
+            self.filehandle.write(',')
+        self.filehandle.write('\n' + json.dumps(result, sort_keys=True))
+        self.count += 1
+
+    def note(self, text):
+        pass
+
+    def settings(self, findings):
+        for f in findings:
+            self.__result(f)
+
+    def stage2(self):
+        pass
+
+    def findings(self, findings):
+        for f in findings:
+            self.__result(f)
+
+    def finish(self, fext, fwarn):
+        tool = {'driver': {'name': self.title, 'version': self.version,
+                           'rules': [self.rules[r] for r in self.rule_order]}}
+        base = os.path.abspath(self.projdir).rstrip('/') + '/'
+        self.filehandle.write('\n], "tool": %s, "originalUriBaseIds": %s}]}\n'
+                              % (json.dumps(tool, sort_keys=True),
+                                 json.dumps({'SRCROOT': {'uri': 'file://'
+                                                         + base}})))
+
+
+REPORTERS = {
+    'text': Reporter,
+    'jsonl': JsonLinesReporter,
+    'sarif': SarifReporter,
+}
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import time
+import marshal
+import hashlib
+import sqlite3
+from djangoSCAclasses.Finding import Finding
+
+
+class ResultCache(object):
+
+    """
+    This class implements a persistent on-disk cache of per-file scan
+    results, stored in an sqlite database inside the cache directory.
+    Entries are keyed by a hash of the rules digest and selection, the
+    file short name and the file content, so any edit to either the file
+    or the rules file results in a cache miss.  Entries of other rules
+    files are left in place rather than dropped, so that runs with
+    different rules (or selections) sharing one cache directory, such
+    as concurrent hooks and CI jobs, do not wipe each other's results;
+    they age out instead.
+    The number of entries is bounded, and the least recently used
+    entries are evicted when the cache is closed.
+    Only the owning (main) process writes to the cache.  A pickled copy,
+    as used by worker processes, reopens the database for lookups only.
+    The database is shared with other runs: it is opened in WAL mode so
+    that lookups do not wait for writers, and writes are buffered and
+    written in one short transaction every COMMIT_INTERVAL writes or
+    COMMIT_SECONDS, so that the write lock is only held for as long as
+    that takes.  A run waits up to BUSY_TIMEOUT seconds for a lock held
+    by another.  Should the database still fail, the cache
+    is disabled for the rest of the run, which then carries on without
+    it, every lookup being a miss.
+    The cache also records the files the settings checks of a project
+    last read, such as the modules its settings import, so that a scan
+    of changed files knows to run the settings checks again when one of
+    them is changed (see changed_settings_path).
+    """
+
+    # bump when the format of cached results changes
+    VERSION = '7'
+
+    # number of writes, and seconds, between commits
+    COMMIT_INTERVAL = 100
+    COMMIT_SECONDS = 1.0
+
+    # seconds to wait for a database locked by another run
+    BUSY_TIMEOUT = 10.0
+
+    def __init__(self, cachedir, ruleset, max_entries=200000):
+        self.cachedir = cachedir
+        self.digest = ruleset.digest
+        self.selection = ruleset.selection
+        self.max_entries = max_entries
+        self.readonly = False
+        self.hits = 0
+        self.misses = 0
+        self.writes = []
+        self.committed = time.time()
+        self.db = None
+        try:
+            if not os.path.isdir(self.cachedir):
+                os.makedirs(self.cachedir)
+            self.__open()
+        except (OSError, sqlite3.Error) as e:
+            self.__failed(e)
+
+    def __getstate__(self):
+        return {'cachedir': self.cachedir, 'digest': self.digest,
+                'selection': self.selection,
+                'max_entries': self.max_entries,
+                'enabled': self.db is not None}
+
+    def __setstate__(self, state):
+        enabled = state.pop('enabled')
+        self.__dict__.update(state)
+        self.readonly = True
+        self.hits = 0
+        self.misses = 0
+        self.writes = []
+        self.committed = time.time()
+        self.db = None
+        if not enabled:
+            return
+        try:
+            self.db = self.__connect()
+        except sqlite3.Error as e:
+            self.__failed(e)
+
+    def __connect(self):
+        # writes take the lock when their transaction begins, waiting for
+        # it if need be, rather than failing when upgrading a read lock
+        return sqlite3.connect(os.path.join(self.cachedir, 'results.db'),
+                               timeout=self.BUSY_TIMEOUT,
+                               isolation_level='IMMEDIATE')
+
+    def __open(self):
+        self.db = self.__connect()
+        (mode,) = self.db.execute("PRAGMA journal_mode").fetchone()
+        if mode != 'wal':
+            self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS results (
+            key TEXT PRIMARY KEY, warnings BLOB, atime REAL)""")
+        self.db.execute("""CREATE INDEX IF NOT EXISTS results_atime
+            ON results (atime)""")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS settings (
+            project TEXT PRIMARY KEY, files BLOB)""")
+        self.db.commit()
+
+    def __failed(self, err):
+        sys.stderr.write('ResultCache(): cache [%s] disabled: %s\n'
+                         % (self.cachedir, err))
+        if self.db is not None:
+            try:
+                self.db.close()
+            except sqlite3.Error:
+                pass
+        self.db = None
+
+    def key(self, shortname, reader, modelforms=None):
+        """
+        return the cache key for a ContentReader's file content, and the
+        ModelForm classes a SymbolIndex found in it, which findings also
+        depend on
+        """
+        h = hashlib.sha1(self.VERSION + ':' + self.digest)
+        if self.selection:
+            h.update('\0' + self.selection)
+        h.update('\0' + shortname + '\0')
+        if modelforms is not None:
+            h.update(','.join(sorted(modelforms)) + '\0')
+        reader.update_hash(h)
+        return h.hexdigest()
+
+    def get(self, key, ruleset):
+        """
+        return the cached list of Findings for key, or None on a miss,
+        their rules being those of ruleset, the RuleSet of the key
+        """
+        row = None
+        if self.db is not None:
+            try:
+                row = self.db.execute(
+                    "SELECT warnings FROM results WHERE key = ?",
+                    (key,)).fetchone()
+            except sqlite3.Error as e:
+                self.__failed(e)
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [Finding.fromtuple(t, ruleset)
+                for t in marshal.loads(str(row[0]))]
+
+    def put(self, key, warnings):
+        self.__write("INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+                     (key, sqlite3.Binary(marshal.dumps(
+                         [w.astuple() for w in warnings])),
+                      time.time()))
+
+    def settings_files(self, projdir, settings):
+        """
+        return the settings directory of a project and the files its
+        settings checks last read, or None when they are not known
+        """
+        row = None
+        if self.db is not None:
+            try:
+                row = self.db.execute(
+                    "SELECT files FROM settings WHERE project = ?",
+                    (self.__project(projdir, settings),)).fetchone()
+            except sqlite3.Error as e:
+                self.__failed(e)
+        if row is None:
+            return None
+        return marshal.loads(str(row[0]))
+
+    def put_settings_files(self, projdir, settings, path, files):
+        self.__write("INSERT OR REPLACE INTO settings VALUES (?, ?)",
+                     (self.__project(projdir, settings),
+                      sqlite3.Binary(marshal.dumps((path, list(files))))))
+
+    def __project(self, projdir, settings):
+        return os.path.realpath(projdir) + '\0' + settings
+
+    def touch(self, key):
+        self.__write("UPDATE results SET atime = ? WHERE key = ?",
+                     (time.time(), key))
+
+    def __write(self, sql, params):
+        if self.db is None:
+            return
+        self.writes.append((sql, params))
+        if len(self.writes) >= self.COMMIT_INTERVAL or \
+                time.time() - self.committed >= self.COMMIT_SECONDS:
+            self.__flush()
+
+    def __flush(self):
+        try:
+            for (sql, params) in self.writes:
+                self.db.execute(sql, params)
+            self.db.commit()
+        except sqlite3.Error as e:
+            self.__failed(e)
+        self.writes = []
+        self.committed = time.time()
+
+    def close(self):
+        if self.db is None:
+            return
+        if self.writes:
+            self.__flush()
+            if self.db is None:
+                return
+        try:
+            if not self.readonly:
+                (count,) = self.db.execute(
+                    "SELECT COUNT(*) FROM results").fetchone()
+                if count > self.max_entries:
+                    self.db.execute("""DELETE FROM results WHERE key IN (
+                        SELECT key FROM results ORDER BY atime LIMIT ?)""",
+                                    (count - self.max_entries,))
+                self.db.commit()
+            self.db.close()
+        except sqlite3.Error as e:
+            self.__failed(e)
+        self.db = None
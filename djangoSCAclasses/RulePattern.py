@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+
+import re
+try:
+    import sre_parse
+    import sre_constants
+except ImportError:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+
+
+def split_alternatives(pattern):
+    """
+    split a pattern on its top level '|' characters, that is, those not
+    escaped and not inside a group or a character class.
+    """
+    parts = []
+    depth = 0
+    inclass = False
+    escaped = False
+    start = 0
+    for (i, c) in enumerate(pattern):
+        if escaped:
+            escaped = False
+        elif c == '\\':
+            escaped = True
+        elif inclass:
+            if c == ']':
+                inclass = False
+        elif c == '[':
+            inclass = True
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        elif c == '|' and depth == 0:
+            parts.append(pattern[start:i])
+            start = i + 1
+    parts.append(pattern[start:])
+    return parts
+
+
+def ends_with_wildcard(alt, quantifier):
+    # the trailing '.' must not itself be escaped
+    if not alt.endswith('.' + quantifier):
+        return False
+    prefix = alt[:-2]
+    return (len(prefix) - len(prefix.rstrip('\\'))) % 2 == 0
+
+
+def rewrite_pattern(pattern):
+    """
+    A rule applied with re.match() whose every top level alternative
+    starts with '.*' or '.+' is only asking whether the rest of the
+    alternative occurs somewhere in the line.  Such patterns are
+    rewritten without the leading and trailing wildcards, to be applied
+    with re.search() instead, which avoids the backtracking through the
+    wildcard.  A leading '.+' becomes a '(?<=.)' look-behind and a
+    trailing '.+' a '(?=.)' look-ahead, so results stay the same for a
+    single line.  As '.' does not match a newline, re.match() of the
+    pattern as written never finds what starts past the first line of
+    a longer text, which re.search() does: see RulePattern.match_text().
+    Returns (pattern, True) when rewritten, or (pattern, False) when not.
+    """
+    alts = []
+    for alt in split_alternatives(pattern):
+        if alt.startswith('.*'):
+            alt = alt[2:]
+        elif alt.startswith('.+'):
+            alt = '(?<=.)' + alt[2:]
+        else:
+            return (pattern, False)
+        while ends_with_wildcard(alt, '*'):
+            alt = alt[:-2]
+        if ends_with_wildcard(alt, '+'):
+            alt = alt[:-2] + '(?=.)'
+        if not alt:
+            return (pattern, False)
+        alts.append('(?:%s)' % (alt))
+    return ('|'.join(alts), True)
+
+
+def is_wildcard(sub):
+    return len(sub) == 1 and sub[0][0] == sre_constants.ANY
+
+
+def backtracking_risk(seq, in_repeat=False):
+    """
+    inspect a parsed pattern for constructs known to backtrack badly:
+    an unbounded repeat nested within another unbounded repeat, or more
+    than one unbounded wildcard repeat in the same sequence.
+    """
+    wildcards = 0
+    for (op, av) in seq:
+        if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            (lo, hi, sub) = av
+            unbounded = hi == sre_constants.MAXREPEAT
+            if unbounded and in_repeat:
+                return 'nested unbounded quantifiers'
+            if unbounded and is_wildcard(sub):
+                wildcards += 1
+            risk = backtracking_risk(sub, in_repeat or unbounded)
+            if risk:
+                return risk
+        elif op == sre_constants.SUBPATTERN:
+            risk = backtracking_risk(av[-1], in_repeat)
+            if risk:
+                return risk
+        elif op == sre_constants.BRANCH:
+            for branch in av[1]:
+                risk = backtracking_risk(branch, in_repeat)
+                if risk:
+                    return risk
+    if wildcards > 1:
+        return 'multiple unbounded wildcards'
+    return None
+
+
+class RulePattern(object):
+
+    """
+    This class is the compiled form of a single rule pattern.  The
+    'match' attribute is the function that decides whether a string
+    matches the rule: either re.match() of the pattern as written, or
+    re.search() of the rewritten pattern (see rewrite_pattern()).
+    'pattern' is the pattern as written in the rules file, 'regex' the
+    compiled effective pattern, and 'risk' describes any backtracking
+    risk found in the effective pattern, or is None.
+    'match' is meant for single lines; match_text() also takes text
+    which may hold several, such as a string constant.
+    """
+
+    __slots__ = ('pattern', 'regex', 'search', 'match', 'risk')
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        (effective, self.search) = rewrite_pattern(pattern)
+        try:
+            self.regex = re.compile(effective)
+        except re.error:
+            # fall back to the pattern exactly as written
+            self.regex = re.compile(pattern)
+            self.search = False
+        if self.search:
+            self.match = self.regex.search
+        else:
+            self.match = self.regex.match
+        try:
+            self.risk = backtracking_risk(sre_parse.parse(self.regex.pattern))
+        except Exception:
+            self.risk = None
+
+    def match_text(self, text):
+        """
+        return the match of text, which may hold several lines, as
+        re.match() of the pattern as written: a match found by the
+        rewritten pattern only counts when it starts on the first line.
+        """
+        m = self.match(text)
+        if m is not None and self.search and '\n' in text[:m.start()]:
+            return None
+        return m
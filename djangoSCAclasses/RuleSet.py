@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+
+import re
+import sys
+import csv
+import fnmatch
+import hashlib
+from djangoSCAclasses.LineMatcher import LineMatcher
+from djangoSCAclasses.RulePattern import RulePattern
+from djangoSCAclasses.XmlCheck import XmlPath
+from djangoSCAclasses.Finding import Rule, intern_rule
+
+# the RuleSets unpickled by this process, by rules and selection
+unpickled = {}
+
+
+def unpickle_ruleset(state):
+    """
+    return the RuleSet of a pickled state, compiling it only the first
+    time this process receives it
+    """
+    key = (state['rows'], state['select'], state['exclude'])
+    ruleset = unpickled.get(key)
+    if ruleset is None:
+        ruleset = RuleSet.__new__(RuleSet)
+        ruleset.__setstate__(state)
+        unpickled[key] = ruleset
+    return ruleset
+
+
+class RuleSet(object):
+
+    """
+    This class loads the DjangoSCA rules file exactly once, and compiles
+    every regular expression rule at load time.  A single instance is
+    intended to be shared read-only by SettingsCheck and every MyParser
+    created during a scan, so that the per-file cost of rule handling
+    is zero.  Rules are kept per section in the order they appear in the
+    rules file as tuples of (pattern, message).  Compiled sections hold
+    tuples of (RulePattern, Rule), where each Rule is given an id of
+    the form '<section>-<n>' from its position within the section.
+    rule() finds the Rule of an id, so findings recorded by id (see
+    ResultCache) are given the rules of the RuleSet which produced them
+    and not those of another loaded by the same process.
+    Patterns which risk excessive backtracking are listed in 'risky' as
+    tuples of (rule id, pattern, reason).
+    When pickled (for example when sent to a worker process), only the
+    raw rule rows are transferred, and the regular expressions are
+    compiled once again on the receiving side, but only once per
+    process: a RuleSet sent along with every job given to an executor
+    is compiled by each worker for its first job, and reused after.
+    Line based sections ('general' and 'template') additionally get a
+    LineMatcher which evaluates all of their rules in one pass.
+    The 'xml' section holds element and attribute paths, compiled to
+    XmlPath rather than RulePattern, which are checked over XML files
+    by an XmlCheck.
+    The 'digest' attribute identifies the rule content, and changes
+    whenever a rule is edited, added or removed.
+    select and exclude are lists of patterns (with shell style
+    wildcards), each matched against the id, the section and the
+    category of a rule, such as 'general-003', 'template', 'settings_*'
+    or 'OWASP-CR-InputValidation'.  When select is given, only the
+    rules matching one of its patterns run, less those matching one of
+    the exclude patterns.  Rules left out are dropped from the compiled
+    sections and their LineMatchers, so they cost nothing when
+    scanning; rule ids are given before, so they do not depend on the
+    selection.  Built in rules are asked about with selects(), and the
+    'selection' attribute identifies the selection, '' for all rules.
+    """
+
+    # sections whose patterns are regular expressions
+    REGEX_SECTIONS = ('import', 'string', 'general', 'template')
+
+    # sections matched line by line against file content
+    LINE_SECTIONS = ('general', 'template')
+
+    # sections whose patterns are XML element and attribute paths
+    PATH_SECTIONS = ('xml',)
+
+    def __init__(self, rulesfile, select=None, exclude=None):
+        self.rulesfile = rulesfile
+        self.select = tuple(select or ())
+        self.exclude = tuple(exclude or ())
+        try:
+            self.rows = self.__read_rows(rulesfile)
+        except:
+            raise
+        self.__build()
+
+    def __reduce__(self):
+        return (unpickle_ruleset, (self.__getstate__(),))
+
+    def __getstate__(self):
+        return {'rulesfile': self.rulesfile, 'rows': self.rows,
+                'select': self.select, 'exclude': self.exclude}
+
+    def __setstate__(self, state):
+        self.rulesfile = state['rulesfile']
+        self.rows = state['rows']
+        self.select = state['select']
+        self.exclude = state['exclude']
+        self.__build()
+
+    def rules(self, section):
+        """
+        return a tuple of (pattern, message) for a rules file section
+        """
+        return self.__rules.get(section, ())
+
+    def compiled(self, section):
+        """
+        return a tuple of (RulePattern, Rule) for a rules file section,
+        or of (XmlPath, Rule) for the 'xml' section
+        """
+        return self.__compiled.get(section, ())
+
+    def rule(self, id):
+        """
+        return the Rule of an id, either of the rules file or built in
+        """
+        rule = self.__byid.get(id)
+        if rule is None:
+            rule = Rule.builtins[id]
+        return rule
+
+    def selects(self, rule, *sections):
+        """
+        return whether a Rule is selected, matching the patterns against
+        its id, section and category, and the further sections given,
+        such as the rules file section a built in rule reads
+        """
+        key = (rule.id,) + sections
+        selected = self.__selected.get(key)
+        if selected is None:
+            names = [rule.id, rule.section] + list(sections)
+            if rule.category:
+                names.append(rule.category)
+            selected = (not self.select or
+                        self.__matches(self.select, names)) and \
+                not self.__matches(self.exclude, names)
+            self.__selected[key] = selected
+        return selected
+
+    def __matches(self, patterns, names):
+        for pattern in patterns:
+            pattern = pattern.lstrip('%')
+            for name in names:
+                if fnmatch.fnmatchcase(name, pattern):
+                    return True
+        return False
+
+    def matcher(self, section):
+        """
+        return the single pass LineMatcher for a line based section
+        """
+        return self.__matchers[section]
+
+    def __read_rows(self, rulesfile):
+        try:
+            f = open(rulesfile, 'r')
+        except:
+            sys.stderr.write('__load_rules(): failed to open rules file\n')
+            raise
+
+        rows = []
+        for row in csv.reader(f, delimiter=',', quotechar='"'):
+            if len(row) < 2 or re.match(r'^#.+', row[0]):
+                continue
+            rows.append(tuple(row))
+        f.close()
+        return tuple(rows)
+
+    def __build(self):
+        self.digest = hashlib.sha1(repr(self.rows)).hexdigest()
+        self.selection = ''
+        if self.select or self.exclude:
+            self.selection = repr((self.select, self.exclude))
+        self.__selected = {}
+        rules = {}
+        for row in self.rows:
+            if len(row) > 2:
+                message = row[2]
+            else:
+                message = ''
+            rules.setdefault(row[0], []).append((row[1], message))
+        self.__rules = dict((k, tuple(v)) for (k, v) in rules.items())
+
+        self.__compiled = {}
+        self.__byid = {}
+        self.risky = []
+        for section in self.REGEX_SECTIONS:
+            try:
+                self.__compiled[section] = \
+                    self.__regex_compile(section, self.rules(section))
+            except:
+                raise
+        for section in self.PATH_SECTIONS:
+            self.__compiled[section] = self.__regex_compile(
+                section, self.rules(section), XmlPath)
+
+        self.__matchers = {}
+        for section in self.LINE_SECTIONS:
+            self.__matchers[section] = LineMatcher(self.compiled(section))
+
+    def __regex_compile(self, section, rule_list, compile=RulePattern):
+        re_list = []
+        for (n, (r, message)) in enumerate(rule_list):
+            rule = intern_rule('%s-%03d' % (section, n + 1), section, message,
+                               pattern=r)
+            self.__byid[rule.id] = rule
+            if not self.selects(rule):
+                continue
+            try:
+                p = compile(r)
+            except (re.error, ValueError) as e:
+                sys.stderr.write('__load_rules(): regex compiled failed for [%s] [%s]\n' % (r, e))
+                raise
+            if p.risk:
+                self.risky.append((rule.id, r, p.risk))
+            re_list.append((p, rule))
+        return tuple(re_list)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+import os
+import json
+import socket
+
+
+def send_message(fh, header, payloads=()):
+    """
+    write a message: a single line JSON header, which records the size
+    of each payload, followed by the payloads themselves.
+    """
+    header = dict(header)
+    header['sizes'] = [len(p) for p in payloads]
+    fh.write(json.dumps(header, sort_keys=True).encode('utf-8') + b'\n')
+    for p in payloads:
+        fh.write(p)
+    fh.flush()
+
+
+def read_message(fh):
+    """
+    read a message written by send_message(), and return a tuple of
+    (header, list of payloads), or (None, []) at end of file.
+    """
+    line = fh.readline()
+    if not line:
+        return (None, [])
+    header = json.loads(line.decode('utf-8'))
+    payloads = []
+    for size in header.get('sizes', []):
+        data = fh.read(size)
+        if len(data) != size:
+            raise IOError('truncated message')
+        payloads.append(data)
+    return (header, payloads)
+
+
+class ScanClient(object):
+
+    """
+    This class is the thin client of a ScanDaemon, talking to it over a
+    Unix socket.  It only asks the daemon for a report, so it needs none
+    of the analysis classes, nor Django.  scan() returns the report in
+    the requested format as produced by the daemon, with the per file
+    extension file and warning counts for the summary.
+    """
+
+    def __init__(self, socket_path, timeout=None):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def scan(self, projdir, paths=None, format='text', date=''):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except socket.error as e:
+            sock.close()
+            raise IOError('cannot connect to daemon at [%s]: %s'
+                          % (self.socket_path, e))
+        fh = sock.makefile('rwb')
+        try:
+            send_message(fh, {'project': os.path.realpath(projdir),
+                              'paths': paths, 'format': format,
+                              'date': date})
+            (header, payloads) = read_message(fh)
+        finally:
+            fh.close()
+            sock.close()
+        if header is None:
+            raise IOError('daemon closed the connection')
+        if header.get('error'):
+            raise IOError('daemon error: %s' % (header['error']))
+        return (payloads[0], header['files'], header['warnings'])
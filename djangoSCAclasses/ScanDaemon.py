@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import time
+import signal
+import threading
+try:
+    import SocketServer as socketserver
+    from cStringIO import StringIO
+except ImportError:
+    import socketserver
+    from io import BytesIO as StringIO
+from djangoSCAclasses.DjangoFileCheck import DjangoFileCheck
+from djangoSCAclasses.SettingsCheck import SettingsCheck
+from djangoSCAclasses.Reporter import REPORTERS
+from djangoSCAclasses.ScanClient import send_message, read_message
+from djangoSCAclasses.ProjectFiles import FILE_RXP, select_files, \
+    changed_settings_path
+from djangoSCAclasses.FileInventory import FileInventory
+from djangoSCAclasses.SymbolIndex import build_index
+
+
+def file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime, st.st_size)
+
+
+class ScanServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+
+class ScanHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        (request, payloads) = read_message(self.rfile)
+        if request is None:
+            return
+        try:
+            (report, fext, fwarn) = self.server.scan_daemon.report(request)
+        except Exception as e:
+            send_message(self.wfile, {'error': '%s: %s'
+                                      % (type(e).__name__, e)})
+            return
+        send_message(self.wfile, {'files': fext, 'warnings': fwarn},
+                     [report])
+
+
+class ScanDaemon(object):
+
+    """
+    This class keeps a project scan warm in a long lived process.  The
+    compiled RuleSet, the inventory of project files, the Stage 1 results
+    and the findings of every file are held in memory, and requests for
+    a report are answered over a Unix socket (see ScanClient).
+    A file is only analyzed again when its modification time or size
+    has changed.  The project tree is walked again every poll seconds
+    in a background thread, which also analyzes new and changed files
+    ahead of the next request, using the sizes and modification times
+    the walk recorded (see FileInventory).  Files in the inventory are
+    checked for changes on every request, but a file created since the
+    last walk is only seen by a full scan once the next walk has found
+    it.  The SymbolIndex of the project is built again, from only the
+    python files which changed, when a python file has changed, and a
+    file is analyzed again when the ModelForm classes the index finds
+    in it change.
+    The settings checks run again whenever the settings module, or a
+    module it imports settings from, changes.
+    A request either names the paths to scan (as with --since and
+    --files-from), or asks for the whole project with paths of None,
+    and the report is produced by the same Reporter classes as the
+    command line scan.  The Stage 2 findings of a Baseline given when
+    the daemon starts are left out of every report.
+    """
+
+    def __init__(self, projdir, ruleset, title, version,
+                 settings='settings.py', ignore=None, max_size=0,
+                 timeouts=(0, 0), poll=2.0, gitignore=False, sniff=True,
+                 baseline=None):
+        self.projdir = projdir
+        self.ruleset = ruleset
+        self.title = title
+        self.version = version
+        self.settings = settings
+        self.ignore = ignore
+        self.max_size = max_size
+        self.timeouts = timeouts
+        self.poll = poll
+        self.gitignore = gitignore
+        self.sniff = sniff
+        self.baseline = baseline
+        self.lock = threading.RLock()
+        self.inventory = []
+        self.skipped = {}
+        self.index = None
+        self.index_paths = None
+        self.index_stamps = None
+        self.results = {}
+        self.settings_path = None
+        self.settings_result = None
+        self.refresh()
+
+    def refresh(self):
+        """
+        walk the project tree, bringing the inventory and the findings of
+        every file up to date.  Files are analyzed without holding the
+        lock, so requests are answered meanwhile, and the new findings
+        swapped in under it, unless a request analyzed the file first.
+        """
+        walk = FileInventory(self.projdir, self.ignore, FILE_RXP,
+                             self.gitignore, self.sniff)
+        inventory = [(path, ext) for (path, ext, size, mtime) in walk.files]
+        stamps = [file_stamp(path) for path in walk.python]
+        index = self.index
+        if walk.python != self.index_paths or stamps != self.index_stamps:
+            index = build_index(self.projdir, walk.python, self.max_size,
+                                self.index)
+        with self.lock:
+            previous = dict(self.results)
+        updated = {}
+        for (path, ext, size, mtime) in walk.files:
+            entry = self.analyze(path, (mtime, size), index,
+                                 previous.get(path))
+            if entry is not None and entry is not previous.get(path) and \
+                    self.complete(entry):
+                updated[path] = entry
+        with self.lock:
+            self.inventory = inventory
+            self.index = index
+            self.index_paths = walk.python
+            self.index_stamps = stamps
+            self.settings_path = walk.settings_path
+            self.skipped = walk.skipped
+            present = set(path for (path, ext) in self.inventory)
+            for fullpath in list(self.results):
+                if fullpath not in present:
+                    del self.results[fullpath]
+            for (path, entry) in updated.items():
+                if self.results.get(path) is previous.get(path):
+                    self.results[path] = entry
+
+    def analyze(self, fullpath, stamp, index, cached=None):
+        """
+        return the (stamp, findings, modelforms) entry of a file whose
+        (mtime, size) is stamp, analyzing it unless cached, its previous
+        entry, is still up to date, or None if it could not be read.
+        """
+        modelforms = None
+        if index is not None:
+            modelforms = index.modelforms(fullpath)
+        if cached is not None and cached[0] == stamp and \
+                cached[2] == modelforms:
+            return cached
+        try:
+            dfc = DjangoFileCheck(self.projdir, fullpath, self.ruleset, None,
+                                  self.max_size, None, self.timeouts,
+                                  modelforms)
+        except IOError:
+            return None
+        return (stamp, dfc.check(), modelforms)
+
+    @staticmethod
+    def complete(entry):
+        # results cut short by a time budget are analyzed again next time
+        return not [w for w in entry[1] if w.rule.category == 'timeout']
+
+    def check(self, fullpath, stamp=None):
+        """
+        return the findings of a file, analyzing it only if it changed
+        since it was last analyzed, or None if it no longer exists.
+        stamp is the (mtime, size) of the file when already known.
+        """
+        if stamp is None:
+            stamp = file_stamp(fullpath)
+        if stamp is None:
+            self.results.pop(fullpath, None)
+            return None
+        entry = self.analyze(fullpath, stamp, self.index,
+                             self.results.get(fullpath))
+        if entry is None:
+            return None
+        if self.complete(entry):
+            self.results[fullpath] = entry
+        return entry[1]
+
+    def check_settings(self, path):
+        """
+        return the text and findings of the settings checks, running them
+        again only if one of the settings files read has changed.
+        """
+        name = os.path.join(path, self.settings)
+        if self.settings_result is not None:
+            (checked, files, stamps, result) = self.settings_result
+            if checked == name and \
+                    stamps == [file_stamp(f) for f in files]:
+                return result
+        fh = StringIO()
+        sc = SettingsCheck(name, self.ruleset, fh, self.projdir)
+        self.settings_result = (name, sc.files,
+                                [file_stamp(f) for f in sc.files],
+                                (fh.getvalue(), sc.findings))
+        return self.settings_result[3]
+
+    def report(self, request):
+        """
+        produce the report for a request, returning a tuple of the report,
+        and the per extension file and warning counts.
+        """
+        if os.path.realpath(request['project']) != \
+                os.path.realpath(self.projdir):
+            raise ValueError('daemon serves project [%s]' % (self.projdir))
+        paths = request.get('paths')
+        out = StringIO()
+        reporter = REPORTERS[request.get('format', 'text')](
+            out, self.ruleset, self.title, self.version)
+        reporter.start(self.projdir, request.get('date', ''))
+        file_ext = {}
+        file_ext_warnings = {}
+        suppressed = 0
+        with self.lock:
+            if paths is None:
+                settings_path = self.settings_path
+            else:
+                read = None
+                if self.settings_result is not None:
+                    read = (os.path.dirname(self.settings_result[0]),
+                            self.settings_result[1])
+                settings_path = changed_settings_path(self.projdir, paths,
+                                                      self.settings, read)
+            if paths is not None and settings_path is None:
+                reporter.note('Settings file unchanged, Stage 1 skipped.')
+            elif settings_path is None:
+                reporter.note('No settings module found, Stage 1 skipped.')
+            else:
+                (text, findings) = self.check_settings(settings_path)
+                reporter.settings_handle().write(text)
+                reporter.settings(findings)
+            reporter.stage2()
+
+            if paths is None:
+                files = self.inventory
+            else:
+                files = select_files(self.projdir, paths, self.ignore,
+                                     FILE_RXP)
+            for (fullpath, ext) in files:
+                warnings = self.check(fullpath)
+                if warnings is None:
+                    continue
+                if ext not in file_ext:
+                    file_ext[ext] = 0
+                    file_ext_warnings[ext] = 0
+                file_ext[ext] += 1
+                if self.baseline is not None:
+                    found = len(warnings)
+                    warnings = self.baseline.filter(warnings)
+                    suppressed += found - len(warnings)
+                reporter.findings(warnings)
+                file_ext_warnings[ext] += len(warnings)
+            if paths is None and (self.skipped['binary'] or
+                                  self.skipped['minified']):
+                reporter.note('Skipped %d binary and %d minified files.'
+                              % (self.skipped['binary'],
+                                 self.skipped['minified']))
+            if paths is None and self.skipped['gitignore']:
+                reporter.note('Skipped %d files and directories excluded '
+                              'by .gitignore.' % (self.skipped['gitignore']))
+        if suppressed:
+            reporter.note('Suppressed %d findings of the baseline.'
+                          % (suppressed))
+        reporter.finish(file_ext, file_ext_warnings)
+        return (out.getvalue(), file_ext, file_ext_warnings)
+
+    def __poll(self):
+        while True:
+            time.sleep(self.poll)
+            try:
+                self.refresh()
+            except Exception as e:
+                sys.stderr.write('[!] refresh failed: %s\n' % (e))
+
+    def serve(self, socket_path):
+        """
+        answer requests on socket_path until interrupted
+        """
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        # exit cleanly on SIGTERM, so that the socket is removed
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        server = ScanServer(socket_path, ScanHandler)
+        server.scan_daemon = self
+        poller = threading.Thread(target=self.__poll)
+        poller.daemon = True
+        poller.start()
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            os.unlink(socket_path)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+
+from djangoSCAclasses.DjangoFileCheck import DjangoFileCheck
+from djangoSCAclasses.Profiler import Profiler, timer
+from djangoSCAclasses.ArchiveTree import read_members
+
+# per worker process copies of the RuleSet and ResultCache,
+# set by init_worker()
+worker_ruleset = None
+worker_cache = None
+
+
+def init_worker(ruleset, cache):
+    global worker_ruleset, worker_cache
+    worker_ruleset = ruleset
+    worker_cache = cache
+
+
+def check_file(job, content=None, rules=None):
+    """
+    analyze the file of a job, returning (fullpath, tag, warnings, key,
+    hit, profiler).  rules is the (RuleSet, ResultCache or None) to
+    check it with, by default those of this worker (see init_worker()).
+    """
+    (projdir, fullpath, tag, max_size, timeouts, profile, modelforms) = job
+    (ruleset, cache) = rules or (worker_ruleset, worker_cache)
+    profiler = None
+    if profile:
+        profiler = Profiler()
+        start = timer()
+    dfc = DjangoFileCheck(projdir, fullpath, ruleset, None, max_size,
+                          profiler, timeouts, modelforms, content)
+    key = None
+    warnings = None
+    if cache is not None and not dfc.skipped:
+        if profiler is not None:
+            cstart = timer()
+        key = cache.key(dfc.shortname, dfc, modelforms)
+        warnings = cache.get(key, ruleset)
+        if profiler is not None:
+            profiler.stage('cache', timer() - cstart)
+    hit = warnings is not None
+    if not hit:
+        warnings = dfc.check()
+    if profiler is not None:
+        if hit:
+            profiler.stage('cache_hit', 0.0)
+        profiler.file(dfc.shortname, tag, dfc.size, timer() - start)
+    return (fullpath, tag, warnings, key, hit, profiler)
+
+
+def unread_path(pair):
+    # the file ReadAhead reads for a job, none when its content is read
+    (job, content) = pair
+    if content is None:
+        return job[1]
+    return None
+
+
+def check_job(pair):
+    # a job sent to a worker process with the content read for it
+    return check_file(*pair)
+
+
+class ScanPool(object):
+
+    """
+    This class runs DjangoFileCheck analysis over a sequence of files,
+    either serially in the current process, or spread across a pool of
+    worker processes.  Each worker receives the pickled RuleSet once
+    when it starts.  File paths are fed to the workers in chunks, and
+    results are yielded back in the same order the paths were given,
+    so that the report is identical to a serial run.
+    When a ResultCache is given, files whose content and rules are
+    unchanged are answered from the cache instead of being analyzed.
+    Lookups may happen in the workers, but only this process writes
+    new results to the cache.  Results cut short by a time budget are
+    not cached.
+    When a Profiler is given, each file is profiled where it is checked,
+    and the results are merged into that profiler.
+    timeouts is the (file_timeout, rule_timeout) budget for each file.
+    When a SymbolIndex of the project is given, each file is sent with
+    the names of its ModelForm classes.
+    When io_threads is set, a serial scan reads up to io_depth files
+    ahead of the one being analyzed with that many threads (see
+    ReadAhead).  Parallel scans do not, since the worker processes
+    already read while others analyze.
+    The members of archives (see ArchiveTree) are read in this process,
+    one archive after another in a single pass each, and their content
+    sent along with their jobs, whichever way the files are checked.
+    """
+
+    def __init__(self, ruleset, jobs=1, chunksize=16, cache=None,
+                 max_size=0, profiler=None, timeouts=(0, 0), io_threads=0,
+                 io_depth=32):
+        self.ruleset = ruleset
+        self.io_threads = io_threads
+        self.io_depth = io_depth
+        self.cache = cache
+        self.max_size = max_size
+        self.timeouts = timeouts
+        self.profiler = profiler
+        self.chunksize = chunksize
+        self.pool = None
+        if jobs == 1:
+            self.jobs = jobs
+            return
+        # only parallel scans pay for importing multiprocessing
+        import multiprocessing
+        if jobs == 0:
+            jobs = multiprocessing.cpu_count()
+        self.jobs = jobs
+        if self.jobs > 1:
+            self.pool = multiprocessing.Pool(self.jobs, init_worker,
+                                             (self.ruleset, self.cache))
+
+    def scan(self, projdir, files, index=None):
+        """
+        files is an iterable of (fullpath, tag) and this generator yields
+        (fullpath, tag, warnings) for each file in the same order.
+        """
+        return self.scan_projects([(projdir, files, index)])
+
+    def scan_projects(self, projects):
+        """
+        projects is an iterable of (projdir, files, index), with an index
+        of None where there is none, and this generator yields (fullpath,
+        tag, warnings) for the files of every project in turn.  The
+        files of all the projects are fed to the workers as one
+        sequence, so that the workers go on with the next project while
+        the results of the last one are read.
+        """
+        profile = self.profiler is not None
+        jobs = ((projdir, fullpath, tag, self.max_size, self.timeouts, profile,
+                 index.modelforms(fullpath) if index is not None else None)
+                for (projdir, files, index) in projects
+                for (fullpath, tag) in files)
+        pairs = read_members(jobs, lambda job: job[1], self.max_size)
+        if self.pool is None and self.io_threads:
+            from djangoSCAclasses.ReadAhead import ReadAhead
+            init_worker(self.ruleset, self.cache)
+            readahead = ReadAhead(self.io_threads, self.io_depth,
+                                  self.max_size, self.profiler)
+            results = (check_file(job, read if content is None else content)
+                       for ((job, content), read) in
+                       readahead.iterate(pairs, unread_path))
+        elif self.pool is None:
+            init_worker(self.ruleset, self.cache)
+            results = (check_file(job, content) for (job, content) in pairs)
+        else:
+            results = self.pool.imap(check_job, pairs, self.chunksize)
+        for (fullpath, tag, warnings, key, hit, profiler) in results:
+            if profiler is not None:
+                self.profiler.merge(profiler)
+            if self.cache is not None and key is not None:
+                if hit:
+                    self.cache.touch(key)
+                elif not [w for w in warnings
+                          if w.rule.category == 'timeout']:
+                    self.cache.put(key, warnings)
+            yield (fullpath, tag, warnings)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+
+"""
+The library interface of DjangoSCA, for scanning projects in-process:
+
+    from djangoSCAclasses.Scanner import scan
+
+    for finding in scan('/srv/mysite', rules='djangoSCA.rules'):
+        print finding.rule.id, finding.filename, finding.line
+
+scan() yields Finding objects (see Finding) rather than writing a
+report, and never writes to stdout or exits.
+"""
+
+import os
+import collections
+from djangoSCAclasses.RuleSet import RuleSet
+from djangoSCAclasses.SettingsCheck import SettingsCheck
+from djangoSCAclasses.MyParser import stage_selected
+from djangoSCAclasses.Reporter import NullHandle
+from djangoSCAclasses.ProjectFiles import FILE_RXP
+from djangoSCAclasses.FileInventory import FileInventory
+from djangoSCAclasses.SymbolIndex import build_index
+from djangoSCAclasses.ReadAhead import ReadAhead
+from djangoSCAclasses.ScanPool import check_file
+from djangoSCAclasses.ArchiveTree import read_members
+from djangoSCAclasses.Baseline import Baseline
+
+# the rules file used when none is given, as for djangoSCA.py
+DEFAULT_RULES = '/usr/local/etc/djangoSCA.rules'
+
+
+def scan(project_dir, rules=DEFAULT_RULES, settings='settings.py',
+         ignore=None, gitignore=False, sniff=True, max_size=0,
+         timeouts=(30.0, 5.0), cancel=None, executor=None, window=32,
+         io_threads=2, baseline=None, archives=False):
+    """
+    Scan a Django project, returning a generator of the findings of both
+    stages: first the settings checks, then the files of the project
+    in the same order as djangoSCA.py reports them.  Nothing is read
+    until the generator is first advanced, and each file is analyzed
+    when its findings are asked for.  The stage of a finding can be
+    told by its rule, whose section is 'settings' for Stage 1.
+
+    rules is the name of a rules file, or a RuleSet already loaded,
+    which long lived callers should keep and pass to every scan.  The
+    rules a RuleSet selects are the only ones run.
+    settings, ignore, gitignore, sniff, max_size, timeouts and archives
+    have the same meaning as the djangoSCA.py options.
+
+    cancel is an optional object with an is_set() method, such as a
+    threading.Event, which is checked before each file: once it is set
+    the generator ends early.  Closing the generator (or dropping it)
+    stops the scan as well.
+
+    executor is an optional object with a submit(fn, *args) method
+    returning a future, such as a concurrent.futures executor, which
+    analyzes the files.  Up to window files are submitted ahead of the
+    one whose findings are being yielded, and pending files are
+    cancelled when the scan stops early.  Files are analyzed by the
+    check_file() of ScanPool, which the RuleSet is given to with each
+    file; a worker process compiles the RuleSet it receives only once
+    (see RuleSet).  Without an executor, files are
+    analyzed in the calling thread, while io_threads threads read up to
+    window files ahead (see ReadAhead), unless io_threads is 0.
+
+    baseline is an optional Baseline, or the name of a baseline file,
+    whose Stage 2 findings are not yielded.  Stage 2 findings carry
+    their fingerprint, to write a baseline with write_baseline().
+
+    An IOError is raised straight away if project_dir is not a directory.
+    """
+    if not os.path.isdir(project_dir):
+        raise IOError('project directory [%s] does not exist'
+                      % (project_dir))
+    if isinstance(rules, RuleSet):
+        ruleset = rules
+    else:
+        ruleset = RuleSet(rules)
+    if baseline is not None and not isinstance(baseline, Baseline):
+        baseline = Baseline.load(baseline)
+    return _scan(project_dir, ruleset, settings, ignore, gitignore, sniff,
+                 max_size, timeouts, cancel, executor, window, io_threads,
+                 baseline, archives)
+
+
+def _cancelled(cancel):
+    return cancel is not None and cancel.is_set()
+
+
+def _kept(findings, baseline):
+    if not findings:
+        return []
+    if baseline is None:
+        return findings
+    return baseline.filter(findings)
+
+
+def _unread_path(pair):
+    # the file ReadAhead reads, none for archive members already read
+    (job, content) = pair
+    if content is None:
+        return job[1]
+    return None
+
+
+def _warnings(result):
+    # the findings of a check_file() result, none for a file which can
+    # no longer be read
+    try:
+        return result()[2]
+    except IOError:
+        return None
+
+
+def _scan(projdir, ruleset, settings, ignore, gitignore, sniff, max_size,
+          timeouts, cancel, executor, window, io_threads, baseline,
+          archives):
+    if _cancelled(cancel):
+        return
+    inventory = FileInventory(projdir, ignore, FILE_RXP, gitignore, sniff,
+                              archives)
+
+    settings_path = inventory.settings_path or projdir
+    sc = SettingsCheck(os.path.join(settings_path, settings), ruleset,
+                       NullHandle(), projdir)
+    for finding in sc.findings:
+        yield finding
+
+    if _cancelled(cancel) or not stage_selected(ruleset):
+        return
+    index = build_index(projdir, inventory.python, max_size)
+    jobs = [(projdir, path, ext, max_size, timeouts, False,
+             index.modelforms(path))
+            for (path, ext, size, mtime) in inventory.files]
+    rules = (ruleset, None)
+    # archive members are read here in order, however files are analyzed
+    files = read_members(jobs, lambda job: job[1], max_size)
+
+    if executor is None:
+        if io_threads:
+            readahead = ReadAhead(io_threads, window, max_size)
+            files = ((job, read if content is None else content)
+                     for ((job, content), read) in
+                     readahead.iterate(files, _unread_path))
+        for (job, content) in files:
+            if _cancelled(cancel):
+                return
+            warnings = _warnings(lambda: check_file(job, content, rules))
+            for finding in _kept(warnings, baseline):
+                yield finding
+        return
+
+    files = iter(files)
+    pending = collections.deque()
+    try:
+        while True:
+            if _cancelled(cancel):
+                return
+            while len(pending) < max(window, 1):
+                entry = next(files, None)
+                if entry is None:
+                    break
+                (job, content) = entry
+                pending.append(executor.submit(check_file, job, content,
+                                               rules))
+            if not pending:
+                return
+            for finding in _kept(_warnings(pending.popleft().result),
+                                 baseline):
+                yield finding
+    finally:
+        for future in pending:
+            future.cancel()
@@ -1,141 +1,196 @@
 #!/usr/bin/env python
 
-import tempfile
-import shutil
 import os
-import sys
 import re
-import csv
-try:
-    from django.conf import settings
-    from django.core.exceptions import ImproperlyConfigured
-except:
-    sys.stderr.write('django.conf module not found. You must install Django, or enter an environment in which it is installed first. Exiting.\n')
-    sys.exit(1)
+from djangoSCAclasses.Finding import Finding, builtin_rule
+from djangoSCAclasses.SettingsEvaluator import SettingsEvaluator, Unresolved
+
+# rules for the findings recorded by SettingsCheck
+RULE_NOT_FOUND = builtin_rule(
+    'settings-not-found', 'settings',
+    'Cannot find a Django settings file [%s]', 'settings')
+RULE_FIELD_UNSET = builtin_rule(
+    'settings-required-field-unset', 'settings',
+    '%%OWASP-CR-BestPractice: Required field [%s] has no value set.')
+RULE_VAR_VALUE = builtin_rule(
+    'settings-variable-value', 'settings',
+    '%%OWASP-CR-BestPractice: Incorrect recommended variable setting [%s = %s]')
+RULE_VAR_MISSING = builtin_rule(
+    'settings-variable-missing', 'settings',
+    '%%OWASP-CR-BestPractice: Recommended variable [%s] does not exist.')
+RULE_CUSTOM_MIDDLEWARE = builtin_rule(
+    'settings-custom-middleware', 'settings',
+    '%%OWASP-CR-BestPractice: Custom MIDDLEWARE_CLASSES: %s')
+RULE_IMPROPER = builtin_rule(
+    'settings-improper-configuration', 'settings',
+    'Improper configuration error: %s', 'settings')
+RULE_EXCEPTION = builtin_rule(
+    'settings-exception', 'settings',
+    'Exception of type %s found: %s', 'settings')
+RULE_REC_MIDDLEWARE = builtin_rule(
+    'settings-recommended-middleware', 'settings',
+    '%%OWASP-CR-BestPractice: Recommended MIDDLEWARE_CLASSES: consider using "%s"')
+RULE_REC_APP = builtin_rule(
+    'settings-recommended-app', 'settings',
+    '%%OWASP-CR-BestPractice: Consider using installed app "%s" (%s)')
+RULE_APP_MISSING = builtin_rule(
+    'settings-app-not-configured', 'settings',
+    '%%OWASP-CR-BestPractice: Recommended installed app [%s] is not configured.')
+RULE_PASSWORD_HASHERS = builtin_rule(
+    'settings-password-hashers', 'settings',
+    '%OWASP-CR-BestPractice: PASSWORD_HASHERS should list PBKDF2 or Bcrypt first!')
+
+# the rules of the checks which may be selected, with the rules file
+# section each check reads, by which it may be selected as well
+CHECK_RULES = (
+    (RULE_FIELD_UNSET, 'settings_req_field'),
+    (RULE_VAR_VALUE, 'settings_rec_var'),
+    (RULE_VAR_MISSING, 'settings_rec_var'),
+    (RULE_CUSTOM_MIDDLEWARE, 'settings_rec_middleware'),
+    (RULE_REC_MIDDLEWARE, 'settings_rec_middleware'),
+    (RULE_REC_APP, 'settings_rec_apps'),
+    (RULE_APP_MISSING, 'settings_rec_apps'),
+    (RULE_PASSWORD_HASHERS, 'settings_password_hashers'),
+)
+
+
+def selected_rules(ruleset):
+    """
+    return the set of the settings rules selected in a RuleSet
+    """
+    return frozenset(rule for (rule, section) in CHECK_RULES
+                     if ruleset.selects(rule, section))
 
 
 class SettingsCheck(object):
 
     """
-    This class uses the django.conf module to parse the django settings.py
-    file in the same way that django itself does.  This way we can populate
-    the django settings class, and then perform our specific checks
-    using that class.   In order to properly parse the settings.py file
-    without any modifications, we first make a temporary directory and
-    copy the settings.py file to that temporary directory.
-    Then we append the path to sus.path, and set the DJANGO_SETTINGS_MODULE
-    environment variable to the string 'settings' to read the copied file.
+    This class works out the values of the django settings.py file with
+    a SettingsEvaluator, which parses the settings module (and any
+    settings modules it imports from) without executing it, so Django
+    does not need to be installed.  The name may also be that of a
+    settings package, where settings.py is a directory whose
+    __init__.py is read.  Settings whose values cannot be worked out
+    statically are not compared against the recommended values.
     Local class rule base checks performed include:
     - recommended variables
     - recommended middleware
     - recommended apps
     - required fields
     - password hashing order
+    Besides the text written to the filehandle, each result is also
+    recorded as a Finding in self.findings for structured reporting.
+    Only the checks of the rules selected in the RuleSet run (see
+    CHECK_RULES), and when none is selected the settings module is not
+    read at all.
     """
 
-    def __init__(self, name, rules, filehandle):
+    def __init__(self, name, ruleset, filehandle, projdir=''):
         self.name = name
         self.filehandle = filehandle
-        os.environ['DJANGO_SETTINGS_MODULE'] = 'settings'
+        self.findings = []
+        self.files = [name]
+        self.shortname = name
+        if projdir and name.startswith(projdir):
+            self.shortname = name[len(projdir):].lstrip('/')
+        self.selected = selected_rules(ruleset)
+        if not self.selected:
+            self.filehandle.write(
+                '[*] No settings rules selected, Stage 1 skipped.\n')
+            return
+
+        # a split settings package is read from its __init__.py
+        package = os.path.join(os.path.splitext(name)[0], '__init__.py')
+        if not os.path.isfile(name) and os.path.isfile(package):
+            name = package
 
         # if we don't find the file, then just fail with a simple error
         if not os.path.isfile(name):
             self.filehandle.write(
                 '[*] Cannot find a Django settings file [%s]\n' % (name))
+            self.__finding(RULE_NOT_FOUND, name)
             return
 
-        # mkdir temp directory and append to sys.path
         try:
-            self.tempdir = tempfile.mkdtemp()
-            sys.path.append(self.tempdir)
-        except:
-            raise
-
-        # copy settings.py file to temp dir
-        try:
-            shutil.copy(self.name, self.tempdir)
-        except:
-            raise
-
-        self.b_apps = {}
-        self.b_fields = {}
-        self.b_middleware = {}
-        self.b_vars = {}
+            evaluator = SettingsEvaluator(name, projdir)
+        except SyntaxError as e:
+            self.filehandle.write(
+                '[*] Improper configuration error: %s\n' % (e))
+            self.__finding(RULE_IMPROPER, str(e))
+            return
+        self.settings = evaluator.settings
+        self.files = evaluator.files
 
-        # load the rules file
-        try:
-            self.__load_rules(rules)
-        except:
-            raise
+        # rules are shared from the already loaded RuleSet
+        self.b_apps = self.__rules(ruleset, 'settings_rec_apps')
+        self.b_fields = self.__rules(ruleset, 'settings_req_field')
+        self.b_middleware = self.__rules(ruleset, 'settings_rec_middleware')
+        self.b_vars = self.__rules(ruleset, 'settings_rec_var')
 
         # start running the rules checks
         self.scan()
 
-    def __del__(self):
-        try:
-            shutil.rmtree(self.tempdir)
-        except:
-            pass
+    def __rules(self, ruleset, section):
+        for (rule, check) in CHECK_RULES:
+            if check == section and rule in self.selected:
+                return dict(ruleset.rules(section))
+        return {}
 
-    def __load_rules(self, rulesfile):
-        try:
-            f = open(rulesfile, 'r')
-        except:
-            sys.stderr.write('__load_rules(): failed to open rules file\n')
-            raise
-
-        for row in csv.reader(f, delimiter=',', quotechar='"'):
-            if len(row) == 0 or re.match(r'^#.+', row[0]):
-                continue
-            if row[0] == 'settings_rec_apps':
-                self.b_apps[row[1]] = row[2]
-            elif row[0] == 'settings_req_field':
-                self.b_fields[row[1]] = ''
-            elif row[0] == 'settings_rec_middleware':
-                self.b_middleware[row[1]] = ''
-            elif row[0] == 'settings_rec_var':
-                self.b_vars[row[1]] = row[2]
+    def __finding(self, rule, *args):
+        self.findings.append(Finding(self.shortname, None, rule, args))
 
     def __required_fields(self):
+        if RULE_FIELD_UNSET not in self.selected:
+            return
         for field in self.b_fields:
-            try:
-                if not hasattr(settings, field):
-                    self.filehandle.write('[*] %%OWASP-CR-BestPractice: Required field [%s] has no value set.\n' % (field))
-            except:
-                self.filehandle.write('[*] %%OWASP-CR-BestPractice: Required field [%s] does not exist.\n' % (field))
-                pass
+            if not hasattr(self.settings, field):
+                self.filehandle.write('[*] %%OWASP-CR-BestPractice: Required field [%s] has no value set.\n' % (field))
+                self.__finding(RULE_FIELD_UNSET, field)
 
     def __recommended_variable_settings(self):
         for v in self.b_vars:
             try:
-                value = getattr(settings, v)
-                if str(value) != self.b_vars[v]:
+                value = getattr(self.settings, v)
+                if isinstance(value, Unresolved):
+                    continue
+                if str(value) != self.b_vars[v] and \
+                        RULE_VAR_VALUE in self.selected:
                     self.filehandle.write('[*] %%OWASP-CR-BestPractice: Incorrect recommended variable setting [%s = %s]\n' % (v, value))
+                    self.__finding(RULE_VAR_VALUE, v, str(value))
             except:
+                if RULE_VAR_MISSING not in self.selected:
+                    continue
                 self.filehandle.write('[*] %%OWASP-CR-BestPractice: Recommended variable [%s] does not exist.\n' % (v))
-                pass
+                self.__finding(RULE_VAR_MISSING, v)
 
     def __recommended_middleware(self):
         output = ''
         middleware = []
         try:
-            for m in settings.MIDDLEWARE_CLASSES:
+            classes = self.settings.MIDDLEWARE_CLASSES
+            if isinstance(classes, Unresolved):
+                return
+            for m in classes:
                 middleware.append(m)
-                if not m.startswith('django'):
+                if isinstance(m, Unresolved):
+                    continue
+                if not m.startswith('django') and \
+                        RULE_CUSTOM_MIDDLEWARE in self.selected:
                     output += '  [-] %OWASP-CR-BestPractice: ' + m + '\n'
+                    self.__finding(RULE_CUSTOM_MIDDLEWARE, m)
             if len(output) > 0:
                 self.filehandle.write('[*] %OWASP-CR-BestPractice: Custom MIDDLEWARE_CLASSES:\n')
                 self.filehandle.write(output)
-        except ImproperlyConfigured as improper:
-            self.filehandle.write('[*] Improper configuration error: %s\n' % (improper.message))
         except Exception as e:
-            self.filehandle.write('[*] Exception of type %s found: %s\n' % (type(e).__name__, e.message))
+            self.filehandle.write('[*] Exception of type %s found: %s\n' % (type(e).__name__, e))
+            self.__finding(RULE_EXCEPTION, type(e).__name__, str(e))
 
         output = ''
         for ms in self.b_middleware:
-            if ms not in middleware:
+            if ms not in middleware and RULE_REC_MIDDLEWARE in self.selected:
                 output += '  [-] %OWASP-CR-BestPractice: consider using "'\
                     + ms + '"\n'
+                self.__finding(RULE_REC_MIDDLEWARE, ms)
         if len(output) > 0:
             self.filehandle.write('[*] %OWASP-CR-BestPractice: Recommended MIDDLEWARE_CLASSES:\n')
             self.filehandle.write(output)
@@ -144,12 +199,18 @@ class SettingsCheck(object):
         output = ''
         for app in self.b_apps:
             try:
-                if app not in getattr(settings, 'INSTALLED_APPS'):
+                apps = getattr(self.settings, 'INSTALLED_APPS')
+                if isinstance(apps, Unresolved):
+                    continue
+                if app not in apps and RULE_REC_APP in self.selected:
                     output += '  [-] %%OWASP-CR-BestPractice: Consider using installed app "%s" (%s)\n' \
                         % (app, self.b_apps[app])
+                    self.__finding(RULE_REC_APP, app, self.b_apps[app])
             except:
+                if RULE_APP_MISSING not in self.selected:
+                    continue
                 output += '  [-] %%OWASP-CR-BestPractice: Recommended installed app [%s] is not configured.\n' % (app)
-            pass
+                self.__finding(RULE_APP_MISSING, app)
 
         if len(output) > 0:
             self.filehandle.write('[*] %OWASP-CR-BestPractice: Recommended INSTALLED_APPS:\n')
@@ -157,15 +218,22 @@ class SettingsCheck(object):
 
     def __password_hashers(self):
         try:
-            ph = getattr(settings, 'PASSWORD_HASHERS')
+            ph = getattr(self.settings, 'PASSWORD_HASHERS')
         except:
             return
+        if isinstance(ph, Unresolved) or not ph \
+                or isinstance(ph[0], Unresolved):
+            return
         if not re.match(r'.+\.(PBKDF2|Bcrypt).+', ph[0]):
             self.filehandle.write('[*] %OWASP-CR-BestPractice: PASSWORD_HASHERS should list PBKDF2 or Bcrypt first!\n')
+            self.__finding(RULE_PASSWORD_HASHERS)
 
     def scan(self):
         self.__required_fields()
         self.__recommended_variable_settings()
-        self.__recommended_middleware()
+        if RULE_CUSTOM_MIDDLEWARE in self.selected or \
+                RULE_REC_MIDDLEWARE in self.selected:
+            self.__recommended_middleware()
         self.__recommended_apps()
-        self.__password_hashers()
+        if RULE_PASSWORD_HASHERS in self.selected:
+            self.__password_hashers()
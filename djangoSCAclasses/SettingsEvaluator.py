@@ -0,0 +1,361 @@
+#!/usr/bin/env python
+
+import os
+import ast
+
+# the values of django.conf.global_settings (as of Django 1.6) for the
+# settings the rules check, which a project not assigning them gets
+GLOBAL_DEFAULTS = {
+    'ADMINS': (),
+    'MANAGERS': (),
+    'ALLOWED_HOSTS': [],
+    'DEBUG': False,
+    'TEMPLATE_DEBUG': False,
+    'INSTALLED_APPS': (),
+    'MIDDLEWARE_CLASSES': (
+        'django.middleware.common.CommonMiddleware',
+        'django.middleware.csrf.CsrfViewMiddleware',
+    ),
+    'PASSWORD_HASHERS': (
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+        'django.contrib.auth.hashers.BCryptPasswordHasher',
+        'django.contrib.auth.hashers.SHA1PasswordHasher',
+        'django.contrib.auth.hashers.MD5PasswordHasher',
+        'django.contrib.auth.hashers.UnsaltedSHA1PasswordHasher',
+        'django.contrib.auth.hashers.UnsaltedMD5PasswordHasher',
+        'django.contrib.auth.hashers.CryptPasswordHasher',
+    ),
+    'SESSION_COOKIE_SECURE': False,
+    'SESSION_COOKIE_HTTPONLY': True,
+}
+
+
+class Unresolved(object):
+
+    """
+    The value of a setting which cannot be worked out statically, such
+    as one read from the environment or computed by a function call.
+    The source of the expression is kept for reporting.
+    """
+
+    def __init__(self, source):
+        self.source = source
+
+    def __repr__(self):
+        return '<unresolved %s>' % (self.source)
+
+    __str__ = __repr__
+
+
+def expression_source(node):
+    """
+    return a short description of an expression node
+    """
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return '%s.%s' % (expression_source(node.value), node.attr)
+    if isinstance(node, ast.Call):
+        return '%s()' % (expression_source(node.func))
+    return type(node).__name__
+
+
+class SettingsNamespace(object):
+
+    """
+    The settings found by a SettingsEvaluator, read as attributes in the
+    same way as django.conf.settings.  A setting which was never assigned
+    raises AttributeError.
+    """
+
+    def __init__(self, values):
+        self.__dict__['_values'] = values
+
+    def __getattr__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class SettingsEvaluator(object):
+
+    """
+    This class works out the values of a Django settings module without
+    importing it, by parsing it with the AST library and evaluating its
+    top level statements.  Assignments of literals and of expressions
+    over settings already known are resolved, as are '+=' and the list
+    methods append(), extend(), insert() and remove().  'from X import *'
+    and 'from X import name' of other settings modules are followed, both
+    relative ('from .base import *') and absolute, which covers settings
+    split across the modules of a package.  if statements are followed
+    when their test can be resolved; otherwise every name either branch
+    may assign becomes Unresolved.  The bodies of try statements
+    are evaluated as if they succeed.  Anything else leaves the setting
+    as an Unresolved value rather than guessing.
+    As with django.conf.settings, a setting the project never assigns
+    has the value of Django's global default (see GLOBAL_DEFAULTS);
+    those defaults are not names the settings module itself can read.
+    Syntax errors are raised as SyntaxError.  Every file read is listed
+    in 'files'.
+    """
+
+    def __init__(self, filename, projdir=''):
+        self.filename = os.path.abspath(filename)
+        self.projdir = os.path.abspath(projdir or os.path.dirname(filename))
+        self.loading = []
+        self.files = []
+        self.values = dict(GLOBAL_DEFAULTS)
+        self.values.update(self.evaluate_file(self.filename))
+        self.settings = SettingsNamespace(self.values)
+
+    def evaluate_file(self, filename):
+        if filename in self.loading:
+            return {}
+        self.loading.append(filename)
+        if filename not in self.files:
+            self.files.append(filename)
+        try:
+            f = open(filename, 'r')
+            try:
+                source = f.read()
+            finally:
+                f.close()
+            tree = ast.parse(source, filename)
+            names = {}
+            self.__statements(tree.body, names, filename)
+        finally:
+            self.loading.pop()
+        return names
+
+    def __statements(self, body, names, filename):
+        for statement in body:
+            self.__statement(statement, names, filename)
+
+    def __statement(self, statement, names, filename):
+        if isinstance(statement, ast.Assign):
+            value = self.__value(statement.value, names)
+            for target in statement.targets:
+                self.__assign(target, value, names)
+        elif isinstance(statement, ast.AugAssign):
+            if isinstance(statement.target, ast.Name):
+                name = statement.target.id
+                names[name] = self.__binop(
+                    names.get(name, Unresolved(name)), statement.op,
+                    self.__value(statement.value, names), True)
+        elif isinstance(statement, ast.ImportFrom):
+            self.__import_from(statement, names, filename)
+        elif isinstance(statement, ast.Expr) \
+                and isinstance(statement.value, ast.Call):
+            self.__method_call(statement.value, names)
+        elif isinstance(statement, ast.If):
+            test = self.__value(statement.test, names)
+            if isinstance(test, Unresolved):
+                # either branch may run, so what they assign is unknown
+                source = expression_source(statement.test)
+                for name in self.__assigned(
+                        statement.body + statement.orelse, filename):
+                    names[name] = Unresolved(source)
+                return
+            if test:
+                self.__statements(statement.body, names, filename)
+            else:
+                self.__statements(statement.orelse, names, filename)
+        elif isinstance(statement, ast.With):
+            self.__statements(statement.body, names, filename)
+        elif type(statement).__name__ in ('Try', 'TryExcept', 'TryFinally'):
+            self.__statements(statement.body, names, filename)
+            self.__statements(getattr(statement, 'orelse', []), names,
+                              filename)
+            self.__statements(getattr(statement, 'finalbody', []), names,
+                              filename)
+
+    def __assigned(self, body, filename):
+        """
+        return the set of the names which the statements of body, and
+        those nested within them, may assign.
+        """
+        assigned = set()
+        for statement in body:
+            if isinstance(statement, ast.Assign):
+                for target in statement.targets:
+                    assigned.update(self.__target_names(target))
+            elif isinstance(statement, ast.AugAssign):
+                assigned.update(self.__target_names(statement.target))
+            elif isinstance(statement, ast.Expr) \
+                    and isinstance(statement.value, ast.Call) \
+                    and isinstance(statement.value.func, ast.Attribute) \
+                    and isinstance(statement.value.func.value, ast.Name):
+                assigned.add(statement.value.func.value.id)
+            elif isinstance(statement, ast.ImportFrom):
+                for alias in statement.names:
+                    if alias.name != '*':
+                        assigned.add(alias.asname or alias.name)
+                        continue
+                    module = self.__module_file(
+                        statement.module, statement.level, filename)
+                    if module is not None:
+                        assigned.update(
+                            k for k in self.evaluate_file(module)
+                            if not k.startswith('_'))
+            for field in ('body', 'orelse', 'finalbody', 'handlers'):
+                nested = getattr(statement, field, None)
+                if isinstance(nested, list):
+                    assigned.update(self.__assigned(nested, filename))
+        return assigned
+
+    def __target_names(self, target):
+        if isinstance(target, ast.Name):
+            return [target.id]
+        if isinstance(target, (ast.Tuple, ast.List)):
+            return [name for t in target.elts
+                    for name in self.__target_names(t)]
+        return []
+
+    def __assign(self, target, value, names):
+        if isinstance(target, ast.Name):
+            names[target.id] = value
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            if isinstance(value, (tuple, list)) \
+                    and len(value) == len(target.elts):
+                for (t, v) in zip(target.elts, value):
+                    self.__assign(t, v, names)
+            else:
+                for t in target.elts:
+                    self.__assign(t, Unresolved(expression_source(t)), names)
+
+    def __method_call(self, call, names):
+        func = call.func
+        if not isinstance(func, ast.Attribute) \
+                or not isinstance(func.value, ast.Name):
+            return
+        name = func.value.id
+        value = names.get(name)
+        if not isinstance(value, (list, tuple)):
+            return
+        args = [self.__value(a, names) for a in call.args]
+        value = list(value)
+        try:
+            if func.attr == 'append' and len(args) == 1:
+                value.append(args[0])
+            elif func.attr == 'extend' and len(args) == 1 \
+                    and isinstance(args[0], (list, tuple)):
+                value.extend(args[0])
+            elif func.attr == 'insert' and len(args) == 2 \
+                    and isinstance(args[0], int):
+                value.insert(args[0], args[1])
+            elif func.attr == 'remove' and len(args) == 1:
+                value.remove(args[0])
+            else:
+                return
+        except ValueError:
+            return
+        names[name] = value
+
+    def __import_from(self, statement, names, filename):
+        module = self.__module_file(statement.module, statement.level,
+                                    filename)
+        if module is None:
+            return
+        imported = self.evaluate_file(module)
+        for alias in statement.names:
+            if alias.name == '*':
+                for (k, v) in imported.items():
+                    if not k.startswith('_'):
+                        names[k] = v
+            elif alias.name in imported:
+                names[alias.asname or alias.name] = imported[alias.name]
+
+    def __module_file(self, module, level, filename):
+        """
+        return the file of a module imported from filename, or None when
+        it is not part of the project.
+        """
+        parts = module and module.split('.') or []
+        if level:
+            base = os.path.dirname(filename)
+            for i in range(level - 1):
+                base = os.path.dirname(base)
+            bases = [base]
+        else:
+            # absolute imports may be relative to any directory from the
+            # importing file up to the project directory
+            bases = []
+            base = os.path.dirname(filename)
+            while True:
+                bases.append(base)
+                if base == self.projdir or not base.startswith(self.projdir):
+                    break
+                base = os.path.dirname(base)
+        for base in bases:
+            path = os.path.join(base, *parts) if parts else base
+            for candidate in (path + '.py', os.path.join(path, '__init__.py')):
+                if os.path.isfile(candidate):
+                    return candidate
+        return None
+
+    def __value(self, node, names):
+        if hasattr(ast, 'Constant') and isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, ast.Str):
+            return node.s
+        if isinstance(node, ast.Num):
+            return node.n
+        if hasattr(ast, 'NameConstant') and isinstance(node, ast.NameConstant):
+            return node.value
+        if isinstance(node, ast.Name):
+            if node.id in names:
+                return names[node.id]
+            if node.id in ('True', 'False', 'None'):
+                return {'True': True, 'False': False, 'None': None}[node.id]
+            return Unresolved(node.id)
+        if isinstance(node, ast.List):
+            return [self.__value(e, names) for e in node.elts]
+        if isinstance(node, ast.Tuple):
+            return tuple(self.__value(e, names) for e in node.elts)
+        if isinstance(node, ast.Dict):
+            if None in node.keys:
+                return Unresolved('dict')
+            try:
+                return dict((self.__value(k, names), self.__value(v, names))
+                            for (k, v) in zip(node.keys, node.values))
+            except TypeError:
+                return Unresolved('dict')
+        if isinstance(node, ast.BinOp):
+            return self.__binop(self.__value(node.left, names), node.op,
+                                self.__value(node.right, names))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            value = self.__value(node.operand, names)
+            if isinstance(value, Unresolved):
+                return value
+            return not value
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) \
+                and node.func.id in ('list', 'tuple') and len(node.args) == 1:
+            value = self.__value(node.args[0], names)
+            if isinstance(value, (list, tuple)):
+                return {'list': list, 'tuple': tuple}[node.func.id](value)
+        return Unresolved(expression_source(node))
+
+    def __binop(self, left, op, right, augmented=False):
+        if isinstance(left, Unresolved):
+            return left
+        if isinstance(right, Unresolved):
+            return right
+        numbers = (int, float)
+        try:
+            if isinstance(op, ast.Add):
+                if augmented and isinstance(left, list) \
+                        and isinstance(right, tuple):
+                    # list += tuple extends the list
+                    return left + list(right)
+                return left + right
+            if isinstance(op, ast.Sub):
+                return left - right
+            if isinstance(op, ast.Mult) and isinstance(left, numbers) \
+                    and isinstance(right, numbers):
+                return left * right
+        except TypeError:
+            pass
+        return Unresolved(type(op).__name__)
@@ -0,0 +1,374 @@
+#!/usr/bin/env python
+
+import os
+import re
+import ast
+from djangoSCAclasses.ContentReader import ContentReader
+
+# the statements indexed in a module which cannot be parsed, found in one
+# pass over the source
+STATEMENT_RXP = re.compile(
+    r'^[ \t]*(?:'
+    r'import[ \t]+(?P<imports>[\w. \t,]+)'
+    r'|from[ \t]+(?P<module>\.*[\w.]*)[ \t]+import[ \t]+'
+    r'(?P<names>\([^)]*\)|[^\n#;]+)'
+    r'|class[ \t]+(?P<cls>\w+)[ \t]*(?:\((?P<bases>[^)]*)\))?'
+    r')', re.M)
+
+# dotted names within a class base expression
+NAME_RXP = re.compile(r'[\w.]+')
+
+# the qualified names of Django's ModelForm
+MODELFORM_NAMES = frozenset(['django.forms.ModelForm',
+                             'django.forms.models.ModelForm'])
+
+
+def dotted_name(node):
+    """
+    return the dotted name of a Name or Attribute expression, or None.
+    """
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return '.'.join(reversed(parts))
+
+
+def module_name(shortname):
+    """
+    return the dotted module name of a .py file path relative to the
+    project directory, and whether it is a package.
+    """
+    parts = shortname[:-3].split('/')
+    if parts[-1] == '__init__':
+        return ('.'.join(parts[:-1]), True)
+    return ('.'.join(parts), False)
+
+
+class ModuleSymbols(object):
+
+    """
+    The names a module binds by import statements, mapped to the
+    qualified names they refer to, the bases of the classes it defines,
+    and the modules it imports everything from.
+    """
+
+    __slots__ = ('imports', 'classes', 'stars')
+
+    def __init__(self):
+        self.imports = {}
+        self.classes = {}
+        self.stars = []
+
+
+class SymbolIndex(object):
+
+    """
+    This class indexes the imports and class definitions of the python
+    modules of a project, to answer questions which need more than the
+    file being analyzed, such as whether a class is a ModelForm when
+    it derives from a base class defined in another module, from an
+    alias ('from django.forms import ModelForm as MF'), or from a name
+    re-exported by another module of the project.
+    Modules are indexed with add_path() or add_file(), from the import
+    statements and class definitions of their parse tree which bind
+    module level names, including those under if and try blocks, but
+    not those of function or class bodies such as a nested Meta class.
+    A module which does not parse, such as one written for another
+    python version, is indexed with one regular expression pass
+    instead, which finds imports wherever they are indented and only
+    unindented classes.  add_path() reuses the symbols of a file from
+    a previous index of the project when its size and modification
+    time have not changed, so that rebuilding the index after a change
+    only reads the files changed.  Absolute imports are matched to project modules by
+    their dotted path relative to the project directory, or by a unique
+    trailing part of it, since the project directory need not be the
+    root of the python path.  Relative and 'import *' imports are
+    followed.
+    finish() resolves every class once, after which modelforms() is a
+    constant time lookup of the ModelForm classes of a file.  A base
+    class outside of the project is taken as a ModelForm when its name
+    contains 'ModelForm', which covers third party ModelForm classes.
+    """
+
+    def __init__(self, projdir=''):
+        self.projdir = projdir
+        self.modules = {}
+        self.files = {}
+        self.stamps = {}
+        self.suffixes = None
+        self.answers = {}
+
+    def add_path(self, fullpath, max_size=0, previous=None):
+        """
+        index a .py file of the project directory, unless it is larger
+        than max_size or cannot be read, reusing its symbols from the
+        previous SymbolIndex when the file has not changed since.
+        """
+        shortname = fullpath[len(self.projdir):].lstrip('/')
+        try:
+            st = os.stat(fullpath)
+        except OSError:
+            return
+        stamp = (st.st_mtime, st.st_size)
+        if previous is not None and previous.stamps.get(shortname) == stamp:
+            module = previous.files[shortname]
+            self.files[shortname] = module
+            self.modules[module] = previous.modules[module]
+            self.stamps[shortname] = stamp
+            return
+        try:
+            reader = ContentReader(self.projdir, fullpath, max_size)
+            if reader.skipped:
+                return
+            source = reader.content
+        except IOError:
+            return
+        self.add_file(shortname, source)
+        self.stamps[shortname] = stamp
+
+    def add_file(self, shortname, source):
+        """
+        index a .py file, named by its path relative to the project.
+        """
+        (module, package) = module_name(shortname)
+        self.files[shortname] = module
+        symbols = ModuleSymbols()
+        self.modules[module] = symbols
+        if 'import' not in source and 'class' not in source:
+            return
+        try:
+            tree = ast.parse(source)
+        except (SyntaxError, TypeError, ValueError):
+            self.__scan(symbols, module, package, source)
+            return
+        self.__index(symbols, module, package, tree.body)
+
+    def __index(self, symbols, module, package, body):
+        """
+        index the statements of a module body which bind module names,
+        and those of the blocks nested in them other than functions and
+        classes.
+        """
+        for node in body:
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    if alias.asname:
+                        symbols.imports[alias.asname] = alias.name
+                    else:
+                        head = alias.name.split('.')[0]
+                        symbols.imports.setdefault(head, head)
+            elif isinstance(node, ast.ImportFrom):
+                base = self.__absolute(module, package,
+                                       '.' * (node.level or 0) +
+                                       (node.module or ''))
+                if base is None:
+                    continue
+                for alias in node.names:
+                    if alias.name == '*':
+                        symbols.stars.append(base)
+                    else:
+                        symbols.imports[alias.asname or alias.name] = \
+                            base + '.' + alias.name
+            elif isinstance(node, ast.ClassDef):
+                bases = []
+                for expr in node.bases:
+                    # the last argument, as in with_metaclass(M, Base)
+                    while isinstance(expr, ast.Call) and expr.args:
+                        expr = expr.args[-1]
+                    name = dotted_name(expr)
+                    if name is not None:
+                        bases.append(name)
+                symbols.classes[node.name] = bases
+            elif not isinstance(node, ast.FunctionDef):
+                for field in ('body', 'orelse', 'finalbody', 'handlers'):
+                    block = getattr(node, field, None)
+                    if block:
+                        self.__index(symbols, module, package, block)
+
+    def __scan(self, symbols, module, package, source):
+        """
+        index the statements of a module which does not parse.
+        """
+        if '\\\n' in source:
+            source = source.replace('\\\n', ' ')
+        for m in STATEMENT_RXP.finditer(source):
+            if m.group('imports'):
+                for item in m.group('imports').split(','):
+                    words = item.split()
+                    if len(words) == 3 and words[1] == 'as':
+                        symbols.imports[words[2]] = words[0]
+                    elif len(words) == 1:
+                        head = words[0].split('.')[0]
+                        symbols.imports.setdefault(head, head)
+            elif m.group('names'):
+                base = self.__absolute(module, package, m.group('module'))
+                if base is None:
+                    continue
+                for item in m.group('names').strip('()').split(','):
+                    words = item.split()
+                    if words == ['*']:
+                        symbols.stars.append(base)
+                    elif len(words) == 3 and words[1] == 'as':
+                        symbols.imports[words[2]] = base + '.' + words[0]
+                    elif len(words) == 1:
+                        symbols.imports[words[0]] = base + '.' + words[0]
+            elif m.group('cls') and m.group(0)[0] not in ' \t':
+                bases = []
+                for item in (m.group('bases') or '').split(','):
+                    item = item.strip()
+                    if '=' in item:
+                        continue
+                    # the last dotted name, as in with_metaclass(M, Base
+                    words = NAME_RXP.findall(item)
+                    if words:
+                        bases.append(words[-1])
+                symbols.classes[m.group('cls')] = bases
+
+    def __absolute(self, module, package, name):
+        """
+        return the absolute name of the module of a from import.
+        """
+        level = len(name) - len(name.lstrip('.'))
+        name = name[level:]
+        if not level:
+            return name or None
+        parts = module.split('.') if module else []
+        if not package:
+            parts = parts[:-1]
+        if level > 1:
+            if level - 1 > len(parts):
+                return None
+            parts = parts[:len(parts) - (level - 1)]
+        if name:
+            parts.append(name)
+        return '.'.join(parts)
+
+    def find(self, name):
+        """
+        return the index key of the project module with a dotted name,
+        or None when it is not part of the project.
+        """
+        if name in self.modules:
+            return name
+        if self.suffixes is None:
+            self.suffixes = {}
+            for key in self.modules:
+                parts = key.split('.')
+                for i in range(1, len(parts)):
+                    suffix = '.'.join(parts[i:])
+                    # ambiguous suffixes are dropped
+                    if suffix in self.suffixes:
+                        self.suffixes[suffix] = None
+                    else:
+                        self.suffixes[suffix] = key
+        return self.suffixes.get(name)
+
+    def bound(self, module, name):
+        """
+        return the qualified name a module binds name to, or None.
+        """
+        symbols = self.modules.get(module)
+        if symbols is None:
+            return None
+        if name in symbols.classes:
+            return module + '.' + name
+        if name in symbols.imports:
+            return symbols.imports[name]
+        for star in symbols.stars:
+            key = self.find(star)
+            if key is not None and key != module and (
+                    name in self.modules[key].classes or
+                    name in self.modules[key].imports):
+                return key + '.' + name
+        return None
+
+    def resolve(self, module, dotted, depth=0):
+        """
+        return the qualified name of a dotted name used in a module,
+        following aliases and re-exports through the project's modules.
+        """
+        (head, sep, rest) = dotted.partition('.')
+        qualified = self.bound(module, head) or head
+        if rest:
+            qualified = qualified + '.' + rest
+        return self.canonical(qualified, depth)
+
+    def canonical(self, qualified, depth=0):
+        """
+        return the name a qualified name is defined under, when it is
+        reached through a project module.
+        """
+        parts = qualified.split('.')
+        for i in range(len(parts) - 1, 0, -1):
+            key = self.find('.'.join(parts[:i]))
+            if key is None:
+                continue
+            bound = None
+            if parts[i] not in self.modules[key].classes and depth < 16:
+                bound = self.bound(key, parts[i])
+            if bound is None:
+                return '.'.join([key] + parts[i:])
+            return self.canonical('.'.join([bound] + parts[i + 1:]),
+                                  depth + 1)
+        return qualified
+
+    def is_modelform(self, qualified, memo, seen):
+        if qualified in MODELFORM_NAMES:
+            return True
+        if qualified in memo:
+            return memo[qualified]
+        (key, sep, name) = qualified.rpartition('.')
+        symbols = self.modules.get(key)
+        if symbols is None or name not in symbols.classes:
+            # a class outside of the project
+            return 'ModelForm' in name
+        if qualified in seen:
+            return False
+        seen.add(qualified)
+        result = False
+        for base in symbols.classes[name]:
+            if self.is_modelform(self.resolve(key, base), memo, seen):
+                result = True
+                break
+        memo[qualified] = result
+        return result
+
+    def finish(self):
+        """
+        work out the ModelForm classes of every module indexed.
+        """
+        memo = {}
+        for (module, symbols) in self.modules.items():
+            self.answers[module] = frozenset(
+                name for name in symbols.classes
+                if self.is_modelform(module + '.' + name, memo, set()))
+
+    def modelforms(self, name):
+        """
+        return the names of the ModelForm classes defined in a file, by
+        its full path or its path relative to the project, or None if
+        the file was not indexed.
+        """
+        if self.projdir and name.startswith(self.projdir):
+            name = name[len(self.projdir):].lstrip('/')
+        module = self.files.get(name)
+        if module is None:
+            return None
+        return self.answers.get(module)
+
+
+def build_index(projdir, paths, max_size=0, previous=None):
+    """
+    return a finished SymbolIndex of the python files of a project, such
+    as listed by FileInventory, reusing the symbols of the files which
+    have not changed from a previous index of the project.
+    """
+    index = SymbolIndex(projdir)
+    for fullpath in paths:
+        index.add_path(fullpath, max_size, previous)
+    index.finish()
+    return index
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+# token types, as in django.template.base
+TOKEN_TEXT = 0
+TOKEN_VAR = 1
+TOKEN_BLOCK = 2
+TOKEN_COMMENT = 3
+
+
+class TemplateLexer(object):
+
+    """
+    This class splits Django template source into text, variable
+    ({{ }}), block ({% %}) and comment ({# #}) tokens, in the same way as
+    the lexer of Django itself.  As with Django, a tag never spans lines,
+    so a file can be lexed one line at a time with line_tokens(), which
+    is how MyParser lexes while it makes its single pass over the lines
+    of a file.  Tokens are tuples of (type, source text, line number),
+    where the source text of a tag includes its delimiters.
+    Tags are found with str.find() rather than with the regular
+    expression of Django, r'({%.*?%}|{{.*?}}|{#.*?#})', which gives the
+    same tags, but searches to the end of the line for every opening
+    delimiter that is not closed, taking quadratic time on long lines
+    holding many of them.  Once the closing delimiter of a tag type is
+    known to be missing from the rest of the line, the remaining
+    openings of that type are passed over, so a line is lexed in time
+    linear to its length.
+    """
+
+    tag_types = {'{{': TOKEN_VAR, '{%': TOKEN_BLOCK, '{#': TOKEN_COMMENT}
+    tag_ends = {'{': '}}', '%': '%}', '#': '#}'}
+
+    def spans(self, line):
+        """
+        yield the (start, end) offsets of the tags of a single line
+        """
+        ends = self.tag_ends
+        unclosed = set()
+        i = line.find('{')
+        while i != -1:
+            kind = line[i + 1:i + 2]
+            if kind in ends and kind not in unclosed:
+                j = line.find(ends[kind], i + 2)
+                if j != -1:
+                    yield (i, j + 2)
+                    i = line.find('{', j + 2)
+                    continue
+                unclosed.add(kind)
+            i = line.find('{', i + 1)
+
+    def line_tokens(self, line, lineno):
+        """
+        return the list of tokens of a single line
+        """
+        if '{' not in line:
+            return [(TOKEN_TEXT, line, lineno)] if line else []
+        tokens = []
+        pos = 0
+        for (start, end) in self.spans(line):
+            if start > pos:
+                tokens.append((TOKEN_TEXT, line[pos:start], lineno))
+            tokens.append((self.tag_types[line[start:start + 2]],
+                           line[start:end], lineno))
+            pos = end
+        if pos < len(line):
+            tokens.append((TOKEN_TEXT, line[pos:], lineno))
+        return tokens
+
+    def tags(self, line, lineno):
+        """
+        return only the variable and block tokens of a single line
+        """
+        if '{' not in line:
+            return []
+        types = self.tag_types
+        return [(types[line[start:start + 2]], line[start:end], lineno)
+                for (start, end) in self.spans(line)
+                if line[start + 1] != '#']
+
+    def tokenize(self, source):
+        """
+        yield every token of source, numbering lines from 1
+        """
+        for (lineno, line) in enumerate(source.split('\n'), 1):
+            for token in self.line_tokens(line, lineno):
+                yield token
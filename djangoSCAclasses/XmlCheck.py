@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+from xml.parsers import expat
+from djangoSCAclasses.RulePattern import RulePattern
+
+
+class XmlPath(object):
+
+    """
+    This class is the compiled form of an 'xml' rule pattern, which is
+    written as path[@attribute][=regex].  The path is a list of element
+    names separated by '/', '*' standing for any element, and matches
+    elements ending with that chain of parents, or the whole chain from
+    the root when the path starts with '/'.  With an attribute, the
+    attribute of the element is checked, and with a regex, the value of
+    the attribute (or the text of the element, without an attribute)
+    must also match it, as with re.match().  A pattern without a regex
+    finds every element, or attribute, which is present.
+    """
+
+    __slots__ = ('pattern', 'anchored', 'path', 'attribute', 'value', 'risk')
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        (path, sep, value) = pattern.partition('=')
+        (path, sep, attribute) = path.partition('@')
+        self.anchored = path.startswith('/')
+        self.path = tuple(path.strip('/').split('/'))
+        if not all(self.path) or (sep and not attribute):
+            raise ValueError('invalid xml path [%s]' % (pattern))
+        self.attribute = attribute or None
+        self.value = None
+        self.risk = None
+        if value:
+            self.value = RulePattern(value)
+            self.risk = self.value.risk
+
+    def matches(self, stack):
+        """
+        return whether the element at the top of stack, the list of the
+        names of the open elements from the root, is on the path.
+        """
+        n = len(self.path)
+        if len(stack) < n or (self.anchored and len(stack) != n):
+            return False
+        for (name, element) in zip(self.path, stack[-n:]):
+            if name != '*' and name != element:
+                return False
+        return True
+
+
+class XmlStop(Exception):
+    pass
+
+
+class XmlCheck(object):
+
+    """
+    This class evaluates a set of element and attribute path checks over
+    an XML document in one streaming pass of the expat parser, which
+    only keeps the names of the open elements, so memory does not grow
+    with the document however large it is.  checks is a sequence of
+    (XmlPath, Rule, attribute), attribute naming the attribute whose
+    value is the argument of the message of a built in rule, or None.
+    check() takes the document as a sequence of blocks, either the
+    content already read or the blocks of a large file, and returns a
+    list of (line, Rule, args), the line being that of the start tag.
+    Documents declaring entities are not expanded, to stay clear of
+    entity expansion attacks, and like malformed documents raise
+    expat.ExpatError, with the line where parsing stopped.
+    """
+
+    def __init__(self, checks):
+        # checks indexed by the last element name of their path
+        self.checks = {}
+        for check in checks:
+            self.checks.setdefault(check[0].path[-1], []).append(check)
+        self.wildcard = self.checks.pop('*', [])
+        # whether any check needs the text of elements
+        self.texts = any(check[0].attribute is None and
+                         check[0].value is not None for check in checks)
+
+    def check(self, blocks):
+        parser = expat.ParserCreate()
+        if hasattr(parser, 'returns_unicode'):
+            # python 2: report names and values as utf-8 strings
+            parser.returns_unicode = False
+        stack = []
+        texts = []
+        found = []
+
+        def start(name, attrs):
+            stack.append(name)
+            for (path, rule, attribute) in \
+                    self.checks.get(name, []) + self.wildcard:
+                if not path.matches(stack):
+                    continue
+                line = parser.CurrentLineNumber
+                args = ()
+                if attribute is not None:
+                    args = (attrs.get(attribute, ''),)
+                if path.attribute is None:
+                    if path.value is None:
+                        found.append((line, rule, args))
+                    else:
+                        texts.append((len(stack), [], path, line, rule,
+                                      args))
+                elif path.attribute in attrs and (
+                        path.value is None or
+                        path.value.match(attrs[path.attribute])):
+                    found.append((line, rule, args))
+
+        def data(text):
+            for pending in texts:
+                if pending[0] == len(stack):
+                    pending[1].append(text)
+
+        def end(name):
+            while texts and texts[-1][0] == len(stack):
+                (depth, parts, path, line, rule, args) = texts.pop()
+                if path.value.match(''.join(parts).strip()):
+                    found.append((line, rule, args))
+            stack.pop()
+
+        def entity(*args):
+            raise XmlStop()
+
+        parser.StartElementHandler = start
+        parser.EndElementHandler = end
+        parser.EntityDeclHandler = entity
+        if self.texts:
+            parser.CharacterDataHandler = data
+        try:
+            for block in blocks:
+                parser.Parse(block, False)
+            parser.Parse('', True)
+        except XmlStop:
+            err = expat.ExpatError('entity declarations are not expanded')
+            err.lineno = parser.CurrentLineNumber
+            raise err
+        found.sort(key=lambda f: f[0])
+        return found
+
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from djangoSCAclasses.FileInventory import FileInventory
+from djangoSCAclasses.ProjectFiles import FILE_RXP
+
+
+class SniffTest(unittest.TestCase):
+
+    def setUp(self):
+        self.projdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.projdir)
+
+    def write(self, name, content):
+        f = open(os.path.join(self.projdir, name), 'wb')
+        f.write(content)
+        f.close()
+
+    def test_long_lines_of_sources_are_not_minified(self):
+        line = 'x' * (FileInventory.sniff_size + 1)
+        self.write('views.py', 'X = "%s"\n' % (line))
+        self.write('page.html', '<p>%s</p>\n' % (line))
+        self.write('feed.xml', '<a>%s</a>\n' % (line))
+        self.write('blob.txt', 'a\0b\n')
+        inventory = FileInventory(self.projdir, rxp=FILE_RXP)
+        found = sorted(os.path.basename(path)
+                       for (path, ext, size, mtime) in inventory.files)
+        self.assertEqual(found, ['page.html', 'views.py'])
+        self.assertEqual(inventory.skipped['minified'], 1)
+        self.assertEqual(inventory.skipped['binary'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
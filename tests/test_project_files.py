@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from djangoSCAclasses.ProjectFiles import changed_settings_path
+
+
+class ChangedSettingsPathTest(unittest.TestCase):
+
+    def test_only_the_settings_module_matches(self):
+        self.assertEqual(changed_settings_path('/p', ['site/settings.py']),
+                         '/p/site')
+        self.assertEqual(changed_settings_path(
+            '/p', ['site/test_settings.py', 'site/mysettings.py']), None)
+        self.assertEqual(changed_settings_path(
+            '/p', ['site/prod.py', 'site/settings.py'], 'prod.py'),
+            '/p/site')
+
+    def test_split_settings_package(self):
+        self.assertEqual(changed_settings_path('/p', ['site/settings/dev.py']),
+                         '/p/site')
+
+    def test_files_read_by_the_settings(self):
+        read = ('/p/site', ['/p/site/settings.py', '/p/config/base.py'])
+        self.assertEqual(changed_settings_path('/p', ['config/base.py'],
+                                               'settings.py', read),
+                         '/p/site')
+        self.assertEqual(changed_settings_path('/p', ['config/urls.py'],
+                                               'settings.py', read), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from djangoSCAclasses.SettingsEvaluator import SettingsEvaluator, Unresolved
+
+
+class UnresolvedIfTest(unittest.TestCase):
+
+    def setUp(self):
+        self.projdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.projdir)
+
+    def evaluate(self, files):
+        for (name, source) in files.items():
+            path = os.path.join(self.projdir, name)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            f = open(path, 'w')
+            f.write(source)
+            f.close()
+        return SettingsEvaluator(os.path.join(self.projdir, 'settings.py'),
+                                 self.projdir).values
+
+    def test_branch_assignments_are_unresolved(self):
+        values = self.evaluate({
+            'settings.py': 'import os\n'
+                           'DEBUG = False\n'
+                           'MIDDLEWARE_CLASSES = []\n'
+                           'TIMEOUT = 1\n'
+                           'if os.environ.get("X"):\n'
+                           '    DEBUG = True\n'
+                           '    MIDDLEWARE_CLASSES.append("a.B")\n'
+                           '    from conf.base import *\n'
+                           'else:\n'
+                           '    TIMEOUT += 1\n'
+                           'KEPT = 1\n',
+            'conf/__init__.py': '',
+            'conf/base.py': 'ALLOWED_HOSTS = ["example.com"]\n',
+        })
+        for name in ('DEBUG', 'MIDDLEWARE_CLASSES', 'TIMEOUT',
+                     'ALLOWED_HOSTS'):
+            self.assertTrue(isinstance(values[name], Unresolved), name)
+            self.assertEqual(values[name].source, 'os.environ.get()')
+        self.assertEqual(values['KEPT'], 1)
+
+    def test_resolved_test_follows_one_branch(self):
+        values = self.evaluate({
+            'settings.py': 'DEBUG = False\n'
+                           'if DEBUG:\n'
+                           '    SECURE = False\n'
+                           'else:\n'
+                           '    SECURE = True\n',
+        })
+        self.assertEqual(values['SECURE'], True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from djangoSCAclasses.SymbolIndex import SymbolIndex, build_index
+
+
+class SymbolIndexTest(unittest.TestCase):
+
+    def index(self, files):
+        index = SymbolIndex()
+        for (name, source) in files.items():
+            index.add_file(name, source)
+        index.finish()
+        return index
+
+    def test_nested_and_quoted_classes_are_not_indexed(self):
+        index = self.index({
+            'app/forms.py': 'from django import forms\n'
+                            'class UserForm(forms.ModelForm):\n'
+                            '    class Meta(object):\n'
+                            '        pass\n'
+                            'HELP = """\n'
+                            'class Fake(forms.ModelForm):\n'
+                            '"""\n',
+        })
+        self.assertEqual(index.modelforms('app/forms.py'),
+                         frozenset(['UserForm']))
+        self.assertEqual(sorted(index.modules['app.forms'].classes),
+                         ['UserForm'])
+
+    def test_conditional_imports_and_reexports(self):
+        index = self.index({
+            'app/__init__.py': '',
+            'app/base.py': 'try:\n'
+                           '    from django.forms import ModelForm as MF\n'
+                           'except ImportError:\n'
+                           '    MF = None\n'
+                           'class Base(MF):\n'
+                           '    pass\n',
+            'app/forms.py': 'from .base import *\n'
+                            'import six\n'
+                            'class A(six.with_metaclass(type, Base)):\n'
+                            '    pass\n',
+        })
+        self.assertEqual(index.modelforms('app/forms.py'), frozenset(['A']))
+
+    def test_unparsable_module_falls_back_to_scanning(self):
+        index = self.index({
+            'forms.py': 'from django.forms import ModelForm\n'
+                        'class A(ModelForm):\n'
+                        '    x = f"{1}" print\n',
+        })
+        self.assertEqual(index.modelforms('forms.py'), frozenset(['A']))
+
+    def test_unchanged_files_are_reused(self):
+        projdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(projdir, 'forms.py')
+            f = open(path, 'w')
+            f.write('from django.forms import ModelForm\n'
+                    'class A(ModelForm):\n'
+                    '    pass\n')
+            f.close()
+            first = build_index(projdir, [path])
+            second = build_index(projdir, [path], previous=first)
+            self.assertTrue(second.modules['forms'] is first.modules['forms'])
+            self.assertEqual(second.modelforms(path), frozenset(['A']))
+        finally:
+            shutil.rmtree(projdir)
+
+
+if __name__ == '__main__':
+    unittest.main()